@@ -0,0 +1,50 @@
+"""
+batch_win_benchmark.py - throughput of the vectorised win and wait checks
+
+Compares hand_analysis.analyse_batch over an (N, 34) array of hands against calling
+is_winning_hand and waiting_indices on one hand at a time. Run from the repository
+root with
+    python -m benchmarks.batch_win_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+import numpy as np
+
+from mahjong_environment.hand_analysis import analyse_batch, is_winning_hand, waiting_indices
+from mahjong_environment.mahjong_game import MahjongGame
+
+
+def _random_hands(count: int, seed: int = 0) -> np.ndarray:
+    """
+    Deal count hands of 13 or 14 tiles from shuffled walls, ignoring flowers
+    """
+    rng = random.Random(seed)
+    wall = [tile.to_index() for tile in MahjongGame.initialize_tiles() if tile.tiletype != 'flower']
+    hands = np.zeros((count, 34), dtype=np.uint8)
+    for row in range(count):
+        for index in rng.sample(wall, 13 + row % 2):
+            hands[row, index] += 1
+    return hands
+
+
+def main(number: int = 20000) -> None:
+    hands = _random_hands(number)
+    analyse_batch(hands[:1])  # build the dense tables outside of the timings
+
+    def per_hand():
+        for counts in hands:
+            is_winning_hand(counts)
+            waiting_indices(counts)
+
+    batch_time = min(timeit.repeat(lambda: analyse_batch(hands), number=1, repeat=5))
+    single_time = min(timeit.repeat(per_hand, number=1, repeat=3))
+    print(f"analyse_batch: {number / batch_time:,.0f} hands/s, one at a time: {number / single_time:,.0f} hands/s "
+          f"({single_time / batch_time:.1f}x speedup over {number} hands)")
+
+
+if __name__ == "__main__":
+    main()
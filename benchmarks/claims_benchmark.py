@@ -0,0 +1,48 @@
+"""
+claims_benchmark.py - cost of asking the other players for claims after each discard
+
+Times the headless self-play of simulation.simulate with MahjongGame.claimants,
+which only hands prepare_action to the players the claim index says could claim
+the discard, against asking all three other players as before. Both play exactly
+the same games. Run from the repository root with
+    python -m benchmarks.claims_benchmark
+"""
+
+from __future__ import annotations
+
+import timeit
+from typing import List, Optional
+
+from mahjong_environment.ai_bot import RandomBot, YesBot
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+from mahjong_environment.simulation import simulate
+from mahjong_environment.tile import MahjongTile
+
+
+def _legacy_claimants(game: MahjongGame, tile: Optional[MahjongTile]) -> List[Player]:
+    """
+    Every player other than the current one, i.e. play_turn before the claim index
+    """
+    return [player for seat, player in enumerate(game.players) if seat != game.current_player_no]
+
+
+def main(games: int = 100, seed: int = 0) -> None:
+    indexed = MahjongGame.claimants
+    for bot in (RandomBot, YesBot):
+        results = []
+        times = []
+        for claimants in (indexed, _legacy_claimants):
+            MahjongGame.claimants = claimants
+            try:
+                results.append(simulate(games, [bot] * 4, seed=seed))
+                times.append(min(timeit.repeat(lambda: simulate(games, [bot] * 4, seed=seed), number=1, repeat=3)))
+            finally:
+                MahjongGame.claimants = indexed
+        assert (results[0].scores == results[1].scores).all() and (results[0].turns == results[1].turns).all()
+        print(f"{bot.__name__}: claim index {games / times[0]:,.0f} games/s, "
+              f"asking every player {games / times[1]:,.0f} games/s ({times[1] / times[0]:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
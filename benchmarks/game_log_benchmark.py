@@ -0,0 +1,86 @@
+"""
+game_log_benchmark.py - cost of logging an episode and handing it to a learner
+
+Compares GameLog, which writes each step into preallocated columns, assigns
+the rewards with one vectorised write and widens only the sampled batch of
+states to float32, against the previous way of logging, a dict with its own
+copy of the state per step, rewarded in a Python loop and with the sampled batch
+stacked with np.array before training. Run from the repository root with
+    python -m benchmarks.game_log_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+from typing import List
+
+import numpy as np
+
+from mahjong_environment.game_log import GameLog
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+
+
+def _episode_states(steps: int, seed: int = 0) -> List[np.ndarray]:
+    """
+    States from random draw/discard plies of one game, restarted when the wall runs out
+    """
+    rng = random.Random(seed)
+    states = []
+    while len(states) < steps:
+        game = MahjongGame([Player(i, i) for i in range(4)], 'east', verbose=False, rng=random.Random(len(states)))
+        while game.tiles_remaining > 0 and len(states) < steps:
+            player = game.current_player
+            game.discard_tile(player, tile=player.hidden_hand[rng.randrange(len(player.hidden_hand))])
+            game.next_turn()
+            game.draw_tile(game.current_player)
+            states.append(game.get_state())
+    return states
+
+
+def main(steps: int = 200, episodes: int = 50, batch_size: int = 64) -> None:
+    states = _episode_states(steps)
+    rewards = [3.0, -1.0, -1.0, -1.0]
+    rows = np.array(random.Random(1).sample(range(steps), batch_size))  # as MahjongModel.sample_batch
+
+    def legacy():
+        log = []
+        for step, state in enumerate(states):
+            log.append({"player_id": step % 4, "state": state.copy(), "action": step % 14, "reward": 0.0,
+                        "gameover": False})
+        for player_id, reward in enumerate(rewards):
+            for entry in log:
+                if entry["player_id"] == player_id:
+                    entry["reward"] = reward
+                    entry["gameover"] = True
+        batch = [log[row] for row in rows]
+        return np.array([entry["state"] for entry in batch]), np.array([entry["reward"] for entry in batch])
+
+    log = GameLog(MahjongGame.state_size)
+
+    def columnar():
+        log.truncate(0)
+        for step, state in enumerate(states):
+            log.append(state, step % 4, step % 14, is_discard=True)
+        log.finish_episode(rewards)
+        return log.gather_states(rows), log.rewards[rows]
+
+    legacy_states, legacy_rewards = legacy()
+    log_states, log_rewards = columnar()
+    np.testing.assert_array_equal(legacy_rewards, log_rewards)
+    np.testing.assert_allclose(legacy_states, log_states, rtol=2 ** -7)
+
+    old_time = min(timeit.repeat(legacy, number=episodes, repeat=5))
+    new_time = min(timeit.repeat(columnar, number=episodes, repeat=5))
+    old_bytes = sum(state.nbytes for state in states)
+    new_bytes = log.states.nbytes // 2 + log.actors.nbytes + log.actions.nbytes + log.legal.nbytes + \
+        log.is_discard.nbytes + log.rewards.nbytes  # the states are logged as 16 bit halves
+    print(f"log and reward {steps} steps, stack {batch_size}: GameLog {new_time / episodes * 1e6:.0f} us, "
+          f"list of dicts {old_time / episodes * 1e6:.0f} us ({old_time / new_time:.1f}x speedup)")
+    print(f"memory per step: GameLog {new_bytes / steps:.0f} bytes for every column, "
+          f"list of dicts {old_bytes / steps:.0f} bytes for the states alone")
+
+
+if __name__ == "__main__":
+    main()
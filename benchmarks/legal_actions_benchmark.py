@@ -0,0 +1,76 @@
+"""
+legal_actions_benchmark.py - cost of working out every player's legal actions
+
+Compares MahjongGame.legal_action_mask, which reads each hand's tile counts once,
+against the previous per player get_legal_actions, which called validate_actions
+once per claim, over the discards of random games. Run from the repository root with
+    python -m benchmarks.legal_actions_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+from typing import List
+
+import numpy as np
+
+from mahjong_environment.mahjong_actions import MahjongActions
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+
+_CLAIMS = {MahjongActions.WIN: "win", MahjongActions.ADD_KONG: "kong", MahjongActions.PONG: "pong",
+           MahjongActions.LOWER_SHEUNG: "lower sheung", MahjongActions.MIDDLE_SHEUNG: "middle sheung",
+           MahjongActions.UPPER_SHEUNG: "upper sheung"}
+
+
+def _legacy_legal_actions(game: MahjongGame) -> List[List[int]]:
+    """
+    MahjongGame.get_legal_actions for every player before legal_action_mask, in the response phase
+    """
+    return [[MahjongActions.PASS] if player is game.current_player else
+            [action for action, claim in _CLAIMS.items() if game.validate_actions(player, claim)]
+            + [MahjongActions.PASS] for player in game.players]
+
+
+def _response_phases(number: int, seed: int = 0) -> List[MahjongGame]:
+    """
+    Clones of random games right after a discard, waiting for the other players to respond
+    """
+    rng = random.Random(seed)
+    games = []
+    while len(games) < number:
+        game = MahjongGame([Player(i, i) for i in range(4)], 'east', verbose=False, rng=random.Random(rng.random()))
+        while game.tiles_remaining > 0 and not game.game_over and len(games) < number:
+            hand = game.current_player.hidden_hand
+            game.apply((game.current_player_no, rng.randrange(len(hand))))
+            games.append(game.clone())
+            game.apply(((game.current_player_no + 1) % 4, MahjongActions.PASS))
+    return games
+
+
+def main(number: int = 2000) -> None:
+    games = _response_phases(number)
+    claims = 0
+    for game in games:
+        mask = game.legal_action_mask()
+        assert [np.flatnonzero(row).tolist() for row in mask] == _legacy_legal_actions(game)
+        claims += int(mask[:, :MahjongActions.PASS].any())
+
+    def mask_all():
+        for game in games:
+            game.legal_action_mask()
+
+    def legacy_all():
+        for game in games:
+            _legacy_legal_actions(game)
+
+    new_time = min(timeit.repeat(mask_all, number=1, repeat=5))
+    old_time = min(timeit.repeat(legacy_all, number=1, repeat=5))
+    print(f"legal actions of all four players: legal_action_mask {new_time / number * 1e6:.1f} us, "
+          f"legacy {old_time / number * 1e6:.1f} us ({old_time / new_time:.1f}x speedup over {number} discards, "
+          f"{claims} of which could be claimed)")
+
+
+if __name__ == "__main__":
+    main()
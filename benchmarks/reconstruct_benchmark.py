@@ -0,0 +1,107 @@
+"""
+reconstruct_benchmark.py - cost of rebuilding a game from a state vector
+
+Compares MahjongGame.reconstruct_game, which derives the wall as 4 - counts,
+against the previous implementation, which rebuilt all 144 tiles, removed every
+tile in a hand, set or pile from that list one at a time and re-encoded every
+player to check the round trip. Also times the two ways of branching from a
+live game without going through the state at all, MahjongGame.clone and
+MahjongGame.apply followed by undo. Run from the repository root with
+    python -m benchmarks.reconstruct_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+from typing import List, Tuple
+
+import numpy as np
+
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+from mahjong_environment.tile import MahjongTile
+
+
+def _legacy_reconstruct_game(state: np.ndarray) -> Tuple[MahjongGame, List[MahjongTile]]:
+    """
+    The tile bookkeeping of MahjongGame.reconstruct_game before the count based wall,
+    returning the game and its wall
+    """
+    game = object.__new__(MahjongGame)
+    players = []
+    for i in range(4):
+        player_state = state[i * 217:(i + 1) * 217]
+        player = Player(player_id=i, player_order=i)
+        player.hidden_hand = Player.create_tile_pile(player_state[:34])
+        player.revealed_sets = Player.create_revealed_sets(player_state[34:34 * 5])
+        player.discard_pile = Player.create_tile_pile(player_state[34 * 5:34 * 6])
+        player.flowers = Player.create_flowers(player_state[34 * 6:34 * 6 + 8])
+        players.append(player)
+        regenerated = game.get_player_state(player)
+        assert all(regenerated[j] == player_state[j] for j in range(len(regenerated) - 5))
+    game.players = players
+    wall = MahjongGame.initialize_tiles()
+    for player in players:
+        tiles = list(player.hidden_hand) + [tile for meld in player.revealed_sets for tile in meld]
+        for tile in tiles + list(player.flowers) + list(player.discard_pile):
+            wall.remove(tile)
+    return game, wall
+
+
+def _random_states(number: int, seed: int = 0) -> List[np.ndarray]:
+    """
+    States from random draw/discard plies, spread over whole games
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    states = []
+    while len(states) < number:
+        game = MahjongGame([Player(i, i) for i in range(4)], 'east')
+        while game.tiles_remaining > 0 and len(states) < number:
+            player = game.current_player
+            game.discard_tile(player, tile=player.hidden_hand[rng.randrange(len(player.hidden_hand))])
+            game.next_turn()
+            game.draw_tile(game.current_player)
+            states.append(game.get_state())
+    return states
+
+
+def main(number: int = 500) -> None:
+    states = _random_states(number)
+    for state in states:
+        game, _ = MahjongGame.reconstruct_game(state, strict=True)
+        assert sorted(game.tiles) == sorted(_legacy_reconstruct_game(state)[1])
+
+    def reconstruct_new():
+        for state in states:
+            MahjongGame.reconstruct_game(state)
+
+    def reconstruct_legacy():
+        for state in states:
+            _legacy_reconstruct_game(state)
+
+    new_time = min(timeit.repeat(reconstruct_new, number=1, repeat=5))
+    old_time = min(timeit.repeat(reconstruct_legacy, number=1, repeat=5))
+    print(f"reconstruct_game: count based {new_time / number * 1e6:.0f} us, legacy {old_time / number * 1e6:.0f} us "
+          f"({old_time / new_time:.1f}x speedup over {number} states)")
+
+    game, _ = MahjongGame.reconstruct_game(states[number // 2])
+    game.get_state()
+    clone_time = min(timeit.repeat(game.clone, number=number, repeat=5))
+    round_trip_time = min(timeit.repeat(lambda: MahjongGame.reconstruct_game(game.get_state()), number=number,
+                                        repeat=5))
+    transition = game.find_legal_transitions()[0]
+
+    def apply_undo():
+        game.apply(transition)
+        game.undo()
+
+    apply_time = min(timeit.repeat(apply_undo, number=number, repeat=5))
+    print(f"branching a live game: apply + undo {apply_time / number * 1e6:.0f} us, "
+          f"clone {clone_time / number * 1e6:.0f} us, "
+          f"get_state + reconstruct_game {round_trip_time / number * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+scoring_benchmark.py - micro-benchmark for fan scoring
+
+Compares scoring.hand_fan (used by Player.score_hand and Player.potential_fan)
+against the previous implementation, which copied the sets, popped honour sets
+out of the copy and printed every pattern when scoring a win, and times a hit in
+FAN_CACHE against evaluating the same hidden hand again. Run from the
+repository root with
+    python -m benchmarks.scoring_benchmark
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import random
+import timeit
+from typing import List
+
+import numpy as np
+
+from mahjong_environment.hand import CountedTileList, MeldList
+from mahjong_environment.scoring import FAN_CACHE, _completed_fan, hand_fan
+from mahjong_environment.tile import MahjongTile
+
+
+def _legacy_fan(potential_hand: List[List[MahjongTile]], flowers: List[MahjongTile], circle_wind, player_number,
+                verbose: bool) -> int:
+    """
+    Player.score_hand (verbose) and Player.potential_fan (not verbose, normalised) before scoring.py
+    """
+    if len(potential_hand) == 0:
+        return 0
+    hand_copy = [list(full_set) for full_set in potential_hand]
+    flower_copy = list(flowers)
+    log = print if verbose else (lambda *args: None)
+    fan = 0
+    ordered_flower = ['plum', 'orchid', 'chrysanthemum', 'bamboo']
+    ordered_season = ['summer', 'spring', 'autumn', 'winter']
+    ordered_cardinal = ['east', 'south', 'west', 'north']
+    if len(flower_copy) == 0:
+        fan += 1
+        log("No flowers")
+    elif {'plum', 'orchid', 'chrysanthemum', 'bamboo'} <= {flower.numchar for flower in flower_copy}:
+        fan += 2
+        log("Full set of flowers")
+    elif {'summer', 'spring', 'autumn', 'winter'} <= {flower.numchar for flower in flower_copy}:
+        fan += 2
+        log("Full set of flowers")
+    else:
+        if any(flower.numchar == ordered_flower[player_number] for flower in flower_copy):
+            fan += 1
+            log("Correct flowers")
+        if any(season.numchar == ordered_season[player_number] for season in flower_copy):
+            fan += 1
+            log("Correct flowers")
+
+    honour_sets = []
+    wind_sets = []
+    i = 0
+    while i < len(hand_copy):
+        if hand_copy[i][0].subtype == 'dragon':
+            honour_sets.append(hand_copy.pop(i))
+            i -= 1
+        elif hand_copy[i][0].subtype == 'wind':
+            wind_sets.append(hand_copy.pop(i))
+            i -= 1
+        i += 1
+
+    if len(honour_sets) == 3 and all(len(full_set) == 3 for full_set in honour_sets):
+        log("Great dragons")
+        return fan + 8
+    elif len(honour_sets) == 3:
+        log("Small dragon")
+        fan += 5
+    else:
+        dragon_sets = len([full_set for full_set in honour_sets if len(full_set) > 2])
+        fan += dragon_sets
+        for _ in range(dragon_sets):
+            log("Dragon")
+
+    if len(wind_sets) == 4 and all(len(full_set) == 3 for full_set in wind_sets):
+        log("Great winds")
+        return fan + 13
+    elif len(wind_sets) == 4:
+        fan += 6
+        log("Minor winds")
+    else:
+        if any(full_set[0].numchar == circle_wind and len(full_set) == 3 for full_set in wind_sets):
+            fan += 1
+            log("Correct circle wind")
+        if any(full_set[0].numchar == ordered_cardinal[player_number] and
+               len(full_set) == 3 for full_set in wind_sets):
+            fan += 1
+            log("Correct player wind")
+
+    if all(hand_copy[i][0].subtype == hand_copy[i + 1][0].subtype for i in range(0, len(hand_copy) - 1)):
+        if len(honour_sets) == 0 and len(wind_sets) == 0:
+            fan += 5
+            log("All one set")
+        else:
+            fan += 3
+            log("Mixed one set")
+
+    i = 0
+    while i < len(hand_copy) and len(hand_copy[i]) == 3:
+        i += 1
+    if i != len(hand_copy):
+        hand_copy.pop(i)
+
+    if all(tile[0] == tile[1] for tile in hand_copy):
+        fan += 3
+        log("All triplets")
+    elif all(tile[0].tiletype == "suit" and tile[1].tiletype == "suit" and
+             tile[0].numchar == tile[1].numchar + 1 for tile in hand_copy):
+        fan += 1
+        log("All straights")
+    return fan if verbose else fan * len(potential_hand) * 3 // 14
+
+
+def _random_hands(count: int, seed: int = 0):
+    """
+    Random hands of up to four sets and a pair, with random flowers
+    """
+    rng = random.Random(seed)
+    hands = []
+    for _ in range(count):
+        melds = []
+        for _ in range(rng.randrange(5)):
+            if rng.random() < 0.5:
+                start = rng.randrange(3) * 9 + rng.randrange(7)
+                melds.append([MahjongTile.index_to_tile(start + offset) for offset in range(3)])
+            else:
+                melds.append([MahjongTile.index_to_tile(rng.randrange(34))] * 3)
+        melds.append([MahjongTile.index_to_tile(rng.randrange(34))] * 2)
+        flowers = [MahjongTile.from_code(code) for code in rng.sample(range(34, 42), rng.randrange(4))]
+        hands.append((melds, flowers, rng.choice(['east', 'south', 'west', 'north']), rng.randrange(4)))
+    return hands
+
+
+def main(number: int = 20000) -> None:
+    hands = _random_hands(number)
+    for melds, flowers, circle_wind, seat in hands:
+        assert hand_fan(melds, flowers, circle_wind, seat, True) == _legacy_fan(melds, flowers, circle_wind, seat,
+                                                                                False)
+
+    def score_hand_new():
+        for melds, flowers, circle_wind, seat in hands:
+            hand_fan(melds, flowers, circle_wind, seat)
+
+    def score_hand_legacy():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for melds, flowers, circle_wind, seat in hands:
+                _legacy_fan(melds, flowers, circle_wind, seat, True)
+
+    def potential_fan_new():
+        for melds, flowers, circle_wind, seat in hands:
+            hand_fan(melds, flowers, circle_wind, seat, True)
+
+    def potential_fan_legacy():
+        for melds, flowers, circle_wind, seat in hands:
+            _legacy_fan(melds, flowers, circle_wind, seat, False)
+
+    for name, new, old in (("score_hand", score_hand_new, score_hand_legacy),
+                           ("potential_fan", potential_fan_new, potential_fan_legacy)):
+        new_time = min(timeit.repeat(new, number=1, repeat=5))
+        old_time = min(timeit.repeat(old, number=1, repeat=5))
+        print(f"{name}: scoring.py {new_time * 1e3:.1f} ms, legacy {old_time * 1e3:.1f} ms "
+              f"({old_time / new_time:.1f}x speedup over {number} hands)")
+
+    # the random hands as hidden hands, where every tile fits in the wall
+    hidden_hands = []
+    for melds, flowers, circle_wind, seat in hands:
+        counts = np.zeros(34, dtype=np.uint8)
+        for meld in melds:
+            for tile in meld:
+                counts[tile.to_index()] += 1
+        if counts.max() <= 4:
+            hidden_hands.append((counts, MeldList(), CountedTileList(flowers), circle_wind, seat))
+
+    def completed_fan_cached():
+        for args in hidden_hands:
+            FAN_CACHE.fan(*args)
+
+    def completed_fan_uncached():
+        for args in hidden_hands:
+            _completed_fan(*args)
+
+    completed_fan_cached()  # every later call is a hit
+    hit_time = min(timeit.repeat(completed_fan_cached, number=1, repeat=5))
+    miss_time = min(timeit.repeat(completed_fan_uncached, number=1, repeat=5))
+    print(f"completed_fan: FAN_CACHE hit {hit_time * 1e3:.1f} ms, evaluated {miss_time * 1e3:.1f} ms "
+          f"({miss_time / hit_time:.1f}x speedup over {len(hidden_hands)} hands)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+simulation_benchmark.py - games per second of headless self-play
+
+Runs simulation.simulate with four copies of each bot, and once with verbose
+games writing their usual output to the terminal device (or /dev/null when
+there is none) to show what printing costs. Run from the repository root with
+    python -m benchmarks.simulation_benchmark
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import random
+import sys
+import time
+
+from mahjong_environment.ai_bot import BasicBot, RandomBot, YesBot
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.simulation import simulate
+
+
+def _verbose_games_per_second(bot, games: int, seed: int) -> float:
+    random.seed(seed)
+    device = os.ttyname(sys.stdout.fileno()) if sys.stdout.isatty() else os.devnull
+    with open(device, 'w') as out, contextlib.redirect_stdout(out):
+        start = time.perf_counter()
+        for _ in range(games):
+            MahjongGame([bot(seat, seat) for seat in range(4)], 'east').play_round()
+        return games / (time.perf_counter() - start)
+
+
+def main(games: int = 200, seed: int = 0) -> None:
+    for bot in (RandomBot, YesBot, BasicBot):
+        result = simulate(games, [bot] * 4, seed=seed)
+        wins = result.winner >= 0
+        mean_fan = result.fan[wins].mean() if wins.any() else 0.0
+        print(f"{bot.__name__}: {result.games_per_second:,.0f} games/s headless, "
+              f"{wins.mean():.1%} won, mean fan {mean_fan:.1f}, mean turns {result.turns.mean():.0f}")
+    print(f"RandomBot printing every game: {_verbose_games_per_second(RandomBot, games, seed):,.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+state_benchmark.py - per-ply cost of encoding the game state
+
+Plays random draw/discard plies and encodes the state after each one, with the
+incrementally updated MahjongGame.get_state and with the previous encoder which
+concatenated a fresh array for every block. Run from the repository root with
+    python -m benchmarks.state_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import time
+
+import numpy as np
+
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+
+
+def _legacy_get_state(game: MahjongGame) -> np.ndarray:
+    """
+    MahjongGame.get_state before the preallocated buffer
+    """
+    player_states_vec = np.concatenate([game.get_player_state(player).flatten() for player in game.players])
+    latest_tile_vec = np.zeros(34, dtype=np.float32)
+    if game.latest_tile is not None:
+        latest_tile_vec[game.latest_tile.to_index()] = 1.0
+    discarding_player_vec = np.zeros(4, dtype=np.float32)
+    if game.discarding_player is not None:
+        discarding_player_vec[game.discarding_player.player_id] = 1.0
+    tiles_remaining = np.array([game.tiles_remaining / 144], dtype=np.float32)
+    current_turn = np.zeros(len(game.players), dtype=np.float32)
+    current_turn[game.current_player.player_order] = 1.0
+    circle_wind_vec = np.zeros(4, dtype=np.float32)
+    circle_wind_vec[{'east': 0, 'south': 1, 'west': 2, 'north': 3}[game.circle_wind]] = 1.0
+    last_acting_player_vec = np.zeros(4, dtype=np.float32)
+    if game.last_acting_player is not None:
+        last_acting_player_vec[game.last_acting_player.player_id] = 1.0
+    is_discard_vec = np.array([float(game.is_discard)], dtype=np.float32)
+    return np.concatenate([player_states_vec, latest_tile_vec, discarding_player_vec, tiles_remaining, current_turn,
+                           circle_wind_vec, last_acting_player_vec, is_discard_vec])
+
+
+def _play(encode, games: int, seed: int = 0) -> float:
+    """
+    Return the seconds spent in encode over every ply of the given number of games
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    encoding = 0.0
+    for _ in range(games):
+        game = MahjongGame([Player(i, i) for i in range(4)], 'east')
+        while game.tiles_remaining > 0:
+            player = game.current_player
+            tile = player.hidden_hand[rng.randrange(len(player.hidden_hand))]
+            game.discard_tile(player, tile=tile)
+            game.next_turn()
+            game.draw_tile(game.current_player)
+            start = time.perf_counter()
+            encode(game)
+            encoding += time.perf_counter() - start
+    return encoding
+
+
+def main(games: int = 50, repeat: int = 5) -> None:
+    new_times, old_times = [], []
+    for _ in range(repeat):  # interleaved, so a slow patch of the machine hits both encoders
+        new_times.append(_play(MahjongGame.get_state, games))
+        old_times.append(_play(_legacy_get_state, games))
+    new_time, old_time = min(new_times), min(old_times)
+    print(f"get_state: incremental {new_time * 1e3:.1f} ms, legacy {old_time * 1e3:.1f} ms "
+          f"({old_time / new_time:.1f}x speedup over {games} games)")
+
+
+if __name__ == "__main__":
+    main()
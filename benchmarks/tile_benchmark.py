@@ -0,0 +1,105 @@
+"""
+tile_benchmark.py - micro-benchmark for MahjongTile comparisons in hand maintenance
+
+Compares Player.add_tile and Player.decide_pong on the integer sort key against the
+previous dict-based string comparisons. Run from the repository root with
+    python -m benchmarks.tile_benchmark
+"""
+
+from __future__ import annotations
+
+import bisect
+import random
+import timeit
+
+from mahjong_environment.hand import CountedTileList
+from mahjong_environment.player import Player
+from mahjong_environment.tile import MahjongTile
+
+
+class _LegacyOrderedTile:
+    """
+    Wraps a tile with the comparisons MahjongTile used before the integer sort key
+    """
+    __slots__ = ('tile', 'subtype', 'numchar')
+
+    def __init__(self, tile: MahjongTile):
+        self.tile = tile
+        self.subtype = tile.subtype
+        self.numchar = tile.numchar
+
+    def __eq__(self, other: _LegacyOrderedTile):
+        return self.subtype == other.subtype and self.numchar == other.numchar
+
+    def __lt__(self, other: _LegacyOrderedTile):
+        suit_order = {'circle': 0, 'bamboo': 1, 'number': 2, 'wind': 3, 'dragon': 4, 'flower': 5, 'season': 6}
+        if self.subtype != other.subtype:
+            return suit_order[self.subtype] < suit_order[other.subtype]
+        return self.numchar < other.numchar
+
+    def __le__(self, other: _LegacyOrderedTile):
+        suit_order = {'circle': 0, 'bamboo': 1, 'number': 2, 'wind': 3, 'dragon': 4, 'flower': 5, 'season': 6}
+        if self.subtype != other.subtype:
+            return suit_order[self.subtype] <= suit_order[other.subtype]
+        return self.numchar <= other.numchar
+
+
+def _random_hands(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [[MahjongTile.index_to_tile(rng.randrange(34)) for _ in range(14)] for _ in range(count)]
+
+
+def _fill(tiles) -> None:
+    hand = []
+    for tile in tiles:
+        bisect.insort(hand, tile)
+
+
+def _pong_checks(hand, probes) -> None:
+    for probe in probes:
+        index = bisect.bisect_left(hand, probe)
+        if 1 <= index < len(hand) - 1 and hand[index] == probe:
+            _ = hand[index + 1] == probe or hand[index - 1] == probe
+
+
+def main(number: int = 2000) -> None:
+    hands = _random_hands(number)
+    legacy_hands = [[_LegacyOrderedTile(tile) for tile in hand] for hand in hands]
+    probes = [MahjongTile.index_to_tile(i) for i in range(34)]
+    legacy_probes = [_LegacyOrderedTile(tile) for tile in probes]
+
+    player = Player(player_id=0, player_order=0)
+
+    def add_tile_sort_key():
+        for hand in hands:
+            player.hidden_hand = []
+            for tile in hand:
+                player.add_tile(tile)
+
+    def add_tile_legacy():
+        for hand in legacy_hands:
+            _fill(hand)
+
+    sorted_hands = [CountedTileList(sorted(hand[:13])) for hand in hands]
+    sorted_legacy_hands = [sorted(hand[:13]) for hand in legacy_hands]
+
+    def decide_pong_sort_key():
+        for hand in sorted_hands:
+            player.hidden_hand = hand
+            for probe in probes:
+                player.decide_pong(probe)
+
+    def decide_pong_legacy():
+        for hand in sorted_legacy_hands:
+            _pong_checks(hand, legacy_probes)
+
+    for name, new, old in (("add_tile", add_tile_sort_key, add_tile_legacy),
+                           ("decide_pong", decide_pong_sort_key, decide_pong_legacy)):
+        new_time = min(timeit.repeat(new, number=1, repeat=20))
+        old_time = min(timeit.repeat(old, number=1, repeat=20))
+        print(f"{name}: sort key {new_time * 1e3:.1f} ms, legacy {old_time * 1e3:.1f} ms "
+              f"({old_time / new_time:.1f}x speedup over {number} hands)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+tournament_benchmark.py - scaling of MahjongTable.run_concurrent_games
+
+Plays the same tables with one worker process and with one per core, and
+reports tables per second for both. Run from the repository root with
+    python -m benchmarks.tournament_benchmark
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+from mahjong_environment.ai_bot import BasicBot, YesBot
+from mahjong_environment.mahjong_table import MahjongTable
+
+
+def main(n_tables: int = 8, max_games: int = 20) -> None:
+    bots = (BasicBot, YesBot, BasicBot, YesBot)
+    cores = os.cpu_count() or 1
+    timings = {}
+    for processes in sorted({1, cores}):
+        start = time.perf_counter()
+        result = MahjongTable.run_concurrent_games(n_tables, bots, seed=0, processes=processes, max_games=max_games)
+        timings[processes] = time.perf_counter() - start
+        print(f"{processes} process(es): {n_tables / timings[processes]:.2f} tables/s, "
+              f"{result.games.sum() / timings[processes]:.1f} games/s, scores by bot {result.scores_by_bot()}")
+    print(f"{timings[1] / timings[cores]:.1f}x speedup on {cores} core(s)")
+
+
+if __name__ == "__main__":
+    main()
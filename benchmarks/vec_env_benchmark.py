@@ -0,0 +1,79 @@
+"""
+vec_env_benchmark.py - self-play steps per second, one game at a time or in lockstep
+
+Drives games with a linear policy over the observation, masked by the legal
+actions, the way a learner would. The serial loop steps one
+MahjongEnvironmentAdapter and evaluates the policy once per step, the
+VecMahjongEnv loop steps every game at once and evaluates the policy once per
+step for all of them. SubprocVecMahjongEnv does the same with the games split
+between worker processes, so it should scale with the number of cores up to
+the point where the policy becomes the bottleneck. Run from the repository root with
+    python -m benchmarks.vec_env_benchmark
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+import numpy as np
+
+from mahjong_environment.mahjong_game import MahjongGame, NUM_ACTIONS
+from mahjong_environment.mahjong_game_adapter import MahjongEnvironmentAdapter
+from mahjong_environment.player import Player
+from mahjong_environment.vec_env import SubprocVecMahjongEnv, VecMahjongEnv
+
+
+def _masked_argmax(logits: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    return np.where(masks, logits[..., None, :], -np.inf).argmax(axis=-1)
+
+
+def _serial_steps_per_second(weights: np.ndarray, steps: int) -> float:
+    players = [Player(seat, seat) for seat in range(4)]
+    env = MahjongEnvironmentAdapter(controlling_player_id=0,
+                                    game=MahjongGame(players, 'east', verbose=False, rng=MahjongGame.game_rng(0, 0)))
+    observation = env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = _masked_argmax(observation @ weights, env.game.legal_action_mask())
+        observation, done = env.step_with_all_actions(list(enumerate(actions.tolist())))
+        if done or env.game.tiles_remaining == 0:
+            observation = env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def _vectorised_steps_per_second(weights: np.ndarray, steps: int, num_envs: int, workers: int = 0) -> float:
+    """
+    Steps per second of a VecMahjongEnv, or of a SubprocVecMahjongEnv with that many workers
+    """
+    if workers:
+        with SubprocVecMahjongEnv(num_envs, seed=0, workers=workers) as env:
+            return _run(env, weights, steps, num_envs)
+    return _run(VecMahjongEnv(num_envs, seed=0), weights, steps, num_envs)
+
+
+def _run(env, weights: np.ndarray, steps: int, num_envs: int) -> float:
+    observations, masks = env.reset()
+    start = time.perf_counter()
+    for _ in range(steps // num_envs):
+        observations, masks, _, _ = env.step(_masked_argmax(observations @ weights, masks))
+    return steps // num_envs * num_envs / (time.perf_counter() - start)
+
+
+def main(steps: int = 4096) -> None:
+    weights = np.random.default_rng(0).standard_normal((MahjongGame.state_size, NUM_ACTIONS)).astype(np.float32)
+    serial = _serial_steps_per_second(weights, steps)
+    print(f"one adapter: {serial:,.0f} game steps/s, one policy call per step")
+    for num_envs in (16, 64, 256):
+        vectorised = _vectorised_steps_per_second(weights, steps, num_envs)
+        print(f"VecMahjongEnv({num_envs}): {vectorised:,.0f} game steps/s ({vectorised / serial:.1f}x), "
+              f"one policy call per {num_envs} steps")
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, 2, cores}):
+        vectorised = _vectorised_steps_per_second(weights, steps * 2, 256, workers)
+        print(f"SubprocVecMahjongEnv(256, workers={workers}): {vectorised:,.0f} game steps/s "
+              f"({vectorised / serial:.1f}x) on {cores} cores")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+wall_benchmark.py - cost of shuffling and drawing from the wall
+
+Compares the Wall, a uint8 array of tile codes shuffled in place with one
+NumPy permutation and drawn from by moving a pointer at either end, against the
+previous list of 144 tiles copied from the full set and shuffled with
+random.shuffle on every reset, then popped from one end. Also times a whole
+MahjongGame.setup_game, which deals the hands as well. Run from the repository
+root with
+    python -m benchmarks.wall_benchmark
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+import numpy as np
+
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+from mahjong_environment.wall import Wall
+
+
+def main(number: int = 2000) -> None:
+    rng = random.Random(0)
+
+    def legacy():
+        tiles = MahjongGame.initialize_tiles()
+        rng.shuffle(tiles)
+        while tiles:
+            tiles.pop()
+
+    generator = np.random.default_rng(0)
+    wall = Wall(MahjongGame._full_wall_codes)
+
+    def array_wall():
+        wall.shuffle(generator)
+        while len(wall) > 1:
+            wall.draw()
+            wall.draw_replacement()
+
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=5))
+    wall_time = min(timeit.repeat(array_wall, number=number, repeat=5))
+    legacy_shuffle = min(timeit.repeat(lambda: rng.shuffle(MahjongGame.initialize_tiles()), number=number, repeat=5))
+    wall_shuffle = min(timeit.repeat(lambda: wall.shuffle(generator), number=number, repeat=5))
+    print(f"shuffle: Wall {wall_shuffle / number * 1e6:.1f} us, list {legacy_shuffle / number * 1e6:.1f} us "
+          f"({legacy_shuffle / wall_shuffle:.1f}x speedup)")
+    print(f"shuffle and draw all 144 tiles: Wall {wall_time / number * 1e6:.1f} us, "
+          f"list {legacy_time / number * 1e6:.1f} us ({legacy_time / wall_time:.1f}x speedup)")
+
+    players = [Player(i, i) for i in range(4)]
+    game = MahjongGame(players, 'east', verbose=False, rng=random.Random(0))
+
+    def reset():
+        for player in players:
+            player.soft_reset()
+        game.setup_game()
+
+    setup_time = min(timeit.repeat(reset, number=number // 4, repeat=5))
+    print(f"MahjongGame.setup_game, dealing included: {setup_time / (number // 4) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
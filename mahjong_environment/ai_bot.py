@@ -9,22 +9,21 @@ including:
 
 from __future__ import annotations
 
-import math
-import random
-
 import numpy as np
 
-from player import Player
+from mahjong_environment.hand_analysis import NOT_IN_HAND, ukeire
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
 from typing import Tuple
 
-from tile import MahjongTile
+from mahjong_environment.tile import MahjongTile
 
 
 class RandomBot(Player):
     def decide_pong(self, tile: MahjongTile, state: np.ndarray = None):
         if not super().decide_pong(tile):
             return False
-        is_pong = random.choice([True, False])
+        is_pong = self.rng.choice([True, False])
 
         return is_pong
 
@@ -32,7 +31,7 @@ class RandomBot(Player):
         if not super().decide_add_kong(latest_tile):
             return False
 
-        is_kong = random.choice([True, False])  # doesn't work because check if kong
+        is_kong = self.rng.choice([True, False])  # doesn't work because check if kong
 
         return is_kong
 
@@ -43,17 +42,18 @@ class RandomBot(Player):
         possible_sheungs = self.show_all_possible_sheungs(latest_tile)
         if all(sheung is None for sheung in possible_sheungs):
             return None
-        is_sheung = random.choice([True, False])
+        is_sheung = self.rng.choice([True, False])
         if is_sheung:
-            decided_sheung = random.choice([indices for indices in possible_sheungs if indices is not None])
+            decided_sheung = self.rng.choice([indices for indices in possible_sheungs if indices is not None])
             return decided_sheung
 
         return None
 
     def discard_tile(self, state: np.ndarray = None) -> MahjongTile:
-        removed_tile = random.choice(self.hidden_hand)
+        removed_tile = self.rng.choice(self.hidden_hand)
         # print("PLAYER " + str(self.player_id) + " DISCARDED")
-        print(removed_tile)
+        if self.verbose:
+            print(removed_tile)
         return removed_tile
 
 
@@ -77,11 +77,11 @@ class YesBot(Player):
         if all(sheung is None for sheung in possible_sheungs):
             return None
 
-        decided_sheung = random.choice([indices for indices in possible_sheungs if indices is not None])
+        decided_sheung = self.rng.choice([indices for indices in possible_sheungs if indices is not None])
         return decided_sheung
 
     def discard_tile(self, state: np.ndarray = None) -> MahjongTile:
-        removed_tile = random.choice(self.hidden_hand)
+        removed_tile = self.rng.choice(self.hidden_hand)
         return removed_tile
 
 
@@ -107,64 +107,31 @@ class BasicBot(Player):
         if all(sheung is None for sheung in possible_sheungs):
             return None
 
-        decided_sheung = random.choice([indices for indices in possible_sheungs if indices is not None])
+        decided_sheung = self.rng.choice([indices for indices in possible_sheungs if indices is not None])
         return decided_sheung
 
-    def discard_tile(self, state: np.ndarray = None) -> MahjongTile:
-
-        lowest_tile_needed = math.inf
-        discarded_tile = None
-        current_hand = [tile for subset in self.revealed_sets for tile in subset] + self.hidden_hand.copy()
-
-        for tile in self.hidden_hand:
-            tile_needed = self.calculate_tiles_required(current_hand, tile)
-            if tile_needed < lowest_tile_needed:
-                discarded_tile = tile
-                lowest_tile_needed = tile_needed
-        if discarded_tile is None:
+    def discard_tile(self, state: np.ndarray = None, visible_counts: np.ndarray = None) -> MahjongTile:
+        """
+        Discard the tile which leaves the lowest shanten, breaking ties by the number
+        of live tiles that would then improve the hand. The live tiles need what every
+        player has revealed or discarded, so either the state or visible_counts is required.
+        :param state: the game state, which the game always passes
+        :param visible_counts: uint8[34] counts of every tile in a discard pile or revealed set, e.g.
+                               MahjongGame.visible_counts(), for a call without a state
+        """
+        if state is not None:
+            visible_counts = MahjongGame.visible_counts_from_state(state)
+        elif visible_counts is None:
+            raise ValueError("BasicBot.discard_tile needs the game state or its visible counts to count live tiles")
+        analysis = ukeire(self.hidden_counts, visible_counts, len(self.revealed_sets))
+        if not (analysis.shanten != NOT_IN_HAND).any():
             self.print_hand()
             raise ValueError(f"Length of hidden hand is {len(self.hidden_hand)}")
-        return discarded_tile
 
-    def calculate_tiles_required(self, hand, removed_tile) -> int:
-        """
-        Return the tiles required to complete the hand
-        """
-        hand_copy = hand.copy()
-        hand_copy.remove(removed_tile)
-        i = 0
-        pair = False
-        complete_sets = 0
-        incomplete_sets = 0
-
-        while i < len(hand_copy) - 2:
-            if hand_copy[i] == hand_copy[i + 1]:
-                if hand_copy[i] == hand_copy[i + 2]:
-                    complete_sets += 1
-                    for _ in range(3):
-                        hand_copy.pop(i)
-                else:
-                    for _ in range(2):
-                        hand_copy.pop(i)
-                    if not pair:
-                        pair = True
-                    else:
-                        incomplete_sets += 1
-                pass
-            elif (hand_copy[i].tiletype == "suit" and hand_copy[i].subtype == hand_copy[i + 1].subtype and
-                  hand_copy[i].numchar == hand_copy[i + 1].numchar - 1):
-                if (hand_copy[i].subtype == hand_copy[i + 2].subtype and hand_copy[i].numchar ==
-                        hand_copy[i + 2].numchar - 2):
-                    complete_sets += 1
-                    for j in range(3):
-                        hand_copy.pop(i)
-                else:
-                    for j in range(2):
-                        hand_copy.pop(i)
-                    incomplete_sets += 1
-            else:
-                i += 1
-        return 8 - (2 * complete_sets) - incomplete_sets - int(pair)
+        acceptance = analysis.acceptance()
+        best_index = min(np.flatnonzero(analysis.shanten != NOT_IN_HAND).tolist(),
+                         key=lambda index: (analysis.shanten[index], -acceptance[index]))
+        return MahjongTile.index_to_tile(best_index)
 
 # TODO: function to discourage showing hand
 # TODO: function to discourage locking into hands
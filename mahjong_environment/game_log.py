@@ -0,0 +1,190 @@
+"""
+game_log.py - columnar trajectory log of a game or a training run
+
+Every column is a preallocated NumPy array which doubles in size when it is
+full, so logging a step is a handful of row writes rather than a dict holding
+its own copy of the state. The states are kept compact, as the upper 16 bits of
+each float32 entry (a truncated bfloat16), which is exact for every count and
+one-hot entry of MahjongGame.get_state and keeps 8 significant bits of the
+normalised tiles remaining and potential fans. An append copies its state into
+a small float32 block and full blocks are packed with one shift, since a float
+conversion per row would cost more than the rest of the append.
+gather_states widens only the rows a learner samples back to float32. The
+other properties return views of the logged rows, which a learner can index or
+hand to torch.from_numpy as they are.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from mahjong_environment.mahjong_actions import MahjongActions
+
+STATE_DTYPE = np.float32  # the dtype of MahjongGame.get_state and of the states gather_states returns
+INITIAL_CAPACITY = 64  # rows allocated by the first append, about a game's worth of decisions
+PENDING_ROWS = 64  # states appended as float32 before they are packed into the state column together
+
+
+class GameLog:
+    """
+    One row per logged decision. The columns are only allocated by the first
+    append, so a game which never logs anything, e.g. a clone used for search,
+    costs nothing.
+    """
+    state_size: int
+    size: int = 0  # rows logged, the columns hold capacity rows
+    _states: Optional[np.ndarray] = None  # uint16[capacity, state_size], the upper halves of the float32 states
+    _pending: np.ndarray  # float32[PENDING_ROWS, state_size], the states of the rows from _packed on
+    _packed: int = 0  # rows whose state is in _states
+    _actors: np.ndarray  # int8[capacity], player_id of the player acting, -1 if not known
+    _actions: np.ndarray  # int8[capacity], MahjongActions or the index of the discarded tile
+    _legal: np.ndarray  # bool[capacity, NUM_ACTIONS], the actor's row of MahjongGame.legal_action_mask
+    _is_discard: np.ndarray  # bool[capacity], the phase the decision was made in
+    _rewards: np.ndarray  # float32[capacity], 0 until the episode is finished
+    _COLUMNS = ('_states', '_actors', '_actions', '_legal', '_is_discard', '_rewards')
+
+    def __init__(self, state_size: int):
+        self.state_size = state_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _allocate(self, capacity: int) -> None:
+        columns = (np.zeros((capacity, self.state_size), dtype=np.uint16), np.full(capacity, -1, dtype=np.int8),
+                   np.zeros(capacity, dtype=np.int8), np.zeros((capacity, len(MahjongActions)), dtype=bool),
+                   np.zeros(capacity, dtype=bool), np.zeros(capacity, dtype=np.float32))
+        allocated = self._states is not None
+        if allocated:
+            self._pack()
+        else:
+            self._pending = np.zeros((PENDING_ROWS, self.state_size), dtype=STATE_DTYPE)
+        for name, column in zip(GameLog._COLUMNS, columns):
+            if allocated:
+                column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+
+    def append(self, state: np.ndarray, actor: int, action: int, is_discard: bool,
+               legal: Optional[np.ndarray] = None, reward: float = 0.0) -> None:
+        """
+        Log one decision
+        :param state: the state the decision was made from, e.g. MahjongGame.get_state()
+        :param actor: player_id of the player who made it, -1 if not known
+        :param legal: bool[NUM_ACTIONS] actions the actor could take, none recorded if not given
+        """
+        row = self.size
+        if self._states is None or row == len(self._states):
+            self._allocate(max(INITIAL_CAPACITY, 2 * row))
+        elif row - self._packed == PENDING_ROWS:
+            self._pack()
+        self._pending[row - self._packed] = state
+        self._actors[row] = actor
+        self._actions[row] = action
+        self._is_discard[row] = is_discard
+        self._legal[row] = legal if legal is not None else False
+        self._rewards[row] = reward
+        self.size = row + 1
+
+    def _pack(self) -> None:
+        """
+        Move the pending states into the state column, keeping the upper half of
+        each float32
+        """
+        packed, size = self._packed, self.size
+        if size > packed:
+            np.right_shift(self._pending[:size - packed].view(np.uint32), 16, out=self._states[packed:size],
+                           casting='unsafe')
+        self._packed = size
+
+    def truncate(self, size: int) -> None:
+        """
+        Forget every row from size on, the columns keep their capacity
+        """
+        self.size = min(self.size, size)
+        self._packed = min(self._packed, self.size)
+
+    def keep_latest(self, size: int) -> None:
+        """
+        Forget all but the last size rows, moving them to the front
+        """
+        dropped = self.size - size
+        if dropped <= 0:
+            return
+        self._pack()
+        for name in GameLog._COLUMNS:
+            column = getattr(self, name)
+            column[:size] = column[dropped:self.size]
+        self.truncate(size)
+
+    def copy(self) -> GameLog:
+        log = GameLog(self.state_size)
+        if self.size:
+            self._pack()
+            log._allocate(max(INITIAL_CAPACITY, self.size))
+            for name in GameLog._COLUMNS:
+                getattr(log, name)[:self.size] = getattr(self, name)[:self.size]
+            log.size = log._packed = self.size
+        return log
+
+    def set_rewards(self, actor: int, reward: float, start: int = 0) -> None:
+        """
+        Give reward to every step of actor from row start on
+        """
+        if self.size > start:
+            rewards = self._rewards[start:self.size]
+            rewards[self._actors[start:self.size] == actor] = reward
+
+    def finish_episode(self, rewards: Union[Sequence[float], np.ndarray], start: int = 0) -> None:
+        """
+        Give every step from row start on the reward of the player who made it,
+        steps without a known actor keep theirs
+        :param rewards: final reward of each player, indexed by player_id
+        """
+        if self.size > start:
+            actors = self._actors[start:self.size]
+            known = actors >= 0
+            self._rewards[start:self.size][known] = np.asarray(rewards, dtype=np.float32)[actors[known]]
+
+    @property
+    def states(self) -> np.ndarray:
+        """
+        Every logged state, widened to float32 (a copy, unlike the other columns)
+        """
+        return self.gather_states(slice(0, self.size))
+
+    def gather_states(self, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        """
+        Return the logged states of the given rows as a new float32 array, e.g.
+        the batch a learner sampled
+        :param rows: a slice or an index array into the logged rows
+        """
+        if self._states is not None:
+            self._pack()
+        halves = self._column(self._states, (0, self.state_size), np.uint16)[rows]
+        return (halves.astype(np.uint32) << 16).view(STATE_DTYPE)
+
+    @property
+    def actors(self) -> np.ndarray:
+        return self._column(self._actors, (0,), np.int8)
+
+    @property
+    def actions(self) -> np.ndarray:
+        return self._column(self._actions, (0,), np.int8)
+
+    @property
+    def legal(self) -> np.ndarray:
+        return self._column(self._legal, (0, len(MahjongActions)), bool)
+
+    @property
+    def is_discard(self) -> np.ndarray:
+        return self._column(self._is_discard, (0,), bool)
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._column(self._rewards, (0,), np.float32)
+
+    def _column(self, column: Optional[np.ndarray], empty_shape: tuple, dtype) -> np.ndarray:
+        if column is None:
+            return np.zeros(empty_shape, dtype=dtype)
+        return column[:self.size]
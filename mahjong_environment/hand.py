@@ -0,0 +1,236 @@
+"""
+hand.py - count-vector backed tile containers used by Player
+
+Every container keeps a uint8 count per tile code in sync with its contents, so
+claim checks are array lookups and the RL encoders are a single array copy. They
+subclass list so that code which still treats a hand as a sorted list of
+MahjongTile keeps working unchanged.
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import Iterable, List, Union
+
+import numpy as np
+
+from mahjong_environment.tile import MahjongTile, NUM_TILE_CODES, NUM_TILE_TYPES
+
+MAX_MELDS = 4
+next_version = itertools.count(1).__next__  # one counter for every container, so no two share a version
+
+
+class CountedTileList(list):
+    """
+    A list of MahjongTile which maintains the number of copies of each tile.
+
+    counts is a uint8[34] view over the suit and honour tiles (indexed by
+    MahjongTile.to_index()) and flower_counts is a uint8[8] view over the flowers
+    (in Player.encode_flower_set order). Both views share memory with the
+    underlying count array so they never need to be rebuilt. The array itself is
+    a view over a bytearray, which is what single tile updates go through since
+    indexing a bytearray is much cheaper than indexing a numpy array.
+
+    version is set to a new next_version() by every mutation. Versions are never
+    shared between containers, so comparing versions alone tells encoders
+    whether a container changed or was replaced since they last looked.
+    """
+    counts: np.ndarray
+    flower_counts: np.ndarray
+    version: int
+
+    def __init__(self, tiles: Iterable[MahjongTile] = ()):
+        super().__init__(tiles)
+        self._attach_buffer(bytearray(NUM_TILE_CODES))
+        buffer = self._buffer
+        for tile in self:
+            buffer[tile.code] += 1
+
+    def _attach_buffer(self, buffer: bytearray) -> None:
+        self._buffer = buffer
+        self.version = next_version()
+        self._code_counts = np.frombuffer(buffer, dtype=np.uint8)
+        self.counts = self._code_counts[:NUM_TILE_TYPES]
+        self.flower_counts = self._code_counts[NUM_TILE_TYPES:]
+
+    @staticmethod
+    def from_counts(counts: Union[np.ndarray, bytes]) -> CountedTileList:
+        """
+        Build a sorted tile list from a uint8 count vector over tile codes (length 34 or 42)
+        """
+        raw = bytes(counts)  # iterating bytes is much cheaper than numpy for 42 entries
+        tiles = CountedTileList()
+        for code, count in enumerate(raw):
+            if count:
+                list.extend(tiles, [MahjongTile.from_code(code)] * count)
+        tiles._buffer[:len(raw)] = raw
+        return tiles
+
+    def _recount(self) -> None:
+        self.version = next_version()
+        self._code_counts[:] = 0
+        buffer = self._buffer
+        for tile in self:
+            buffer[tile.code] += 1
+
+    def count(self, tile: MahjongTile) -> int:
+        return self._buffer[tile.code]
+
+    def count_index(self, index: int) -> int:
+        """
+        Return the number of copies of the tile with the given to_index() value
+        """
+        return self._buffer[index]
+
+    def __contains__(self, tile: MahjongTile) -> bool:
+        return self._buffer[tile.code] > 0
+
+    def append(self, tile: MahjongTile) -> None:
+        super().append(tile)
+        self._buffer[tile.code] += 1
+        self.version = next_version()
+
+    def insert(self, index: int, tile: MahjongTile) -> None:
+        super().insert(index, tile)
+        self._buffer[tile.code] += 1
+        self.version = next_version()
+
+    def extend(self, tiles: Iterable[MahjongTile]) -> None:
+        tiles = list(tiles)
+        super().extend(tiles)
+        for tile in tiles:
+            self._buffer[tile.code] += 1
+        self.version = next_version()
+
+    def __iadd__(self, tiles: Iterable[MahjongTile]) -> CountedTileList:
+        self.extend(tiles)
+        return self
+
+    def remove(self, tile: MahjongTile) -> None:
+        super().remove(tile)
+        self._buffer[tile.code] -= 1
+        self.version = next_version()
+
+    def pop(self, index: int = -1) -> MahjongTile:
+        tile = super().pop(index)
+        self._buffer[tile.code] -= 1
+        self.version = next_version()
+        return tile
+
+    def clear(self) -> None:
+        super().clear()
+        self._code_counts[:] = 0
+        self.version = next_version()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._recount()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._recount()
+
+    def __imul__(self, value: int) -> CountedTileList:
+        super().__imul__(value)
+        self._recount()
+        return self
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __copy__(self) -> CountedTileList:
+        clone = CountedTileList.__new__(CountedTileList)
+        list.extend(clone, self)
+        clone._attach_buffer(bytearray(self._buffer))
+        return clone
+
+    def __deepcopy__(self, memo) -> CountedTileList:
+        return self.__copy__()  # tiles are immutable so a shallow copy is already deep
+
+
+class MeldList(list):
+    """
+    A list of revealed melds (each a list of MahjongTile) which maintains
+    the tile counts of every meld, both in total and per meld slot.
+
+    Melds must not be mutated after they have been added.
+    """
+    counts: np.ndarray  # uint8[34], all revealed tiles
+    slot_counts: np.ndarray  # uint8[4, 34], one row per meld in the order they were revealed
+    version: int  # a new next_version() after every mutation, see CountedTileList
+
+    def __init__(self, melds: Iterable[List[MahjongTile]] = ()):
+        super().__init__(melds)
+        self.counts = np.zeros(NUM_TILE_TYPES, dtype=np.uint8)
+        self.slot_counts = np.zeros((MAX_MELDS, NUM_TILE_TYPES), dtype=np.uint8)
+        self.version = next_version()
+        self._recount()
+
+    def _recount(self) -> None:
+        self.version = next_version()
+        self.slot_counts[:] = 0
+        for i, meld in enumerate(self[:MAX_MELDS]):
+            for tile in meld:
+                self.slot_counts[i, tile.to_index()] += 1
+        self.slot_counts.sum(axis=0, out=self.counts, dtype=np.uint8)
+
+    def append(self, meld: List[MahjongTile]) -> None:
+        super().append(meld)
+        self.version = next_version()
+        slot = len(self) - 1
+        for tile in meld:
+            index = tile.to_index()
+            self.counts[index] += 1
+            if slot < MAX_MELDS:
+                self.slot_counts[slot, index] += 1
+
+    def extend(self, melds: Iterable[List[MahjongTile]]) -> None:
+        for meld in melds:
+            self.append(meld)
+
+    def __iadd__(self, melds: Iterable[List[MahjongTile]]) -> MeldList:
+        self.extend(melds)
+        return self
+
+    def insert(self, index: int, meld: List[MahjongTile]) -> None:
+        super().insert(index, meld)
+        self._recount()
+
+    def remove(self, meld: List[MahjongTile]) -> None:
+        super().remove(meld)
+        self._recount()
+
+    def pop(self, index: int = -1) -> List[MahjongTile]:
+        meld = super().pop(index)
+        self._recount()
+        return meld
+
+    def clear(self) -> None:
+        super().clear()
+        self.counts[:] = 0
+        self.slot_counts[:] = 0
+        self.version = next_version()
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._recount()
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._recount()
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+    def __copy__(self) -> MeldList:
+        clone = MeldList.__new__(MeldList)
+        list.extend(clone, self)
+        clone.counts = self.counts.copy()
+        clone.slot_counts = self.slot_counts.copy()
+        clone.version = next_version()
+        return clone
+
+    def __deepcopy__(self, memo) -> MeldList:
+        clone = self.__copy__()
+        list.__setitem__(clone, slice(None), [list(meld) for meld in self])
+        return clone
@@ -0,0 +1,574 @@
+"""
+hand_analysis.py - count-vector based analysis of Mahjong hands
+
+All functions take a hand as a uint8[34] count vector indexed by
+MahjongTile.to_index() (see Player.hidden_counts), so no tiles are allocated.
+
+Winning hands are recognised with precomputed lookup tables. Each suit is keyed
+by its 9 counts and the honours by their 7 counts, and every entry is a bitmask
+of the ways that group can be split: bit i means "melds plus a pair on the i-th
+tile of the group", and NO_PAIR means "melds only".
+"""
+
+from __future__ import annotations
+
+import functools
+import itertools
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from mahjong_environment.tile import MahjongTile, NUM_TILE_TYPES
+
+SUIT_SIZE = 9
+HONOUR_OFFSET = 27
+HONOUR_SIZE = 7
+GROUP_SLICES: Tuple[Tuple[int, int], ...] = ((0, 9), (9, 18), (18, 27), (27, 34))
+NO_PAIR = 1 << SUIT_SIZE
+MAX_MELDS = 4
+ORPHAN_INDICES: Tuple[int, ...] = (0, 8, 9, 17, 18, 26, 27, 28, 29, 30, 31, 32, 33)
+
+
+def _build_tables() -> Tuple[Dict[bytes, int], Dict[bytes, int]]:
+    """
+    Enumerate every group of up to four melds (and an optional pair) and record
+    which pair positions make it complete
+    """
+    meld_patterns = []
+    for i in range(SUIT_SIZE):
+        pattern = [0] * SUIT_SIZE
+        pattern[i] = 3
+        meld_patterns.append(pattern)
+    for i in range(SUIT_SIZE - 2):
+        pattern = [0] * SUIT_SIZE
+        pattern[i] = pattern[i + 1] = pattern[i + 2] = 1
+        meld_patterns.append(pattern)
+
+    suit_table: Dict[bytes, int] = {}
+
+    def add_melds(counts: List[int], first_meld: int, melds_left: int) -> None:
+        key = bytes(counts)
+        suit_table[key] = suit_table.get(key, 0) | NO_PAIR
+        for i in range(SUIT_SIZE):
+            if counts[i] <= 2:
+                counts[i] += 2
+                key = bytes(counts)
+                suit_table[key] = suit_table.get(key, 0) | (1 << i)
+                counts[i] -= 2
+        if melds_left == 0:
+            return
+        for meld in range(first_meld, len(meld_patterns)):
+            next_counts = [count + extra for count, extra in zip(counts, meld_patterns[meld])]
+            if max(next_counts) <= 4:
+                add_melds(next_counts, meld, melds_left - 1)
+
+    add_melds([0] * SUIT_SIZE, 0, MAX_MELDS)
+
+    # honours can only form pongs, so each honour is independently 0 or 3, with at most one pair
+    honour_table: Dict[bytes, int] = {}
+    for pongs in range(1 << HONOUR_SIZE):
+        counts = [3 if pongs & (1 << i) else 0 for i in range(HONOUR_SIZE)]
+        honour_table[bytes(counts)] = NO_PAIR
+        for i in range(HONOUR_SIZE):
+            if counts[i] == 0:
+                counts[i] = 2
+                honour_table[bytes(counts)] = 1 << i
+                counts[i] = 0
+    return suit_table, honour_table
+
+
+SUIT_TABLE, HONOUR_TABLE = _build_tables()
+
+
+def group_masks(counts: np.ndarray) -> Tuple[int, int, int, int]:
+    """
+    Return the lookup table entry for each of the three suits and the honours,
+    0 meaning that group cannot be split into melds at all
+    """
+    raw = counts.tobytes()
+    return (SUIT_TABLE.get(raw[0:9], 0), SUIT_TABLE.get(raw[9:18], 0),
+            SUIT_TABLE.get(raw[18:27], 0), HONOUR_TABLE.get(raw[27:34], 0))
+
+
+def winning_pair_indices(counts: np.ndarray) -> List[int]:
+    """
+    Return the tile indices which can be the pair ('eyes') of a complete hand,
+    i.e. an empty list if the hand is not complete. Thirteen orphans is not
+    considered here, see is_thirteen_orphans.
+    :param counts: uint8[34] counts of the hidden hand
+    """
+    masks = group_masks(counts)
+    pair_group = -1
+    for group, mask in enumerate(masks):
+        if mask == 0:
+            return []
+        if not mask & NO_PAIR:
+            if pair_group != -1:
+                return []
+            pair_group = group
+    if pair_group == -1:
+        return []
+    start = GROUP_SLICES[pair_group][0]
+    mask = masks[pair_group]
+    return [start + i for i in range(SUIT_SIZE) if mask & (1 << i)]
+
+
+def is_winning_hand(counts: np.ndarray) -> bool:
+    """
+    Return whether the hidden hand is complete, either as melds and a pair or as thirteen orphans
+    """
+    return bool(winning_pair_indices(counts)) or is_thirteen_orphans(counts)
+
+
+def is_thirteen_orphans(counts: np.ndarray) -> bool:
+    """
+    Return whether the hand is exactly one of each terminal and honour plus a pair of one of them
+    """
+    orphans = counts[list(ORPHAN_INDICES)]
+    return int(counts.sum()) == 14 and int(orphans.min()) >= 1 and int(orphans.sum()) == 14
+
+
+def _neighbours(counts: bytearray, include_orphans: bool) -> List[int]:
+    """
+    Tiles which can possibly lower the shanten when drawn: copies of held tiles,
+    suit tiles within two of a held tile and, for thirteen orphans, every orphan
+    """
+    candidates = set(ORPHAN_INDICES) if include_orphans else set()
+    for index in range(NUM_TILE_TYPES):
+        if counts[index]:
+            if index >= HONOUR_OFFSET:
+                candidates.add(index)
+            else:
+                suit_start = index - index % SUIT_SIZE
+                candidates.update(range(max(index - 2, suit_start), min(index + 3, suit_start + SUIT_SIZE)))
+    return sorted(candidates)
+
+
+def waiting_indices(counts: np.ndarray) -> List[int]:
+    """
+    Return the tile indices which would complete the hand if drawn or claimed,
+    i.e. an empty list unless the hand is ready (tenpai). Only the group of each
+    candidate tile is looked up again.
+    :param counts: uint8[34] counts of the hidden hand, 13 - 3 * revealed melds tiles
+    """
+    tiles = int(counts.sum())
+    if tiles % 3 != 1 or shanten(counts, MAX_MELDS - tiles // 3) != 0:
+        return []
+    hand = bytearray(counts.tobytes())
+    masks = list(group_masks(counts))
+    waits = []
+    for index in _neighbours(hand, tiles == 13):
+        if hand[index] >= 4:
+            continue
+        group = _group_of(index)
+        start, end = GROUP_SLICES[group]
+        hand[index] += 1
+        group_mask = (HONOUR_TABLE if group == 3 else SUIT_TABLE).get(bytes(hand[start:end]), 0)
+        drawn_masks = masks[:group] + [group_mask] + masks[group + 1:]
+        if (all(drawn_masks) and sum(not mask & NO_PAIR for mask in drawn_masks) == 1) or \
+                (tiles == 13 and _orphan_shanten(hand) == -1):
+            waits.append(index)
+        hand[index] -= 1
+    return waits
+
+
+Meld = Tuple[int, ...]  # tile indices of one set, e.g. (4, 4) for a pair or (3, 4, 5) for a sheung
+Decomposition = Tuple[Meld, ...]
+
+
+@functools.lru_cache(maxsize=4096)
+def _suit_meld_partitions(key: bytes) -> Tuple[Decomposition, ...]:
+    """
+    Every distinct way of splitting one suit (9 counts) into pongs and sheungs,
+    with tile indices relative to the start of the suit
+    """
+    counts = bytearray(key)
+    lowest = next((i for i, count in enumerate(counts) if count), -1)
+    if lowest == -1:
+        return ((),)
+    # the lowest tile has to start either a pong or a sheung
+    partitions = set()
+    if counts[lowest] >= 3:
+        counts[lowest] -= 3
+        for rest in _suit_meld_partitions(bytes(counts)):
+            partitions.add(tuple(sorted(((lowest,) * 3,) + rest)))
+        counts[lowest] += 3
+    if lowest + 2 < SUIT_SIZE and counts[lowest + 1] and counts[lowest + 2]:
+        counts[lowest] -= 1
+        counts[lowest + 1] -= 1
+        counts[lowest + 2] -= 1
+        for rest in _suit_meld_partitions(bytes(counts)):
+            partitions.add(tuple(sorted(((lowest, lowest + 1, lowest + 2),) + rest)))
+    return tuple(sorted(partitions))
+
+
+@functools.lru_cache(maxsize=65536)
+def _hand_decompositions(key: bytes) -> Tuple[Decomposition, ...]:
+    counts = np.frombuffer(key, dtype=np.uint8)
+    decompositions = []
+    for pair_index in winning_pair_indices(counts):
+        remaining = bytearray(key)
+        remaining[pair_index] -= 2
+        group_partitions = []
+        for start, end in GROUP_SLICES[:3]:
+            group_partitions.append([tuple(tuple(start + i for i in meld) for meld in partition)
+                                     for partition in _suit_meld_partitions(bytes(remaining[start:end]))])
+        honour_pongs = tuple((index,) * 3 for index in range(HONOUR_OFFSET, NUM_TILE_TYPES) if remaining[index] == 3)
+        for circles, bamboos, numbers in itertools.product(*group_partitions):
+            decompositions.append(((pair_index, pair_index),) + circles + bamboos + numbers + honour_pongs)
+    return tuple(decompositions)
+
+
+def hand_decompositions(counts: np.ndarray) -> Tuple[Decomposition, ...]:
+    """
+    Return every distinct way to split a complete hand into a pair followed by
+    melds, or an empty tuple if the hand is not complete. Results are memoized on
+    the count vector, so repeated queries for the same hand are a dictionary lookup.
+    :param counts: uint8[34] counts of the hidden hand
+    """
+    return _hand_decompositions(counts.tobytes())
+
+
+def decomposition_to_tiles(decomposition: Decomposition) -> List[List[MahjongTile]]:
+    """
+    Convert a decomposition into the list of sets of tiles used by Player.score_hand
+    """
+    return [[MahjongTile.index_to_tile(index) for index in meld] for meld in decomposition]
+
+
+# ===================== SHANTEN ============================================
+# A group (suit or honours) is summarised by the (melds, taatsu, pair) triples it
+# can be split into, where a taatsu is a pair or an incomplete sheung that needs
+# one more tile. For a hand needing n more melds the shanten number is
+#     2 * n - 2 * melds - min(taatsu, n - melds) - pair
+# so -1 is a complete hand and 0 is a ready (tenpai) hand.
+
+GroupOptions = Tuple[Tuple[int, int, int], ...]
+
+
+def _pareto(options) -> GroupOptions:
+    """
+    Drop every (melds, taatsu, pair) triple that another triple beats in all three
+    """
+    options = set(options)
+    return tuple(sorted(option for option in options
+                        if not any(other != option and other[0] >= option[0] and other[1] >= option[1] and
+                                   other[2] >= option[2] for other in options)))
+
+
+@functools.lru_cache(maxsize=None)
+def _group_options(key: bytes, is_suit: bool) -> GroupOptions:
+    """
+    Every non-dominated way of splitting a group into melds, taatsu and a pair.
+    This is the per-suit table, filled in lazily as patterns are first seen.
+    """
+    counts = bytearray(key)
+    lowest = next((i for i, count in enumerate(counts) if count), -1)
+    if lowest == -1:
+        return (0, 0, 0),
+
+    options = []
+
+    def branch(removed: Tuple[int, ...], melds: int, taatsu: int, pair: int) -> None:
+        for index in removed:
+            counts[index] -= 1
+        for sub_melds, sub_taatsu, sub_pair in _group_options(bytes(counts), is_suit):
+            if not (pair and sub_pair):
+                options.append((sub_melds + melds, sub_taatsu + taatsu, sub_pair + pair))
+        for index in removed:
+            counts[index] += 1
+
+    count = counts[lowest]
+    has_next = is_suit and lowest + 1 < len(counts) and counts[lowest + 1] > 0
+    has_after_next = is_suit and lowest + 2 < len(counts) and counts[lowest + 2] > 0
+    if count >= 3:
+        branch((lowest,) * 3, 1, 0, 0)
+    if has_next and has_after_next:
+        branch((lowest, lowest + 1, lowest + 2), 1, 0, 0)
+    if count >= 2:
+        branch((lowest,) * 2, 0, 0, 1)
+        branch((lowest,) * 2, 0, 1, 0)
+    if has_next:
+        branch((lowest, lowest + 1), 0, 1, 0)
+    if has_after_next:
+        branch((lowest, lowest + 2), 0, 1, 0)
+    branch((lowest,), 0, 0, 0)  # leave one copy isolated
+    return _pareto(options)
+
+
+def hand_group_options(counts: np.ndarray) -> Tuple[GroupOptions, GroupOptions, GroupOptions, GroupOptions]:
+    """
+    Return the options of each of the three suits and the honours of a hand
+    """
+    raw = counts.tobytes()
+    return (_group_options(raw[0:9], True), _group_options(raw[9:18], True),
+            _group_options(raw[18:27], True), _group_options(raw[27:34], False))
+
+
+@functools.lru_cache(maxsize=65536)
+def combine_group_options(group_options: Tuple[GroupOptions, ...], melds_needed: int = MAX_MELDS) -> int:
+    """
+    Return the regular shanten number given the options of every group
+    """
+    states = {(0, 0, 0)}
+    for options in group_options:
+        states = {(min(melds + group_melds, melds_needed), min(taatsu + group_taatsu, melds_needed), pair + group_pair)
+                  for melds, taatsu, pair in states
+                  for group_melds, group_taatsu, group_pair in options
+                  if not (pair and group_pair)}
+    return 2 * melds_needed - max(2 * melds + min(taatsu, melds_needed - melds) + pair
+                                  for melds, taatsu, pair in states)
+
+
+def regular_shanten(counts: np.ndarray, revealed_melds: int = 0) -> int:
+    """
+    Shanten number for a hand of melds and a pair
+    :param counts: uint8[34] counts of the hidden hand
+    :param revealed_melds: number of melds already revealed (each kong still counts as one meld)
+    """
+    return combine_group_options(hand_group_options(counts), MAX_MELDS - revealed_melds)
+
+
+def thirteen_orphans_shanten(counts: np.ndarray) -> int:
+    """
+    Shanten number towards thirteen orphans, only meaningful with no revealed melds
+    """
+    return _orphan_shanten(counts.tobytes())
+
+
+def _orphan_shanten(raw) -> int:
+    distinct = 0
+    pair = 0
+    for index in ORPHAN_INDICES:
+        count = raw[index]
+        if count:
+            distinct += 1
+            if count >= 2:
+                pair = 1
+    return 13 - distinct - pair
+
+
+def shanten(counts: np.ndarray, revealed_melds: int = 0) -> int:
+    """
+    Return the number of tiles a hand is away from being ready: -1 for a complete
+    hand, 0 for a ready (tenpai) hand, and so on. Works for both 13 and 14 tile hands.
+    :param counts: uint8[34] counts of the hidden hand
+    :param revealed_melds: number of melds already revealed
+    """
+    result = regular_shanten(counts, revealed_melds)
+    if revealed_melds == 0:
+        result = min(result, thirteen_orphans_shanten(counts))
+    return result
+
+
+# ===================== CLAIMS ============================================
+# Sets of tile indices packed one byte per index into an int, bit 8 * i standing
+# for index i, so that shifting by 8 moves to the neighbouring tile and a set for
+# each seat can be kept in the same int shifted by the seat.
+
+
+def tile_lanes(indices) -> int:
+    """
+    Return the packed form of the given tile indices
+    """
+    return sum(1 << 8 * index for index in set(indices))
+
+
+ALL_TILE_LANES = tile_lanes(range(NUM_TILE_TYPES))
+_LOWER_SHEUNG_LANES = tile_lanes(index for index in range(HONOUR_OFFSET) if index % SUIT_SIZE >= 2)
+_MIDDLE_SHEUNG_LANES = tile_lanes(index for index in range(HONOUR_OFFSET) if 1 <= index % SUIT_SIZE <= 7)
+_UPPER_SHEUNG_LANES = tile_lanes(index for index in range(HONOUR_OFFSET) if index % SUIT_SIZE <= 6)
+_HELD = bytes(min(count, 1) for count in range(256))
+_PAIRED = bytes(int(count >= 2) for count in range(256))
+
+
+def meld_claim_lanes(counts: np.ndarray) -> int:
+    """
+    Return the packed tile indices a discard of which the hand could pong (and
+    possibly kong) or make a sheung with
+    """
+    raw = counts.tobytes()
+    held = int.from_bytes(raw.translate(_HELD), 'little')
+    paired = int.from_bytes(raw.translate(_PAIRED), 'little')
+    return (paired | (held << 16) & (held << 8) & _LOWER_SHEUNG_LANES | (held << 8) & (held >> 8) & _MIDDLE_SHEUNG_LANES
+            | (held >> 8) & (held >> 16) & _UPPER_SHEUNG_LANES)
+
+
+# ===================== UKEIRE ============================================
+
+NOT_IN_HAND = 127
+
+
+class Ukeire(NamedTuple):
+    """
+    Effective tiles for every discard candidate of a hand, indexed by tile index
+    """
+    shanten: np.ndarray  # int8[34], shanten after each discard, NOT_IN_HAND for tiles not held
+    effective: np.ndarray  # bool[34, 34], [d, t] is True if drawing t after discarding d lowers the shanten
+    live: np.ndarray  # int8[34], copies of each tile that are neither held nor visible
+
+    def acceptance(self) -> np.ndarray:
+        """
+        int[34], number of live effective tiles after each discard
+        """
+        return self.effective.astype(np.int32) @ self.live
+
+
+def _group_of(index: int) -> int:
+    return min(index // SUIT_SIZE, 3)
+
+
+def _changed_options(counts: bytearray, group: int) -> GroupOptions:
+    start, end = GROUP_SLICES[group]
+    return _group_options(bytes(counts[start:end]), group < 3)
+
+
+def ukeire(counts: np.ndarray, visible_counts: Optional[np.ndarray] = None, revealed_melds: int = 0) -> Ukeire:
+    """
+    Evaluate every discard candidate of a hand in one pass. Only the group the
+    discarded or drawn tile belongs to is re-split, the others are shared, and
+    only tiles next to a held tile are tried as draws.
+    :param counts: uint8[34] counts of the hidden hand, usually 14 - 3 * revealed_melds tiles
+    :param visible_counts: uint8[34] counts of every tile that can no longer be drawn
+                           (all discard piles and revealed sets), optional
+    :param revealed_melds: number of melds already revealed
+    """
+    melds_needed = MAX_MELDS - revealed_melds
+    live = 4 - counts.astype(np.int8)
+    if visible_counts is not None:
+        live -= visible_counts.astype(np.int8)
+    np.maximum(live, 0, out=live)
+
+    shanten_after = np.full(NUM_TILE_TYPES, NOT_IN_HAND, dtype=np.int8)
+    effective = np.zeros((NUM_TILE_TYPES, NUM_TILE_TYPES), dtype=bool)
+    hand = bytearray(counts.tobytes())
+    base_options = hand_group_options(counts)
+
+    for discard in np.flatnonzero(counts).tolist():
+        discard_group = _group_of(discard)
+        hand[discard] -= 1
+        options = list(base_options)
+        options[discard_group] = _changed_options(hand, discard_group)
+        result = combine_group_options(tuple(options), melds_needed)
+        if revealed_melds == 0:
+            result = min(result, _orphan_shanten(hand))
+        shanten_after[discard] = result
+
+        for draw in _neighbours(hand, revealed_melds == 0):
+            if hand[draw] >= 4:
+                continue
+            draw_group = _group_of(draw)
+            hand[draw] += 1
+            drawn_options = list(options)
+            drawn_options[draw_group] = _changed_options(hand, draw_group)
+            drawn = combine_group_options(tuple(drawn_options), melds_needed)
+            if revealed_melds == 0:
+                drawn = min(drawn, _orphan_shanten(hand))
+            effective[discard, draw] = drawn < result
+            hand[draw] -= 1
+        hand[discard] += 1
+
+    return Ukeire(shanten_after, effective, live)
+
+
+# ===================== BATCH ============================================
+# The win lookup tables again, as dense arrays indexed by the base 5 encoding of a
+# group's counts, so that a whole (N, 34) array of hands is looked up at once.
+
+_GROUP_POWERS = 5 ** np.arange(SUIT_SIZE, dtype=np.int32)
+_GROUP_STARTS = np.array([start for start, _ in GROUP_SLICES], dtype=np.int8)
+_ORPHAN_COLUMNS = np.array(ORPHAN_INDICES, dtype=np.int8)
+_LOWEST_BIT = np.array([(value & -value).bit_length() - 1 for value in range(NO_PAIR)], dtype=np.int8)
+
+
+@functools.lru_cache(maxsize=None)
+def _dense_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    SUIT_TABLE and HONOUR_TABLE as uint16 arrays, built the first time a batch is analysed
+    """
+    tables = []
+    for table, size in ((SUIT_TABLE, SUIT_SIZE), (HONOUR_TABLE, HONOUR_SIZE)):
+        dense = np.zeros(5 ** size, dtype=np.uint16)
+        keys = np.frombuffer(b''.join(table), dtype=np.uint8).reshape(-1, size).astype(np.int32)
+        dense[keys @ _GROUP_POWERS[:size]] = np.fromiter(table.values(), dtype=np.uint16, count=len(table))
+        tables.append(dense)
+    return tables[0], tables[1]
+
+
+class BatchAnalysis(NamedTuple):
+    """
+    Win and wait information for every row of an (N, 34) array of hands
+    """
+    winning: np.ndarray  # bool[N], the hand is complete, including thirteen orphans
+    pair: np.ndarray  # int8[N], tile index of the pair of a complete hand (the lowest if several), -1 otherwise
+    waits: np.ndarray  # bool[N, 34], [n, t] is True if drawing t completes hand n
+
+    def tenpai(self) -> np.ndarray:
+        """
+        bool[N], the hand is one tile away from complete
+        """
+        return self.waits.any(axis=1)
+
+
+def batch_group_masks(counts: np.ndarray) -> np.ndarray:
+    """
+    Vectorised group_masks: an int32[N, 4] array with the lookup table entry of each group
+    :param counts: uint8[N, 34] counts of N hidden hands
+    """
+    suit_table, honour_table = _dense_tables()
+    counts = counts.astype(np.int32)
+    masks = np.empty((len(counts), 4), dtype=np.int32)
+    masks[:, :3] = suit_table[counts[:, :HONOUR_OFFSET].reshape(-1, 3, SUIT_SIZE) @ _GROUP_POWERS]
+    masks[:, 3] = honour_table[counts[:, HONOUR_OFFSET:] @ _GROUP_POWERS[:HONOUR_SIZE]]
+    return masks
+
+
+def analyse_batch(counts: np.ndarray) -> BatchAnalysis:
+    """
+    Vectorised is_winning_hand, winning_pair_indices and waiting_indices over N hands.
+    A drawn tile only changes the key of its own group by a power of 5, so the
+    waits of every hand are 34 more table lookups per row.
+    :param counts: uint8[N, 34] counts of N hidden hands, each with at most 4 copies of a tile
+    """
+    suit_table, honour_table = _dense_tables()
+    counts = np.atleast_2d(counts).astype(np.int32)
+    rows = len(counts)
+    keys = np.empty((rows, 4), dtype=np.int32)
+    keys[:, :3] = counts[:, :HONOUR_OFFSET].reshape(-1, 3, SUIT_SIZE) @ _GROUP_POWERS
+    keys[:, 3] = counts[:, HONOUR_OFFSET:] @ _GROUP_POWERS[:HONOUR_SIZE]
+    masks = np.empty((rows, 4), dtype=np.int32)
+    masks[:, :3] = suit_table[keys[:, :3]]
+    masks[:, 3] = honour_table[keys[:, 3]]
+
+    splits = masks != 0
+    needs_pair = splits & (masks & NO_PAIR == 0)
+    regular = splits.all(axis=1) & (needs_pair.sum(axis=1) == 1)
+
+    orphans = counts[:, _ORPHAN_COLUMNS]
+    orphan_total = orphans.sum(axis=1)
+    thirteen_orphans = (counts.sum(axis=1) == 14) & (orphan_total == 14) & (orphans.min(axis=1) >= 1)
+
+    pair = np.full(rows, -1, dtype=np.int8)
+    pair_group = needs_pair.argmax(axis=1)
+    pair_bits = masks[np.arange(rows), pair_group] & (NO_PAIR - 1)
+    pair[regular] = (_GROUP_STARTS[pair_group] + _LOWEST_BIT[pair_bits])[regular]
+    pair[thirteen_orphans] = _ORPHAN_COLUMNS[orphans.argmax(axis=1)][thirteen_orphans]
+
+    waits = np.zeros((rows, NUM_TILE_TYPES), dtype=bool)
+    split_count = splits.sum(axis=1)
+    pair_count = needs_pair.sum(axis=1)
+    for group, (start, end) in enumerate(GROUP_SLICES):
+        table = honour_table if group == 3 else suit_table
+        drawable = counts[:, start:end] < 4
+        drawn = table[np.where(drawable, keys[:, group, None] + _GROUP_POWERS[None, :end - start], 0)]
+        others_split = (split_count - splits[:, group]) == 3
+        others_pair = pair_count - needs_pair[:, group]
+        waits[:, start:end] = ((drawn != 0) & drawable & others_split[:, None] &
+                               (others_pair[:, None] + (drawn & NO_PAIR == 0) == 1))
+
+    missing = orphans == 0
+    missing_count = missing.sum(axis=1)
+    ready_orphans = (orphan_total == 13) & (counts.sum(axis=1) == 13)
+    waits[:, _ORPHAN_COLUMNS] |= ready_orphans[:, None] & ((missing_count == 0)[:, None] |
+                                                           ((missing_count == 1)[:, None] & missing))
+    return BatchAnalysis(regular | thirteen_orphans, pair, waits)
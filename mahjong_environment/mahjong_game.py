@@ -1,13 +1,65 @@
 from __future__ import annotations
 
+import copy
 import random
-from typing import Dict, Union, List, Optional, Tuple
+from typing import Any, NamedTuple, Union, List, Optional, Tuple
 
 import numpy as np
 
+from mahjong_environment.game_log import GameLog
+from mahjong_environment.hand import CountedTileList
+from mahjong_environment.hand_analysis import ALL_TILE_LANES
 from mahjong_environment.mahjong_actions import MahjongActions
 from mahjong_environment.player import Player
-from mahjong_environment.tile import MahjongTile
+from mahjong_environment.tile import MahjongTile, NUM_TILE_CODES, NUM_TILE_TYPES
+from mahjong_environment.wall import Wall
+
+PLAYER_STATE_SIZE = 217  # one block per player in get_state, laid out as below
+HIDDEN_OFFSET = 0  # 34, hidden hand counts / 4
+REVEALED_OFFSET = 34  # 34 * 4, one row per revealed set
+DISCARDS_OFFSET = 170  # 34
+FLOWERS_OFFSET = 204  # 8
+SEAT_WIND_OFFSET = 212  # 4, one-hot
+POTENTIAL_FAN_OFFSET = 216  # 1, potential fan of the revealed sets / 20
+
+LATEST_TILE_OFFSET = 4 * PLAYER_STATE_SIZE  # 34, one-hot, followed by the per-game values
+DISCARDING_PLAYER_OFFSET = LATEST_TILE_OFFSET + 34  # 4
+TILES_REMAINING_OFFSET = DISCARDING_PLAYER_OFFSET + 4  # 1
+CURRENT_TURN_OFFSET = TILES_REMAINING_OFFSET + 1  # 4
+CIRCLE_WIND_OFFSET = CURRENT_TURN_OFFSET + 4  # 4
+LAST_ACTING_PLAYER_OFFSET = CIRCLE_WIND_OFFSET + 4  # 4
+IS_DISCARD_OFFSET = LAST_ACTING_PLAYER_OFFSET + 4  # 1
+CIRCLE_WINDS = ('east', 'south', 'west', 'north')
+QUARTERS = np.arange(5, dtype=np.float32) / 4  # encoded value of each tile count, a fraction of the 4 copies
+
+NUM_ACTIONS = len(MahjongActions)  # columns of legal_action_mask
+_UNSET = object()  # an attribute which was not set on the game itself
+
+
+class PlayerDelta(NamedTuple):
+    """
+    What a transition changed in one player's piles, see MahjongGame.apply
+    """
+    seat: int
+    removed: Tuple[MahjongTile, ...]  # tiles which left the hidden hand
+    added: Tuple[MahjongTile, ...]  # tiles which joined it
+    revealed_size: int  # revealed sets and flowers are only appended to during a transition
+    flowers_size: int
+    discard_size: int  # the discard pile before, a discard appends to it
+    claimed: Optional[Tuple[int, MahjongTile]]  # index and tile a claim took out of the discard pile
+    highest_fan: int
+
+
+class TransitionDelta(NamedTuple):
+    """
+    What MahjongGame.undo needs to take back one MahjongGame.apply
+    """
+    fields: Tuple[Any, ...]  # values of MahjongGame._UNDO_FIELDS, _UNSET if not set on the game
+    wall_front: int  # the wall's codes are only rearranged by setup_game, so its pointers are enough
+    wall_back: int
+    discarded_size: int
+    log_size: int
+    players: Tuple[PlayerDelta, ...]  # only the players the transition changed
 
 
 class MahjongGame:
@@ -15,7 +67,7 @@ class MahjongGame:
     Represents one Mahjong Game
     """
     state_size = 920
-    tiles: List[MahjongTile]
+    wall: Wall  # tiles left to draw, see also the tiles property
     players: List[Player]
     current_player_no: int
     current_player: Player
@@ -26,11 +78,34 @@ class MahjongGame:
     last_acting_player: Player = None
     last_action: MahjongActions
     winner: Optional[Player] = None
-    log: List[Dict]
+    log: GameLog  # decisions made by the game on the players' behalf, e.g. a win on a draw
     circle_wind: str = 'east'
     is_discard: bool = True
-
-    def __init__(self, players: List[Player], circle_wind: str):
+    verbose: bool = True  # print the progress of the game, off for headless simulation
+    rng: random.Random  # seeds the wall shuffles and is shared with the players for their random decisions
+    _full_wall: Tuple[MahjongTile, ...]  # every tile in a full set, built once when the module loads
+    _full_wall_codes: np.ndarray  # uint8 codes of _full_wall, what every Wall is filled from
+    _wall_codes: np.ndarray  # uint8, distinct tile codes in the order they appear in _full_wall
+    _wall_rng: Optional[np.random.Generator] = None  # shuffles the wall, seeded from rng when first needed
+    _state: Optional[np.ndarray] = None  # preallocated get_state buffer, see _update_state
+    _player_blocks: List[Tuple[np.ndarray, ...]]  # views of _state per player: whole, hidden, revealed, discards
+    _encoded: List[Optional[tuple]]  # Player.encoding_key() each player block was last encoded from
+    _encoded_wind: Optional[str]  # circle wind the player blocks were encoded with
+    _encoded_tail: Optional[tuple]  # what the per-game values were last encoded from
+    _tail_ones: List[int]  # indices of the one-hot entries currently set after the player blocks
+    _state_view: memoryview  # of _state
+    _undo_stack: List[TransitionDelta]  # one entry per apply() not yet undone
+    _claim_seats: int = 0  # byte i holds bit s if seat s could claim tile index i, see claimants
+    _claim_hands: Optional[List[Optional[Tuple[CountedTileList, int]]]] = None  # hand and version behind each seat
+    _UNDO_FIELDS = ('current_player_no', 'current_player', 'latest_tile', 'discarding_player', 'last_acting_player',
+                    'last_action', 'winner', 'is_discard', 'game_over')
+
+    def __init__(self, players: List[Player], circle_wind: str, verbose: bool = True,
+                 rng: Optional[random.Random] = None):
+        """
+        :param rng: generator for the game and its players, e.g. MahjongGame.game_rng(seed, game_index).
+                    By default a new one seeded from the random module.
+        """
         ordered_players = []
         i = 0
         while i < 4:
@@ -40,18 +115,51 @@ class MahjongGame:
                     break
             i += 1
         self.players = ordered_players
-        self.log = []  # {id, state, broad decision, decision value, reward, next state, game over}
+        self.verbose = verbose
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        for player in ordered_players:
+            player.verbose = verbose
+            player.rng = self.rng
+        self.log = GameLog(self.state_size)
         self.discarded_tiles = []
         self.game_over = False
         self.circle_wind = circle_wind
-        self.tiles = MahjongGame.initialize_tiles()
+        self.wall = Wall(MahjongGame._full_wall_codes)
         self.setup_game()
 
+    @staticmethod
+    def game_rng(master_seed: int, game_index: int) -> random.Random:
+        """
+        Generator for game number game_index of a run seeded with master_seed.
+        It only depends on those two numbers, so any game of a sharded run can be
+        replayed on its own.
+        """
+        words = np.random.SeedSequence(entropy=master_seed, spawn_key=(game_index,)).generate_state(4, np.uint64)
+        return random.Random(int.from_bytes(words.tobytes(), 'little'))
+
+    @property
+    def tiles(self) -> List[MahjongTile]:
+        """
+        The tiles left in the wall as a new list, in the order of regular draws
+        """
+        return self.wall.tiles()
+
+    @property
+    def tiles_remaining(self) -> int:
+        return len(self.wall)
+
     @staticmethod
     def initialize_tiles() -> List[MahjongTile]:
         """
         Initialises the set of tiles that can be drawn in a game
         """
+        return list(MahjongGame._full_wall)
+
+    @staticmethod
+    def _build_full_wall() -> Tuple[MahjongTile, ...]:
+        """
+        Build the 144 tiles in a full set, sharing the interned tile instances
+        """
         tiles = []
         for suit in ('circle', 'bamboo', 'number'):
             for i in range(1, 10):
@@ -71,7 +179,7 @@ class MahjongGame:
         for season in ('summer', 'spring', 'autumn', 'winter'):
             tiles.append(MahjongTile(tiletype='flower', subtype='season', numchar=season))
 
-        return tiles
+        return tuple(tiles)
 
     def initialise_player_hands(self):
         """
@@ -82,7 +190,7 @@ class MahjongGame:
         # clear player hands
         current_player_number = 0
         while len(self.players[0].hidden_hand) < 14:
-            self.players[current_player_number].add_tile(self.tiles.pop())
+            self.players[current_player_number].add_tile(self.wall.draw())
             # print(f"CURR: {len(self.players[current_player_number].hidden_hand)}")
             current_player_number += 1
             current_player_number %= 4
@@ -93,7 +201,7 @@ class MahjongGame:
                 while last_tile.tiletype == 'flower':
                     player_redraw.flowers.append(last_tile)
                     # print("FLOWER REDRAW PLAYER " + str(player_redraw.player_id))
-                    last_tile = self.tiles.pop()
+                    last_tile = self.wall.draw_replacement()
                 player_redraw.add_tile(last_tile)
         self.current_player_no = 0
         self.current_player = self.players[0]
@@ -103,16 +211,167 @@ class MahjongGame:
         Shuffle tiles and deal them to players
         """
         # print("SETUP")
-        self.tiles = MahjongGame.initialize_tiles()
-        random.shuffle(self.tiles)
+        if self._wall_rng is None:
+            self._wall_rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.wall.shuffle(self._wall_rng)
         self.initialise_player_hands()
         self.current_player_no = 0
         self.current_player = self.players[self.current_player_no]
         self.discarded_tiles = []
+        self._undo_stack = []
         self.game_over = False
+        self.winner = None
+        self.latest_tile = self.discarding_player = self.last_acting_player = None
+        self.is_discard = True
+        self.log.truncate(0)
 
         # print("SETUP COMPLETE")
 
+    def clone(self) -> MahjongGame:
+        """
+        Return an independent copy of the game to branch from, e.g. for search.
+        The players, wall, piles and log are copied, the tile instances and
+        anything immutable are shared. The state buffer is copied along with what
+        it was encoded from, so get_state() on the clone stays incremental.
+        """
+        clone = object.__new__(MahjongGame)
+        clone.__dict__.update(self.__dict__)
+        clone.players = [player.clone() for player in self.players]
+        by_id = {id(player): cloned for player, cloned in zip(self.players, clone.players)}
+        clone.current_player = by_id.get(id(self.current_player), self.current_player)
+        clone.discarding_player = by_id.get(id(self.discarding_player), self.discarding_player)
+        clone.last_acting_player = by_id.get(id(self.last_acting_player), self.last_acting_player)
+        clone.wall = self.wall.copy()
+        clone.discarded_tiles = list(self.discarded_tiles)
+        clone.log = self.log.copy()  # finish_episode updates the rewards in place
+        clone._undo_stack = []  # the deltas refer to this game's players
+        clone._claim_hands = None
+        clone.rng = copy.copy(self.rng)  # the branch continues the same random sequence independently
+        clone._wall_rng = None  # derived from clone.rng if the clone is ever reset
+        for player in clone.players:
+            player.rng = clone.rng
+
+        if self._state is not None:
+            clone._attach_state(self._state.copy())
+            clone._encoded_wind = self._encoded_wind
+            clone._tail_ones = list(self._tail_ones)  # the tail is rewritten since it refers to the old players
+            for slot, (player, cloned) in enumerate(zip(self.players, clone.players)):
+                if self._encoded[slot] == player.encoding_key():
+                    clone._encoded[slot] = cloned.encoding_key()
+        return clone
+
+    def apply(self, transition: Tuple[int, int]) -> None:
+        """
+        Play a resolved transition the way MahjongEnvironmentAdapter.step_with_resolved_action
+        does, recording what changed so that undo() can take it back. In the discard
+        phase the action is the index of the tile to discard, otherwise it is the
+        response to the latest discard: a claim, or PASS to move on to the next draw.
+        The game is over, as a draw unless someone has won, once the wall is empty,
+        which is where play_round stops.
+        :param transition: (player_id, action) as returned by find_legal_transitions()
+        """
+        actioner_id, action = transition
+        if self.is_discard and not 0 <= action <= 13:
+            raise ValueError(f"Expected a discard action (0-13), got {action}")
+        claimed = None
+        if not self.is_discard and 15 <= action <= 19:  # execute_interrupt takes the tile out of the discard pile
+            pile = self.last_acting_player.discard_pile
+            claimed = (self.last_acting_player.player_order, pile.index(self.latest_tile), self.latest_tile)
+        start = self._transition_start()
+        try:
+            self._play_transition(actioner_id, action)
+        finally:
+            self._undo_stack.append(self._transition_delta(start, claimed))
+
+    def _play_transition(self, actioner_id: int, action: int) -> None:
+        if self.is_discard:
+            player = self.players[actioner_id]
+            self.discard_tile(player, tile=player.hidden_hand[action])
+            self.is_discard = False
+            return
+
+        end_turn = action != MahjongActions.PASS and self.execute_interrupt(actioner_id, action)
+        self.is_discard = True
+        if not end_turn and len(self.wall) != 0:
+            self.next_turn()
+            if not self.game_over:
+                self.draw_tile(self.current_player)
+        if len(self.wall) == 0:
+            self.game_over = True
+
+    def undo(self) -> None:
+        """
+        Take back the last apply() which has not been undone yet
+        """
+        delta = self._undo_stack.pop()
+        for name, value in zip(MahjongGame._UNDO_FIELDS, delta.fields):
+            if value is _UNSET:
+                self.__dict__.pop(name, None)
+            else:
+                setattr(self, name, value)
+
+        self.wall.front = delta.wall_front
+        self.wall.back = delta.wall_back
+        del self.discarded_tiles[delta.discarded_size:]
+        self.log.truncate(delta.log_size)
+
+        for change in delta.players:
+            player = self.players[change.seat]
+            hidden_hand = player.hidden_hand
+            for tile in change.added:
+                hidden_hand.remove(tile)
+            for tile in change.removed:
+                player.add_tile(tile)
+            if len(player.revealed_sets) != change.revealed_size:
+                del player.revealed_sets[change.revealed_size:]
+            if len(player.flowers) != change.flowers_size:
+                del player.flowers[change.flowers_size:]
+            discard_pile = player.discard_pile
+            if change.claimed is not None:
+                discard_pile.insert(*change.claimed)
+            elif len(discard_pile) != change.discard_size:
+                del discard_pile[change.discard_size:]
+            player.hand_changed()
+            player.highest_fan = change.highest_fan
+
+    def _transition_start(self) -> tuple:
+        """
+        What _transition_delta compares the game against once the transition is played
+        """
+        fields = self.__dict__
+        return (tuple(fields.get(name, _UNSET) for name in MahjongGame._UNDO_FIELDS),
+                self.wall.front, self.wall.back, len(self.discarded_tiles), len(self.log),
+                [(player.hidden_counts.tobytes(), player.hidden_hand.version, len(player.revealed_sets),
+                  len(player.flowers), len(player.discard_pile), player.highest_fan) for player in self.players])
+
+    def _transition_delta(self, start: tuple, claimed: Optional[Tuple[int, int, MahjongTile]]) -> TransitionDelta:
+        """
+        Keep only what the transition changed: the tiles each hidden hand lost or
+        gained, where the revealed sets, flowers and discard piles end, and the
+        tile a claim took
+        """
+        fields, wall_front, wall_back, discarded_size, log_size, piles = start
+        changes = []
+        for seat, (player, pile) in enumerate(zip(self.players, piles)):
+            counts, hidden_version, revealed_size, flowers_size, discard_size, highest_fan = pile
+            taken = claimed[1:] if claimed is not None and claimed[0] == seat else None
+            if (player.hidden_hand.version == hidden_version and len(player.revealed_sets) == revealed_size
+                    and len(player.flowers) == flowers_size and len(player.discard_pile) == discard_size
+                    and player.highest_fan == highest_fan and taken is None):
+                continue
+            removed, added = [], []
+            if player.hidden_hand.version != hidden_version:
+                for index, (before, after) in enumerate(zip(counts, player.hidden_counts.tobytes())):
+                    if before != after:
+                        tile = MahjongTile.index_to_tile(index)
+                        if before > after:
+                            removed += [tile] * (before - after)
+                        else:
+                            added += [tile] * (after - before)
+            changes.append(PlayerDelta(seat, tuple(removed), tuple(added), revealed_size, flowers_size, discard_size,
+                                       taken, highest_fan))
+        return TransitionDelta(fields, wall_front, wall_back, discarded_size, log_size, tuple(changes))
+
     # ============================= GAMEPLAY ========================================
 
     # WARNING THE BELOW IS LEGACY
@@ -123,11 +382,13 @@ class MahjongGame:
         """
         self.winner = None
         self.game_over = False
-        print("GAME START")
+        verbose = self.verbose
+        if verbose:
+            print("GAME START")
 
-        while not self.game_over and len(self.tiles) != 0:
-            actioning_player_id, action_to_execute, possible_indices = self.play_turn()
-            is_interrupted = self.execute_interrupt(actioning_player_id, action_to_execute, possible_indices)
+        while not self.game_over and len(self.wall) != 0:
+            actioning_player_id, action_to_execute = self.play_turn()
+            is_interrupted = self.execute_interrupt(actioning_player_id, action_to_execute)
             if not is_interrupted:
                 for player in self.players:
                     if len(player.hidden_hand) % 3 != 1 and not self.game_over:
@@ -141,26 +402,22 @@ class MahjongGame:
             if self.game_over:
                 break
 
-        if len(self.tiles) == 0:
-            print("==================")
-            print("GAME DRAW")
-            for player in self.players:
-                player.print_hand()
+        if not self.game_over:
+            if verbose:
+                print("==================")
+                print("GAME DRAW")
+                for player in self.players:
+                    player.print_hand()
             return None
         else:
-            print("==================")
-            print(f"Player {self.winner.player_id} won")
-            self.winner.print_hand()
-
-            if self.current_player is self.winner:
-                scores = self.convert_score(self.winner.highest_fan, -1, self.winner.player_id)
-                print("Self draw")
-            else:
-                if self.discarding_player is self.winner:
-                    raise ValueError
-                scores = self.convert_score(self.winner.highest_fan, self.discarding_player.player_order,
-                                            self.winner.player_order)
-                print("Discard win")
+            if verbose:
+                print("==================")
+                print(f"Player {self.winner.player_id} won")
+                self.winner.print_hand()
+
+            scores = self.round_scores()
+            if verbose:
+                print("Self draw" if self.current_player is self.winner else "Discard win")
             if (scores[0] + scores[1] + scores[2] + scores[3]) != 0:
                 print(scores)
                 raise ValueError("Scores do not add up to zero.")
@@ -168,24 +425,42 @@ class MahjongGame:
                 self.players[i].score += scores[i]
             return self.winner
 
-    def draw_tile(self, player: Player) -> Optional[MahjongTile]:
+    def round_scores(self) -> List[int]:
+        """
+        Return the points each player in game.players wins or loses on the round as
+        it stands, all zero unless someone has won
+        """
+        winner = self.winner
+        if winner is None:
+            return [0, 0, 0, 0]
+        if self.current_player is winner:
+            return self.convert_score(winner.highest_fan, -1, winner.player_order)
+        if self.discarding_player is winner:
+            raise ValueError
+        return self.convert_score(winner.highest_fan, self.discarding_player.player_order, winner.player_order)
+
+    def draw_tile(self, player: Player, replacement: bool = False) -> Optional[MahjongTile]:
         """
         Draw a tile from the pile, redraw on any flowers, and
         automatically claim add_kong or win. Return the drawn tile.
         :param player: the player who is drawing
+        :param replacement: draw from the back of the wall, as after a kong
         :return: the drawn tile
         """
         self.last_acting_player = player
-        drawn_tile = self.tiles.pop()
-        state = self.get_state()
+        wall = self.wall
+        drawn_tile = wall.draw_replacement() if replacement else wall.draw()
+        state = self._update_state()
         # print(f"Player {player.player_id} has drawn {drawn_tile}")
-        while drawn_tile.tiletype == "flower" and len(self.tiles) != 0:
+        while drawn_tile.tiletype == "flower" and len(wall) != 0:
             player.flowers.append(drawn_tile)
-            drawn_tile = self.tiles.pop()
+            player.hand_changed()
+            drawn_tile = wall.draw_replacement()
             # print(f"Player {player.player_id} has redrawn a flower to {drawn_tile}")
 
         if drawn_tile.tiletype == "flower":
             player.flowers.append(drawn_tile)
+            player.hand_changed()
             return None
 
         # if (player.decide_win(drawn_tile, self.circle_wind, self.current_player_no, state)
@@ -193,28 +468,21 @@ class MahjongGame:
         if Player.decide_win(player, drawn_tile, self.circle_wind, self.current_player_no, state):
             self.game_over = True
             self.winner = player
-            print(f"Player {player.player_id} has claimed a win")
-            print(player.player_id)
+            if self.verbose:
+                print(f"Player {player.player_id} has claimed a win")
+                print(player.player_id)
             self.last_action = MahjongActions.WIN
-            state = self.get_state()
-            self.log.append({
-                "player_id": self.current_player.player_id,
-                "state": state,
-                "action_type": "win",
-                "is_claim": True,
-                "reward": 0.0,
-                "gameover": True
-            })
+            self.log.append(self._update_state(), self.current_player.player_id, MahjongActions.WIN, is_discard=False)
             return None
 
         else:
 
             latest_tile, self.latest_tile = self.latest_tile, drawn_tile
 
-            state = self.get_state()
+            state = self._update_state()
             while Player.decide_add_kong(player, drawn_tile, state) and player.decide_add_kong(drawn_tile,
                                                                                                state) and len(
-                self.tiles) > 0:
+                wall) > 0:
                 for _ in range(3):
                     self.players[self.current_player_no].hidden_hand.remove(drawn_tile)
 
@@ -222,9 +490,10 @@ class MahjongGame:
                                                                            drawn_tile,
                                                                            drawn_tile,
                                                                            drawn_tile])
+                self.players[self.current_player_no].hand_changed()
                 # print(f"Player {player.player_id} has claimed a kong")
                 # print(f"Player {player.player_id} is redrawing")
-                latest_tile = self.draw_tile(player)
+                latest_tile = self.draw_tile(player, replacement=True)
 
                 self.last_acting_player = player
                 self.last_action = MahjongActions.ADD_KONG
@@ -237,28 +506,43 @@ class MahjongGame:
             # print(drawn_tile)
             return drawn_tile
 
-    def play_turn(self) -> Tuple[Optional[int], Optional[str], Optional[List]]:
+    def play_turn(self) -> Tuple[Optional[int], Optional[MahjongActions]]:
         """
         Execute actions in the turn in this order
         1. Discard the tile for current player
         2. Check if any other players want to respond to discard
         3. Sort all actions
         4. Return action with the highest priority
-        :return: action with the highest priority, or None if no one wants to make actions
+        :return: (player_id, action) with the highest priority, or (None, None) if no one wants to make actions
         """
-        state = self.get_state()
+        state = self._update_state()
         self.discard_tile(self.current_player, state)
         action_queue = []
-        for i in range(0, 4):
-            if i == self.current_player_no:
-                continue
-            player = self.players[i]
-            queued_action = player.prepare_action(self.latest_tile, self.circle_wind, self.current_player_no)
-            if queued_action is not None:
-                action_queue.append(queued_action)
+        for player in self.claimants(self.latest_tile):
+            player_id, claim, indices = player.prepare_action(self.latest_tile, self.circle_wind,
+                                                              self.current_player_no)
+            if claim is not None:
+                action_queue.append((player_id, self._claim_action(player, claim, indices)))
 
         return self.resolve_actions(action_queue)
 
+    def _claim_action(self, player: Player, claim: str, indices: Optional[Tuple[int, int]]) -> MahjongActions:
+        """
+        Convert a claim from Player.prepare_action into the action execute_interrupt takes
+        """
+        if claim == "win":
+            return MahjongActions.WIN
+        if claim == "kong":
+            return MahjongActions.ADD_KONG
+        if claim == "pong":
+            return MahjongActions.PONG
+        numchars = [player.hidden_hand[index].numchar for index in indices]
+        if max(numchars) < self.latest_tile.numchar:
+            return MahjongActions.LOWER_SHEUNG
+        if min(numchars) > self.latest_tile.numchar:
+            return MahjongActions.UPPER_SHEUNG
+        return MahjongActions.MIDDLE_SHEUNG
+
     def execute_interrupt(self, actioning_player_id: Optional[int], action_to_execute: Optional[int]) -> bool:
         """
         Execute the interrupt if the action is not None, and return whether any
@@ -270,7 +554,7 @@ class MahjongGame:
         """
 
         if actioning_player_id is not None:
-            state = self.get_state()
+            state = self._update_state()
 
             if 15 <= action_to_execute <= 19:  # if the interrupt is not a win claim (MahjongActions.WIN = 20)
                 self.last_acting_player.discard_pile.remove(self.latest_tile)  # we stole the tile so remove from discard pile
@@ -283,7 +567,9 @@ class MahjongGame:
                     actioning_player = player
                     break
             if action_to_execute == MahjongActions.WIN:
-                print("WE HAVE WON")
+                if self.verbose:
+                    print("WE HAVE WON")
+                Player.decide_win(actioning_player, self.latest_tile, self.circle_wind, self.current_player_no)
                 self.game_over = True
                 self.winner = actioning_player
                 self.last_action = MahjongActions.WIN
@@ -293,10 +579,11 @@ class MahjongGame:
                 for _ in range(0, 3):
                     actioning_player.hidden_hand.remove(self.latest_tile)
                 actioning_player.revealed_sets.append([self.latest_tile] * 4)
+                actioning_player.hand_changed()
                 self.current_player_no = actioning_player.player_order
                 self.current_player = actioning_player
                 self.last_action = MahjongActions.ADD_KONG
-                self.draw_tile(actioning_player)
+                self.draw_tile(actioning_player, replacement=True)
                 self.is_discard = True
                 return True
             elif action_to_execute == MahjongActions.PONG:
@@ -304,6 +591,7 @@ class MahjongGame:
                 for _ in range(2):
                     actioning_player.hidden_hand.remove(self.latest_tile)
                 actioning_player.revealed_sets.append([self.latest_tile] * 3)
+                actioning_player.hand_changed()
                 self.current_player_no = actioning_player.player_order
                 self.current_player = self.players[self.current_player_no]
                 self.last_action = MahjongActions.PONG
@@ -311,11 +599,12 @@ class MahjongGame:
                 return True
             elif 17 <= action_to_execute <= 19:
                 # print(f"Sheung is called by Player {actioning_player_id}")
-                indices = self.find_indices(action_to_execute, executing_player=self.players[actioning_player_id])
+                indices = self.find_indices(action_to_execute, executing_player=actioning_player)
                 i1, i2 = sorted(indices, reverse=True)
                 sheung_tile_1 = actioning_player.hidden_hand.pop(i1)
                 sheung_tile_2 = actioning_player.hidden_hand.pop(i2)
                 actioning_player.revealed_sets.append([sheung_tile_1, sheung_tile_2, self.latest_tile])
+                actioning_player.hand_changed()
                 self.current_player_no = actioning_player.player_order
                 self.current_player = self.players[self.current_player_no]
                 self.last_action = MahjongActions.UPPER_SHEUNG  # doesn't matter what the action is, just that it is a
@@ -342,6 +631,7 @@ class MahjongGame:
             self.last_acting_player = player
             self.last_action = MahjongActions.DISCARD_TILE_1  # doesn't matter what kind of discard, just that it is a discard
             player.hidden_hand.remove(tile)
+            player.hand_changed()
             player.discard_pile.append(tile)
             self.latest_tile = tile
         else:
@@ -352,6 +642,7 @@ class MahjongGame:
             self.last_acting_player = player
             self.last_action = MahjongActions.DISCARD_TILE_1  # doesn't matter what kind of discard, just that it is a discard
             player.hidden_hand.remove(discarded_tile)
+            player.hand_changed()
             player.discard_pile.append(discarded_tile)
 
             if len(player.revealed_sets) * 3 + len(player.hidden_hand) != 13:
@@ -485,52 +776,101 @@ class MahjongGame:
         # 34*3 + 8 + 4 + 1 = 217
         return np.concatenate([hidden, revealed, discards, flower_set, seat_wind_vec, potential_fan])
 
-    def get_state(self) -> np.ndarray:
+    def get_state(self, out: Optional[np.ndarray] = None) -> np.ndarray:
         """
         Generate an array representing all information about
         the current game state and return it.
+        :param out: array of shape (MahjongGame.state_size, ) to write the state into instead of a new one
         :return: a size (MahjongGame.state_size, ) numpy array containing information about game state
         """
-        players = self.players
-        player_states = [self.get_player_state(player) for player in players]
-        player_states_vec = np.concatenate([ps.flatten() for ps in player_states])  # 4 * 217
-
-        latest_tile_vec = np.zeros(34, dtype=np.float32)  # 34
-        if self.latest_tile is not None:
-            latest_tile_vec[self.latest_tile.to_index()] = 1.0
-
-        discarding_player_vec = np.zeros(4, dtype=np.float32)
-        if self.discarding_player is not None:
-            discarding_player_vec[self.discarding_player.player_id] = 1.0
-        # 4
-
-        tiles_remaining = np.array([len(self.tiles) / 144], dtype=np.float32)  # 1,
-        # normalised since HK Mahjong uses 144 tiles
-
-        current_turn = np.zeros(len(players), dtype=np.float32)  # 4
-        current_turn[self.current_player.player_order] = 1.0
-
-        circle_wind_vec = np.zeros(4, dtype=np.float32)
-        circle_wind_mapping = {'east': 0, 'south': 1, 'west': 2, 'north': 3}
-        circle_wind_vec[circle_wind_mapping[self.circle_wind]] = 1.0  # 4
+        if out is None:
+            return self._update_state().copy()
+        np.copyto(out, self._update_state())
+        return out
 
-        last_acting_player_vec = np.zeros(4, dtype=np.float32)
-        if self.last_acting_player is not None:
-            last_acting_player_vec[self.last_acting_player.player_id] = 1.0  # 4
-
-        is_discard_vec = np.array([float(self.is_discard)], dtype=np.float32)
-
-        state = np.concatenate([
-            player_states_vec,
-            latest_tile_vec,
-            discarding_player_vec,
-            tiles_remaining,
-            current_turn,
-            circle_wind_vec,
-            last_acting_player_vec,
-            is_discard_vec
-        ])
+    def _attach_state(self, state: np.ndarray) -> np.ndarray:
+        """
+        Use the given array as the state buffer, with nothing recorded as encoded in it yet
+        """
+        self._state = state
+        self._player_blocks = []
+        for slot in range(4):
+            block = state[slot * PLAYER_STATE_SIZE:(slot + 1) * PLAYER_STATE_SIZE]
+            self._player_blocks.append((block, block[HIDDEN_OFFSET:REVEALED_OFFSET],
+                                        block[REVEALED_OFFSET:DISCARDS_OFFSET],
+                                        block[DISCARDS_OFFSET:FLOWERS_OFFSET]))
+        self._encoded = [None] * 4
+        self._encoded_wind = None
+        self._encoded_tail = None
+        self._tail_ones = []
+        self._state_view = memoryview(state)
+        return state
 
+    def _update_state(self) -> np.ndarray:
+        """
+        Bring the preallocated state buffer up to date and return it (not a copy).
+        Each player block is only re-encoded where the version of the underlying
+        hand, meld or pile container changed since the last call, and the per-game
+        values after the player blocks are only rewritten when one of them changed.
+        The game passes this buffer to the decide_* methods of its players, which
+        have to copy it to keep it past the call.
+        """
+        state = self._state
+        if state is None:
+            state = self._attach_state(np.zeros(MahjongGame.state_size, dtype=np.float32))
+
+        circle_wind = self.circle_wind
+        if circle_wind != self._encoded_wind:
+            self._encoded_wind = circle_wind
+            self._encoded = [None] * 4
+        encoded = self._encoded
+        for slot, player in enumerate(self.players):
+            # versions of (hidden, revealed, discards, flowers) and the seat, which also differ for another player
+            key = player.encoding_key()
+            seen = encoded[slot]
+            if key == seen:
+                continue
+            if seen is None:
+                seen = (None,) * 5
+            encoded[slot] = key
+            block, hidden_block, revealed_block, discards_block = self._player_blocks[slot]
+            if key[0] != seen[0]:
+                QUARTERS.take(player.hidden_counts, out=hidden_block, mode='clip')
+            revealed_changed = key[1] != seen[1]
+            if revealed_changed:
+                QUARTERS.take(player.revealed_sets.slot_counts.ravel(), out=revealed_block, mode='clip')
+            if key[2] != seen[2]:
+                QUARTERS.take(player.discard_counts, out=discards_block, mode='clip')
+            flowers_changed = key[3] != seen[3]
+            if flowers_changed:
+                block[FLOWERS_OFFSET:SEAT_WIND_OFFSET] = player.flowers.flower_counts
+            if revealed_changed or flowers_changed or key[4] != seen[4]:
+                block[SEAT_WIND_OFFSET:POTENTIAL_FAN_OFFSET] = 0.0
+                block[SEAT_WIND_OFFSET + player.player_order % 4] = 1.0
+                block[POTENTIAL_FAN_OFFSET] = Player.potential_fan(player.revealed_sets, player.flowers, circle_wind,
+                                                                   player.player_order) / 20.0  # max fan is 20
+
+        wall = self.wall
+        tail = (self.latest_tile, self.discarding_player, wall.back - wall.front, self.current_player.player_order,
+                circle_wind, self.last_acting_player, self.is_discard)
+        if tail != self._encoded_tail:
+            self._encoded_tail = tail
+            latest_tile, discarding_player, tiles_remaining, current_order, _, last_acting_player, is_discard = tail
+            ones = [CURRENT_TURN_OFFSET + current_order, CIRCLE_WIND_OFFSET + CIRCLE_WINDS.index(circle_wind)]
+            if latest_tile is not None:
+                ones.append(LATEST_TILE_OFFSET + latest_tile.to_index())
+            if discarding_player is not None:
+                ones.append(DISCARDING_PLAYER_OFFSET + discarding_player.player_order)
+            if last_acting_player is not None:
+                ones.append(LAST_ACTING_PLAYER_OFFSET + last_acting_player.player_order)
+            view = self._state_view  # item assignment through a memoryview is much cheaper than through numpy
+            for index in self._tail_ones:
+                view[index] = 0.0
+            for index in ones:
+                view[index] = 1.0
+            self._tail_ones = ones
+            view[TILES_REMAINING_OFFSET] = tiles_remaining / 144  # normalised since HK Mahjong uses 144 tiles
+            view[IS_DISCARD_OFFSET] = float(is_discard)
         return state
 
     def finish_episode(self, player_id: int, winloss: int, fan: int):
@@ -539,11 +879,7 @@ class MahjongGame:
         loss -> winloss = -1
         draw -> winloss = 0
         """
-        reward = MahjongGame.reward_function(winloss, fan)
-        for step in self.log:
-            if step["player_id"] == player_id:
-                step["reward"] = reward
-                step["gameover"] = True
+        self.log.set_rewards(player_id, MahjongGame.reward_function(winloss, fan))
 
     @staticmethod
     def reward_function(winloss: int, score: int) -> float:
@@ -603,7 +939,7 @@ class MahjongGame:
         if self.latest_tile is None:
             return False
         if action == "win":
-            return Player.decide_win(player, self.latest_tile, self.circle_wind, self.current_player_no)
+            return player.can_win_on(self.latest_tile, self.circle_wind)
         elif action == "pong":
             return Player.decide_pong(player, self.latest_tile)
         elif action == "kong":
@@ -625,31 +961,14 @@ class MahjongGame:
         :return: a list of numerical actions (corresponding to enumerator MahjongActions
                  which the player can legally make
         """
-        legal_actions = []
-
         if discard_turn and our_turn:
             # player can only discard
-            legal_actions.extend(range(len(player.hidden_hand)))
+            return list(range(len(player.hidden_hand)))
         elif discard_turn or (our_turn and not discard_turn):
-            legal_actions = [MahjongActions.PASS]
-        else:
-            # a player can only respond to the move, or pass
-            action_map = {
-                MahjongActions.WIN: "win",
-                MahjongActions.ADD_KONG: "kong",
-                MahjongActions.PONG: "pong",
-                MahjongActions.LOWER_SHEUNG: "lower sheung",
-                MahjongActions.MIDDLE_SHEUNG: "middle sheung",
-                MahjongActions.UPPER_SHEUNG: "upper sheung"
-            }
-
-            for action_id, action_str in action_map.items():
-                if self.validate_actions(player, action_str):
-                    legal_actions.append(action_id)
-
-            legal_actions.append(MahjongActions.PASS)
-
-        return legal_actions
+            return [MahjongActions.PASS]
+        # a player can only respond to the move, or pass
+        return [MahjongActions(action) for action, legal in enumerate(self._claim_rows([player])[0], MahjongActions.WIN)
+                if legal]
 
         """
         LEGACY PLAY TURN CODE FOR REFERENCE ONLY
@@ -705,184 +1024,67 @@ class MahjongGame:
         """
 
     @staticmethod
-    def reconstruct_game(state: np.ndarray, injected_decision_model: Optional[MahjongModel] = None) -> Tuple[
-        MahjongGame, bool]:
+    def reconstruct_game(state: np.ndarray, injected_decision_model: Optional[MahjongModel] = None,
+                         strict: bool = False, rng: Optional[random.Random] = None) -> Tuple[MahjongGame, bool]:
         """
         Reconstruct a MahjongGame from the given state array.
 
+        The wall is whatever is not in a hand, revealed set, discard pile or flower
+        collection, i.e. 4 - counts for each of the 34 tile types and 1 - counts for
+        each flower, in the order of a fresh unshuffled wall.
+
         :param state: A numpy array representing the game state.
+        :param strict: re-encode every player and check it round-trips to the given state
+        :param rng: random source of the rebuilt game and its players, e.g. MahjongGame.game_rng, so
+                    playouts from it can be reproduced; seeded from the random module when not given
         :return: A new MahjongGame instance reconstructed from the state.
         """
         game = object.__new__(MahjongGame)
-        players = []
-        player_states_vec = state[:868]  # 217 * 4 = 868 values correspond to all player states
-
-        total_tiles = np.zeros(34, dtype=np.float32)  # 34
-        # 217 size state
-        for i in range(4):
-            player_start_index = i * 217
-            player_end_index = (i + 1) * 217
-            player_state = player_states_vec[player_start_index:player_end_index]
-            total_tiles += player_state[: 34]  # hidden hand
-
-            total_tiles += player_state[34: 34 * 2]   # revealed_set 1
-            total_tiles += player_state[34 * 2: 34 * 3]  # revealed_set 2
-            total_tiles += player_state[34 * 3: 34 * 4]  # revealed_set 3
-            total_tiles += player_state[34 * 4: 34 * 5]  # revealed_set 4
-
-            total_tiles += player_state[34 * 5: 34 * 6]  # discarded_pile
-
-            assert len(total_tiles) <= 50
-
-            player = Player.player_from_player_state(
-                player_state, i, i
-            )
-
-            players.append(player)
-            player_state_regenerated = game.get_player_state(player)
-            assert all(player_state_regenerated[i] == player_state[i] for i in range(len(player_state_regenerated) - 5))
-        # for i in range(len(total_tiles)):
-        #     if total_tiles[i] > 1.0:
-        #         print(f"ERROR TILE {i}")
-        #         assert all(tile <= 1.0 for tile in total_tiles), "Invalid tile counts detected during reconstruction." + str(tile)
-
-        # print(total_tiles)
-        latest_tile_vec = state[868:902]
-        if all(latest_tile == 0.0 for latest_tile in latest_tile_vec):
-            latest_tile = None
-        else:
-            latest_tile_index = np.argmax(latest_tile_vec)
-            latest_tile = MahjongTile.index_to_tile(
-                int(latest_tile_index)
-            )
-
-
-        discarding_player_vec = state[902:906]
-        discarding_player_id = np.argmax(discarding_player_vec)
-        discarding_player = players[discarding_player_id]
-
-        tiles_remaining = int(state[906] * 144)  # might be redundant information??
-
-        current_turn_vec = state[907:911]
-        current_player_id = np.argmax(current_turn_vec)
-        current_player = players[current_player_id]
-
-        # Rebuild circle wind information
-        circle_wind_vec = state[911:915]  # The next 4 values are for the circle wind
-        circle_wind_index = np.argmax(circle_wind_vec)
-        circle_wind_mapping = {0: 'east', 1: 'south', 2: 'west', 3: 'north'}
-        circle_wind = circle_wind_mapping[int(circle_wind_index)]
-
-        last_acting_player_vec = state[915:919]
-        last_acting_player_index = np.argmax(last_acting_player_vec)
-        last_acting_player = players[last_acting_player_index]
-        is_discard = bool(state[919:920][0])
-
-
+        player_states = state[:LATEST_TILE_OFFSET].reshape(4, PLAYER_STATE_SIZE)
+        counts = np.rint(player_states[:, :FLOWERS_OFFSET] * 4).astype(np.uint8)  # hidden, revealed, discards
+        flower_counts = np.rint(player_states[:, FLOWERS_OFFSET:SEAT_WIND_OFFSET]).astype(np.uint8)
+
+        players = [Player.player_from_counts(counts[i, HIDDEN_OFFSET:REVEALED_OFFSET],
+                                             counts[i, REVEALED_OFFSET:DISCARDS_OFFSET].reshape(4, 34),
+                                             counts[i, DISCARDS_OFFSET:FLOWERS_OFFSET], flower_counts[i], i, i)
+                   for i in range(4)]
+        if strict:
+            for i, player in enumerate(players):
+                # the seat wind and potential fan are derived, so only the tiles need to match
+                if not np.array_equal(game.get_player_state(player)[:SEAT_WIND_OFFSET],
+                                      player_states[i, :SEAT_WIND_OFFSET]):
+                    raise ValueError(f"Player {i} does not round-trip through the state")
+
+        remaining = np.empty(NUM_TILE_CODES, dtype=np.int16)
+        remaining[:NUM_TILE_TYPES] = 4
+        remaining[NUM_TILE_TYPES:] = 1
+        remaining[:NUM_TILE_TYPES] -= counts.reshape(4, 6, 34).sum(axis=(0, 1), dtype=np.int16)
+        remaining[NUM_TILE_TYPES:] -= flower_counts.sum(axis=0, dtype=np.int16)
+        if remaining.min() < 0:
+            raise ValueError(f"More copies of tile {MahjongTile.from_code(int(remaining.argmin()))} than exist")
+        game.wall = Wall(MahjongGame._full_wall_codes)
+        game.wall.refill(np.repeat(MahjongGame._wall_codes, remaining[MahjongGame._wall_codes]))
+
+        latest_tile_vec = state[LATEST_TILE_OFFSET:DISCARDING_PLAYER_OFFSET]
+        latest_tile = MahjongTile.index_to_tile(int(np.argmax(latest_tile_vec))) if latest_tile_vec.any() else None
+        discarding_player = players[int(np.argmax(state[DISCARDING_PLAYER_OFFSET:TILES_REMAINING_OFFSET]))]
+        current_player = players[int(np.argmax(state[CURRENT_TURN_OFFSET:CIRCLE_WIND_OFFSET]))]
+        last_acting_player = players[int(np.argmax(state[LAST_ACTING_PLAYER_OFFSET:IS_DISCARD_OFFSET]))]
+        is_discard = bool(state[IS_DISCARD_OFFSET])
 
         game.players = players
-
-        game.tiles = MahjongGame.initialize_tiles()
-        assert len(game.tiles) == 144
-        tile_count = {}
-        for tile in game.tiles:
-            if tile in tile_count:
-                tile_count[tile] += 1
-            else:
-                tile_count[tile] = 1
-        # assert all(count == 4 or (count == 1 and tile.tiletype == 'flower') for tile, count in tile_count.items())
-        # for player in game.players:
-        #     for tile in player.hidden_hand:
-        #         game.tiles.remove(tile)
-        #     for tile_set in player.revealed_sets:
-        #         for tile in tile_set:
-        #             game.tiles.remove(tile)
-
-        # print(f"\nInitial tile pool size: {len(game.tiles)}")
-
-        # Track what we're removing
-        tiles_to_remove = []
-
-        all_discarded = []
-
-        for player_idx, player in enumerate(game.players):
-            # print(f"\nPlayer {player_idx}:")
-            # print(f"  Hidden hand: {len(player.hidden_hand)} tiles")
-            # print(f"  Revealed sets: {sum(len(s) for s in player.revealed_sets)} tiles")
-            # print(f"  Flowers: {len(player.flowers)} tiles")
-            # print(f"  Discard pile: {len(player.discard_pile)} tiles")
-
-            # Hidden hand
-            for tile in player.hidden_hand:
-                tiles_to_remove.append(('hidden', player_idx, tile))
-
-            # Revealed sets
-            for tile_set in player.revealed_sets:
-                for tile in tile_set:
-                    tiles_to_remove.append(('revealed', player_idx, tile))
-
-            # Flowers
-            for flower in player.flowers:
-                assert flower.tiletype == 'flower'
-                tiles_to_remove.append(('flower', player_idx, flower))
-
-            # Discard pile
-            for tile in player.discard_pile:
-                tiles_to_remove.append(('discard', player_idx, tile))
-                all_discarded.append(tile)
-
-        # assert len(tiles_to_remove) <= 144
-        for _, _, tile in tiles_to_remove:
-            tile_count[tile] -= 1
-        # assert all(count >= 0 for count in tile_count.values())
-
-        tile_count = {}
-        for _, _, tile in tiles_to_remove:
-            if tile not in tile_count:
-                tile_count[tile] = 1
-            else:
-                tile_count[tile] += 1
-
-        # assert all(count <= 4 for count in tile_count.values())
-
-        # Now try to remove tiles and catch the problematic one
-        removed_tiles_so_far = 0
-        for source, player_idx, tile in tiles_to_remove:
-            try:
-                removed_tiles_so_far += 1
-                game.tiles.remove(tile)
-            except ValueError:
-                print(f"\n!!! ERROR: Cannot remove tile from {source} of player {player_idx}")
-                print(f"    Latest tile: {game.latest_tile}")
-                for player in game.players:
-                    player.all_tiles()
-                print(f"    Tile: {tile}")
-                print(f"    Tile details: type={tile.tiletype}, subtype={tile.subtype}, numchar={tile.numchar}")
-
-                # Check if any similar tiles exist
-                matching_tiles = [t for t in game.tiles if t == tile]
-                print(f"    Matching tiles in pool: {len(matching_tiles)}")
-
-                # Count this tile type
-                tile_count = sum(1 for t in game.tiles if t.tiletype == tile.tiletype
-                                 and t.subtype == tile.subtype and t.numchar == tile.numchar)
-                print(f"    This tile type count in pool: {tile_count}")
-
-                # Show total tiles remaining
-                print(f"    Total tiles in pool: {len(game.tiles)}")
-                print(f"    Total tiles removed so far: {removed_tiles_so_far}")
-
-                raise
-
-        # print(f"\nFinal tile pool size: {len(game.tiles)}")
-
+        game.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        for player in players:
+            player.rng = game.rng
+        game.log = GameLog(MahjongGame.state_size)
+        game._undo_stack = []
         game.current_player = current_player
         game.current_player_no = current_player.player_order
         game.latest_tile = latest_tile
         game.discarding_player = discarding_player
         game.game_over = False
         game.last_acting_player = last_acting_player
-        game.circle_wind = 'east'  # circle_wind
+        game.circle_wind = CIRCLE_WINDS[int(np.argmax(state[CIRCLE_WIND_OFFSET:CIRCLE_WIND_OFFSET + 4]))]
 
         game.is_discard = is_discard
         game.discarded_tiles = []
@@ -913,16 +1115,93 @@ class MahjongGame:
                                 numchar=self.latest_tile.numchar + 2)
         return executing_player.hidden_hand.index(tile1), executing_player.hidden_hand.index(tile2)
 
-    def find_legal_transitions(self):
-        legal_actions_by_player = [self.get_legal_actions(
-            discard_turn=self.is_discard,
-            our_turn=player == self.current_player,
-            player=player)
-            for player in self.players
-        ]
-        for i in range(4):
-            legal_actions_by_player[i].pop()  # remove the PASS option for everyone
-        return [(i, legal_actions_by_player[i][j]) for i in range(4) for j in range(len(legal_actions_by_player[i]))]
+    def legal_action_mask(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Return bool[4, NUM_ACTIONS], row i holding the legal MahjongActions of the
+        player in seat i in the current phase, i.e. get_legal_actions for every
+        player at once. Meant for masking policy logits, e.g.
+            np.where(game.legal_action_mask(), logits, -np.inf)
+        Nothing is legal once the game is over or the wall is empty.
+        :param out: bool[4, NUM_ACTIONS] to write the mask into instead of a new array
+        """
+        if out is None:
+            mask = np.zeros((4, NUM_ACTIONS), dtype=bool)
+        else:
+            mask = out
+            mask[:] = False
+        if self.game_over or len(self.wall) == 0:
+            return mask
+        seat = next(i for i, player in enumerate(self.players) if player is self.current_player)
+        if self.is_discard:
+            mask[:, MahjongActions.PASS] = True
+            mask[seat, MahjongActions.PASS] = False
+            mask[seat, :min(len(self.current_player.hidden_hand), MahjongActions.WIN)] = True
+        else:
+            mask[:, MahjongActions.WIN:] = self._claim_rows(self.players)
+            mask[seat, :MahjongActions.PASS] = False  # nobody claims their own discard
+        return mask
+
+    def _claim_rows(self, players: List[Player]) -> List[List[bool]]:
+        """
+        Return, for each player, whether they can make each claim from WIN to PASS
+        on latest_tile. Only reads the tile counts of the hands, which is cheaper
+        than validate_actions going through the hand once per claim.
+        """
+        tile = self.latest_tile
+        if tile is None or tile.tiletype == 'flower':
+            return [[False] * 6 + [True] for _ in players]
+        index = tile.to_index()
+        # offsets of the neighbours which are in the same suit, None for honours
+        offsets = [offset if 1 <= tile.numchar + offset <= 9 else None for offset in (-2, -1, 1, 2)] \
+            if tile.tiletype == 'suit' else [None] * 4
+        rows = []
+        for player in players:
+            hand = player.hidden_hand
+            count = hand.count_index(index)
+            low2, low1, high1, high2 = [offset is not None and hand.count_index(index + offset) > 0
+                                        for offset in offsets]
+            rows.append([player.can_win_on(tile, self.circle_wind), count >= 3, count >= 2,
+                         low2 and low1, low1 and high1, high1 and high2, True])
+        return rows
+
+    def claimants(self, tile: Optional[MahjongTile]) -> List[Player]:
+        """
+        Return the players other than the current one who could claim a discard of
+        tile at all (see Player.claimable_tiles), in seat order. Whether they may
+        and want to is still up to prepare_action or legal_action_mask. The index
+        behind it is only rebuilt for the hands which changed since the last call,
+        so a discard nobody can claim is a single lookup.
+        """
+        if tile is None or tile.tiletype == 'flower':
+            return []
+        seats = (self._claim_index() >> 8 * tile.to_index()) & ~(1 << self.current_player_no) & 0x0F
+        if not seats:
+            return []
+        return [player for seat, player in enumerate(self.players) if seats >> seat & 1]
+
+    def _claim_index(self) -> int:
+        """
+        Bring _claim_seats up to date with the hidden hands and return it
+        """
+        if self._claim_hands is None:
+            self._claim_seats = 0
+            self._claim_hands = [None] * len(self.players)
+        claim_hands = self._claim_hands
+        for seat, player in enumerate(self.players):
+            hidden = player.hidden_hand
+            built = claim_hands[seat]
+            if built is None or built[0] is not hidden or built[1] != hidden.version:
+                self._claim_seats = (self._claim_seats & ~(ALL_TILE_LANES << seat)) | (player.claimable_tiles() << seat)
+                claim_hands[seat] = (hidden, hidden.version)
+        return self._claim_seats
+
+    def find_legal_transitions(self) -> List[Tuple[int, int]]:
+        """
+        Return every (seat, action) in legal_action_mask() other than passing
+        """
+        mask = self.legal_action_mask()
+        mask[:, MahjongActions.PASS] = False
+        return [(int(seat), int(action)) for seat, action in zip(*np.nonzero(mask))]
 
     def get_visible_tiles(self, player_id: int):
         visible_tiles = []
@@ -932,3 +1211,31 @@ class MahjongGame:
             player = self.players[i]
             visible_tiles += [tile for completed_set in player.revealed_sets for tile in completed_set]
             visible_tiles += player.discard_pile
+        return visible_tiles
+
+    def visible_counts(self) -> np.ndarray:
+        """
+        Return uint8[34] counts of every tile in a discard pile or revealed set,
+        i.e. the tiles which can no longer be drawn by anyone
+        """
+        visible = np.zeros(34, dtype=np.uint8)
+        for player in self.players:
+            visible += player.revealed_counts
+            visible += player.discard_counts
+        return visible
+
+    @staticmethod
+    def visible_counts_from_state(state: np.ndarray) -> np.ndarray:
+        """
+        Same as visible_counts() but read from a state produced by get_state()
+        :param state: a size (MahjongGame.state_size, ) game state
+        """
+        player_states = state[:868].reshape(4, 217)
+        visible = player_states[:, 34:34 * 5].reshape(4, 4, 34).sum(axis=(0, 1))  # revealed sets
+        visible += player_states[:, 34 * 5:34 * 6].sum(axis=0)  # discard piles
+        return np.rint(visible * 4).astype(np.uint8)
+
+
+MahjongGame._full_wall = MahjongGame._build_full_wall()
+MahjongGame._full_wall_codes = np.array([tile.code for tile in MahjongGame._full_wall], dtype=np.uint8)
+MahjongGame._wall_codes = np.array(list(dict.fromkeys(MahjongGame._full_wall_codes.tolist())), dtype=np.uint8)
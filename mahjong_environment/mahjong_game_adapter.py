@@ -232,6 +232,13 @@ class MahjongEnvironmentAdapter:
         :param actions: List of (player_id, action) tuples for each player, in order
         :return:
         """
+        self.play_all_actions(actions)
+        return self.get_observation(), self.game.game_over
+
+    def play_all_actions(self, actions: List[Tuple[int, int]]) -> None:
+        """
+        step_with_all_actions without encoding the observation, see VecMahjongEnv
+        """
         # ==================== DISCARD PHASE ====================
         if self.game.is_discard:
             # Find who is discarding
@@ -252,9 +259,6 @@ class MahjongEnvironmentAdapter:
 
             # Transition to interrupt phase
             self.game.is_discard = False
-            obs = self.get_observation()
-            done = self.game.game_over
-            return obs, done
 
         # ==================== INTERRUPT PHASE ====================
         else:
@@ -281,10 +285,6 @@ class MahjongEnvironmentAdapter:
                 if not self.game.game_over:
                     self.game.draw_tile(self.game.current_player)
 
-            obs = self.get_observation()
-            done = self.game.game_over
-            return obs, done
-
     def _map_int_to_action(self, player, action) -> Tuple[Optional[str], Optional[Tuple]]:
         if 0 <= action <= 13:
             return None, None
@@ -349,16 +349,14 @@ class MahjongEnvironmentAdapter:
     def _step_other_player_interrupt(self, rl_player, action):
         # consider interrupts by other players
         action_queue = []
-        for i in range(0, 4):
-            if i == rl_player.player_id:
+        for player in self.game.claimants(self.game.latest_tile):
+            if player is rl_player:
                 continue
-            else:
-                player = self.game.players[i]
-                queued_action = player.prepare_action(self.game.latest_tile,
-                                                      self.game.circle_wind,
-                                                      self.game.current_player_no)
-                if queued_action is not None:
-                    action_queue.append(queued_action)
+            queued_action = player.prepare_action(self.game.latest_tile,
+                                                  self.game.circle_wind,
+                                                  self.game.current_player_no)
+            if queued_action is not None:
+                action_queue.append(queued_action)
         actioning_player_id, action_to_execute = self.game.resolve_actions(action_queue)
 
         is_interrupted = self.game.execute_interrupt(actioning_player_id, action_to_execute)
@@ -375,6 +373,7 @@ class MahjongEnvironmentAdapter:
 
     def _step_our_interrupt(self, rl_player, action):
         action_queue = []
+        claimants = self.game.claimants(self.game.latest_tile)
         for i in range(0, 4):
             if i == self.game.current_player_no:
                 continue
@@ -388,7 +387,7 @@ class MahjongEnvironmentAdapter:
                             self.controlling_player_id, action_str, possible_indices
                         )
                     )
-            else:
+            elif self.game.players[i] in claimants:
                 player = self.game.players[i]
                 queued_action = player.prepare_action(self.game.latest_tile,
                                                       self.game.circle_wind,
@@ -2,12 +2,28 @@
 mahjong_logic_tests.py - test class for our Mahjong logic
 """
 
+import contextlib
+import copy
+import io
+import pickle
+import random
 import unittest
 
-from mahjong_environment.ai_bot import BasicBot, YesBot
+import numpy as np
+
+from mahjong_environment.ai_bot import BasicBot, RandomBot, YesBot
+from mahjong_environment.game_log import GameLog
+from mahjong_environment.hand_analysis import (NOT_IN_HAND, analyse_batch, hand_decompositions, shanten, ukeire,
+                                               waiting_indices, winning_pair_indices)
+from mahjong_environment.mahjong_actions import MahjongActions
 from mahjong_environment.mahjong_game import MahjongGame
-from player import Player
-from tile import MahjongTile
+from mahjong_environment.mahjong_table import MahjongTable
+from mahjong_environment.player import Player
+from mahjong_environment.scoring import (CacheStats, FanBreakdown, FanCache, WinCheck, completed_fan, score_melds,
+                                         win_with_tile)
+from mahjong_environment.simulation import simulate
+from mahjong_environment.tile import MahjongTile
+from mahjong_environment.vec_env import SubprocVecMahjongEnv, VecMahjongEnv
 
 
 class TestMahjongLogic(unittest.TestCase):
@@ -210,6 +226,470 @@ class TestMahjongLogic(unittest.TestCase):
         player1.hidden_hand.sort()
         self.assertIs(Player.score_hand(player1.revealed_sets, player1.flowers, "east", 0), 0)
 
+    def test_score_melds_breakdown(self):
+        bamboo = [MahjongTile(tiletype="suit", subtype="bamboo", numchar=i) for i in range(1, 10)]
+        red = MahjongTile(tiletype="honour", subtype="dragon", numchar="red")
+        east = MahjongTile(tiletype="honour", subtype="wind", numchar="east")
+        melds = [[bamboo[0]] * 3, [red] * 3, [east] * 3, [bamboo[4]] * 3, [bamboo[8]] * 2]
+        snapshot = [list(meld) for meld in melds]
+
+        breakdown = score_melds(melds, [], "east", 0)
+        self.assertEqual(breakdown, FanBreakdown(flowers=1, dragons=1, winds=2, one_suit=3, triplets=3))
+        self.assertEqual(breakdown.total, Player.score_hand(melds, [], "east", 0))
+        self.assertEqual(Player.potential_fan(melds, [], "east", 0), breakdown.total * 15 // 14)
+        self.assertEqual(melds, snapshot)
+
+    def test_fan_cache(self):
+        cache = FanCache(maxsize=2)
+        player1 = YesBot(1, 0)
+        bamboo = [MahjongTile(tiletype="suit", subtype="bamboo", numchar=i) for i in range(1, 10)]
+        player1.revealed_sets = [[bamboo[8]] * 3]
+        hands = []
+        for i in range(3):
+            player1.hidden_hand = [bamboo[i]] * 3 + [bamboo[3]] * 3 + [bamboo[4]] * 3 + [bamboo[5]] * 2
+            hands.append(player1.hidden_counts.copy())
+        args = (player1.revealed_sets, player1.flowers, "east", 0)
+        for counts in hands + hands[2:]:
+            self.assertEqual(cache.fan(counts, *args), completed_fan(counts, [list(meld) for meld in args[0]],
+                                                                     list(args[1]), "east", 0))
+        self.assertEqual(cache.stats(), CacheStats(hits=1, misses=3, evictions=1, size=2, maxsize=2))
+
+        key = FanCache.key(hands[0], *args)
+        player1.revealed_sets.append([bamboo[7]] * 3)  # a new version, so a miss rather than a stale entry
+        self.assertNotEqual(FanCache.key(hands[0], *args), key)
+        self.assertEqual(cache.fan(hands[0], *args), completed_fan(hands[0], list(args[0]), [], "east", 0))
+        self.assertEqual(cache.stats().misses, 4)
+        self.assertIsNone(cache.fan(np.zeros(34, dtype=np.uint8) + 1, *args))  # None is cached for incomplete hands
+        self.assertIsNone(cache.fan(np.zeros(34, dtype=np.uint8) + 1, *args))
+        self.assertEqual(cache.stats().hits, 2)
+
+    def test_state_is_updated_incrementally(self):
+        players = [YesBot(i + 1, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east')
+        mahjong_game.setup_game()
+
+        def expected_state():
+            blocks = [mahjong_game.get_player_state(player) for player in mahjong_game.players]
+            return np.concatenate(blocks)
+
+        state = mahjong_game.get_state()
+        np.testing.assert_array_equal(state[:868], expected_state())
+        state[:] = 0  # get_state returns a copy
+        self.assertEqual(mahjong_game.get_state()[0:34].sum() * 4, len(players[0].hidden_hand))
+
+        tile = players[0].hidden_hand[0]
+        players[0].hidden_hand.remove(tile)
+        players[0].discard_pile.append(tile)
+        players[1].revealed_sets = [[tile] * 3]
+        players[2].flowers.append(MahjongTile(tiletype="flower", subtype="season", numchar="spring"))
+        mahjong_game.circle_wind = 'south'
+        np.testing.assert_array_equal(mahjong_game.get_state()[:868], expected_state())
+
+        # only the versions are compared, which are never shared, so swapping containers is seen too
+        players[2].hidden_hand, players[3].hidden_hand = players[3].hidden_hand, players[2].hidden_hand
+        np.testing.assert_array_equal(mahjong_game.get_state()[:868], expected_state())
+
+    def test_state_player_one_hots_follow_seat_order(self):
+        players = [YesBot(i + 1, i) for i in range(4)]  # ids 1-4, seats 0-3
+        mahjong_game = MahjongGame(players, 'east')
+        mahjong_game.setup_game()
+        mahjong_game.discard_tile(players[3], tile=players[3].hidden_hand[0])
+        state = mahjong_game.get_state()
+
+        np.testing.assert_array_equal(state[868 + 34:868 + 38], [0.0, 0.0, 0.0, 1.0])  # discarding player
+        np.testing.assert_array_equal(state[868 + 47:868 + 51], [0.0, 0.0, 0.0, 1.0])  # last acting player
+        self.assertAlmostEqual(state[868 + 38], (mahjong_game.wall.back - mahjong_game.wall.front) / 144, places=6)
+        self.assertEqual(state[868 + 51], 1.0)  # is_discard
+        reconstructed, _ = MahjongGame.reconstruct_game(state)
+        self.assertEqual(reconstructed.discarding_player.player_order, 3)
+
+    def test_reconstruct_game(self):
+        players = [YesBot(i + 1, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east')
+        tile = players[0].hidden_hand[0]
+        mahjong_game.discard_tile(players[0], tile=tile)
+        players[1].revealed_sets = [sorted(players[1].hidden_hand.pop() for _ in range(3))]
+        state = mahjong_game.get_state()
+
+        reconstructed, is_discard = MahjongGame.reconstruct_game(state, strict=True)
+        np.testing.assert_array_equal(reconstructed.get_state()[:868], state[:868])
+        self.assertEqual(sorted(reconstructed.tiles), sorted(mahjong_game.tiles))
+        self.assertIs(reconstructed.latest_tile, tile)
+        self.assertEqual(is_discard, mahjong_game.is_discard)
+
+        state[2] = 0.1  # not a whole number of tiles
+        with self.assertRaises(ValueError):
+            MahjongGame.reconstruct_game(state, strict=True)
+        state[2] = 0.0
+        state[5 * 34:6 * 34] = 1.0  # four more of every tile in a discard pile
+        with self.assertRaises(ValueError):
+            MahjongGame.reconstruct_game(state)
+
+    def test_reconstruct_game_round_trip(self):
+        players = [YesBot(i + 1, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'south', verbose=False, rng=MahjongGame.game_rng(0, 0))
+        mahjong_game.discard_tile(players[0], tile=players[0].hidden_hand[0])
+        mahjong_game.is_discard = False
+        state = mahjong_game.get_state()
+
+        reconstructed, _ = MahjongGame.reconstruct_game(state, strict=True, rng=MahjongGame.game_rng(0, 1))
+        self.assertEqual(reconstructed.circle_wind, 'south')
+        np.testing.assert_array_equal(reconstructed.get_state(), state)
+        again, _ = MahjongGame.reconstruct_game(state, rng=MahjongGame.game_rng(0, 1))
+        self.assertEqual(reconstructed.rng.random(), again.rng.random())
+        self.assertIs(reconstructed.players[0].rng, reconstructed.rng)
+
+    def test_clone_game(self):
+        players = [YesBot(i + 1, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'south')
+        mahjong_game.discard_tile(players[0], tile=players[0].hidden_hand[0])
+        state = mahjong_game.get_state()
+
+        clone = mahjong_game.clone()
+        self.assertIsInstance(clone.players[0], YesBot)
+        self.assertIs(clone.current_player, clone.players[0])
+        self.assertEqual(clone.circle_wind, 'south')
+        np.testing.assert_array_equal(clone.get_state(), state)
+
+        clone.next_turn()
+        clone.draw_tile(clone.current_player)
+        clone.discard_tile(clone.current_player, tile=clone.current_player.hidden_hand[-1])
+        np.testing.assert_array_equal(mahjong_game.get_state(), state)
+        self.assertEqual(len(players[1].hidden_hand), 13)
+        self.assertLess(len(clone.tiles), len(mahjong_game.tiles))  # more than one if a flower was drawn
+        np.testing.assert_array_equal(clone.get_state()[:868],
+                                      np.concatenate([clone.get_player_state(player) for player in clone.players]))
+
+        # a reset through setup_game starts the next game, as MahjongEnvironmentAdapter.reset does
+        for player in players:
+            player.soft_reset()
+        mahjong_game.game_over = True
+        mahjong_game.setup_game()
+        self.assertFalse(mahjong_game.game_over)
+
+    def test_apply_undo(self):
+        players = [YesBot(i + 1, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east')
+        before = mahjong_game.clone()
+        state = mahjong_game.get_state()
+
+        def piles(game):
+            return [(list(player.hidden_hand), list(map(list, player.revealed_sets)), list(player.flowers),
+                     list(player.discard_pile)) for player in game.players]
+
+        mahjong_game.apply((0, 0))  # discard
+        self.assertFalse(mahjong_game.is_discard)
+        mahjong_game.apply((1, MahjongActions.PASS))  # player 1 draws
+        self.assertIs(mahjong_game.current_player, players[1])
+        self.assertEqual(len(players[1].hidden_hand), 14)
+        with self.assertRaises(ValueError):
+            mahjong_game.apply((1, MahjongActions.PONG))  # not a discard
+
+        mahjong_game.undo()
+        mahjong_game.undo()
+        np.testing.assert_array_equal(mahjong_game.get_state(), state)
+        self.assertEqual(piles(mahjong_game), piles(before))
+        self.assertEqual(mahjong_game.tiles, before.tiles)
+        with self.assertRaises(IndexError):
+            mahjong_game.undo()
+
+    def test_apply_until_wall_is_empty(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False, rng=MahjongGame.game_rng(0, 0))
+        before = mahjong_game.clone()
+        state = mahjong_game.get_state()
+        rng = random.Random(0)
+
+        plies = 0
+        while not mahjong_game.game_over:
+            mask = mahjong_game.legal_action_mask()
+            seat = mahjong_game.current_player_no
+            if mahjong_game.is_discard:
+                mahjong_game.apply((seat, rng.choice(np.flatnonzero(mask[seat]).tolist())))
+            else:
+                mahjong_game.apply((seat, MahjongActions.PASS))
+            plies += 1
+        self.assertEqual(mahjong_game.tiles_remaining, 0)
+        self.assertIsNone(mahjong_game.winner)
+        self.assertEqual(mahjong_game.round_scores(), [0, 0, 0, 0])
+
+        for _ in range(plies):
+            mahjong_game.undo()
+        self.assertFalse(mahjong_game.game_over)
+        np.testing.assert_array_equal(mahjong_game.get_state(), state)
+        self.assertEqual([list(player.hidden_hand) for player in players],
+                         [list(player.hidden_hand) for player in before.players])
+        self.assertEqual(mahjong_game.tiles, before.tiles)
+
+    def test_apply_undo_claims(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False, rng=MahjongGame.game_rng(0, 3))
+        before = mahjong_game.clone()
+        state = mahjong_game.get_state()
+        rng = random.Random(3)
+
+        def piles(game):
+            return [(list(player.hidden_hand), list(map(list, player.revealed_sets)), list(player.flowers),
+                     list(player.discard_pile), player.highest_fan) for player in game.players]
+
+        plies = claims = 0
+        while not mahjong_game.game_over:
+            seat = mahjong_game.current_player_no
+            if mahjong_game.is_discard:
+                mask = mahjong_game.legal_action_mask()
+                mahjong_game.apply((seat, rng.choice(np.flatnonzero(mask[seat]).tolist())))
+            else:
+                claimable = [transition for transition in mahjong_game.find_legal_transitions()
+                             if 15 <= transition[1] <= 19]
+                if claimable:
+                    claims += 1
+                mahjong_game.apply(rng.choice(claimable) if claimable else (seat, MahjongActions.PASS))
+            plies += 1
+        self.assertGreater(claims, 0)
+
+        for _ in range(plies):
+            mahjong_game.undo()
+        np.testing.assert_array_equal(mahjong_game.get_state(), state)
+        self.assertEqual(piles(mahjong_game), piles(before))
+        self.assertEqual(mahjong_game.tiles, before.tiles)
+
+        # a claim takes the first copy of the tile out of the discard pile, undo puts it back in place
+        east = MahjongTile(tiletype="honour", subtype="wind", numchar="east")
+        south = MahjongTile(tiletype="honour", subtype="wind", numchar="south")
+        players[0].discard_pile = [east, south]
+        for player in (players[0], players[1], players[1]):
+            player.add_tile(east)
+        mahjong_game.apply((0, players[0].hidden_hand.index(east)))
+        mahjong_game.apply((1, MahjongActions.PONG))
+        self.assertEqual(list(players[0].discard_pile), [south, east])
+        mahjong_game.undo()
+        mahjong_game.undo()
+        self.assertEqual(list(players[0].discard_pile), [east, south])
+
+    def test_wall(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False)
+        wall = mahjong_game.wall
+        dealt = sum(len(player.hidden_hand) + len(player.flowers) for player in players)
+        self.assertEqual(mahjong_game.tiles_remaining, 144 - dealt)
+        self.assertEqual(sorted(mahjong_game.tiles + [tile for player in players for tile in
+                                                      list(player.hidden_hand) + list(player.flowers)]),
+                         sorted(MahjongGame.initialize_tiles()))
+
+        front, back = wall.codes[wall.front], wall.codes[wall.back - 1]
+        self.assertEqual(wall.draw().code, front)
+        self.assertEqual(wall.draw_replacement().code, back)
+        self.assertEqual(len(wall), 142 - dealt)
+
+        codes = wall.codes
+        for player in players:
+            player.soft_reset()
+        mahjong_game.setup_game()  # a reset reshuffles the same array
+        self.assertIs(wall.codes, codes)
+        self.assertIs(mahjong_game.wall, wall)
+        self.assertEqual(sorted(wall.codes.tolist()), sorted(MahjongGame._full_wall_codes.tolist()))
+        self.assertEqual(len(mahjong_game.tiles), mahjong_game.tiles_remaining)
+        with self.assertRaises(IndexError):
+            for _ in range(145):
+                wall.draw()
+
+    def test_legal_action_mask(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False)
+        mask = mahjong_game.legal_action_mask()
+        self.assertEqual(mask.shape, (4, len(MahjongActions)))
+        self.assertEqual(np.flatnonzero(mask[0]).tolist(), list(range(len(players[0].hidden_hand))))
+        self.assertTrue(mask[1:, MahjongActions.PASS].all() and mask[1:].sum() == 3)
+
+        def circle(numchar):
+            return MahjongTile(tiletype='suit', subtype='circle', numchar=numchar)
+
+        players[1].hidden_hand = [circle(3), circle(4), circle(5), circle(5), circle(6), circle(7)]
+        players[2].hidden_hand = [circle(5), circle(5), circle(5), circle(8), circle(9)]
+        mahjong_game.latest_tile = circle(5)
+        mahjong_game.is_discard = False
+        mask = mahjong_game.legal_action_mask()
+        self.assertEqual(np.flatnonzero(mask[0]).tolist(), [MahjongActions.PASS])
+        self.assertEqual(np.flatnonzero(mask[1]).tolist(),
+                         [MahjongActions.PONG, MahjongActions.LOWER_SHEUNG, MahjongActions.MIDDLE_SHEUNG,
+                          MahjongActions.UPPER_SHEUNG, MahjongActions.PASS])
+        self.assertEqual(np.flatnonzero(mask[2]).tolist(),
+                         [MahjongActions.ADD_KONG, MahjongActions.PONG, MahjongActions.PASS])
+        for seat, player in enumerate(players):
+            self.assertEqual(np.flatnonzero(mask[seat]).tolist(),
+                             mahjong_game.get_legal_actions(False, player is players[0], player))
+        self.assertEqual(mahjong_game.find_legal_transitions(),
+                         [(1, MahjongActions.PONG), (1, MahjongActions.LOWER_SHEUNG),
+                          (1, MahjongActions.MIDDLE_SHEUNG), (1, MahjongActions.UPPER_SHEUNG),
+                          (2, MahjongActions.ADD_KONG), (2, MahjongActions.PONG)]
+                         + [(3, action) for action in np.flatnonzero(mask[3, :MahjongActions.PASS])])
+
+    def test_legal_action_mask_after_game_over(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False)
+        out = np.ones((4, len(MahjongActions)), dtype=bool)
+        mahjong_game.game_over = True
+        self.assertFalse(mahjong_game.legal_action_mask().any())
+        self.assertFalse(mahjong_game.legal_action_mask(out=out).any())
+        self.assertEqual(mahjong_game.find_legal_transitions(), [])
+
+        mahjong_game.game_over = False
+        mahjong_game.wall.front = mahjong_game.wall.back
+        self.assertFalse(mahjong_game.legal_action_mask().any())
+
+    def test_claimants(self):
+        players = [Player(i, i) for i in range(4)]
+        mahjong_game = MahjongGame(players, 'east', verbose=False)
+
+        def circle(numchar):
+            return MahjongTile(tiletype='suit', subtype='circle', numchar=numchar)
+
+        east = MahjongTile(tiletype='honour', subtype='wind', numchar='east')
+        players[0].hidden_hand = [circle(5), circle(5)]  # current player, never a claimant
+        players[1].hidden_hand = [circle(3), circle(4), east]
+        players[2].hidden_hand = [circle(5), circle(5), circle(9)]
+        players[3].hidden_hand = [circle(1), east, east]
+        self.assertEqual(mahjong_game.claimants(circle(5)), [players[1], players[2]])
+        self.assertEqual(mahjong_game.claimants(east), [players[3]])
+        self.assertEqual(mahjong_game.claimants(circle(8)), [])
+        self.assertEqual(mahjong_game.claimants(None), [])
+
+        players[3].hidden_hand.remove(east)  # the index follows the hands
+        players[3].add_tile(circle(7))
+        players[3].add_tile(circle(9))
+        self.assertEqual(mahjong_game.claimants(east), [])
+        self.assertEqual(mahjong_game.claimants(circle(8)), [players[3]])  # any seat for a sheung
+        mahjong_game.next_turn()
+        self.assertEqual(mahjong_game.claimants(circle(5)), [players[0], players[2]])
+
+    def test_game_log(self):
+        log = GameLog(MahjongGame.state_size)
+        self.assertEqual(log.states.shape, (0, MahjongGame.state_size))
+        game = MahjongGame([Player(i, i) for i in range(4)], 'east', verbose=False)
+        for step in range(100):  # past the initial capacity
+            actor = step % 4
+            log.append(game.get_state(), actor, MahjongActions.PASS, is_discard=step % 2 == 0,
+                       legal=game.legal_action_mask()[actor])
+        self.assertEqual(len(log), 100)
+        state = game.get_state()
+        exact = state * 4 == np.rint(state * 4)  # counts and one-hots, not the normalised tiles remaining or fans
+        np.testing.assert_array_equal(log.states[-1][exact], state[exact])
+        np.testing.assert_allclose(log.states[-1], state, rtol=2 ** -7)
+        self.assertEqual(log.states.dtype, np.float32)
+        np.testing.assert_array_equal(log.gather_states(np.array([99, 3])), log.states[[99, 3]])
+        np.testing.assert_array_equal(log.legal[-1], game.legal_action_mask()[3])
+        np.testing.assert_array_equal(log.is_discard[:4], [True, False, True, False])
+
+        log.finish_episode([1.0, -2.0, 0.5, 0.5], start=96)
+        np.testing.assert_array_equal(log.rewards[:96], 0.0)
+        np.testing.assert_array_equal(log.rewards[96:], [1.0, -2.0, 0.5, 0.5])
+        log.set_rewards(1, 6.0)
+        np.testing.assert_array_equal(log.rewards[log.actors == 1], 6.0)
+
+        copied = log.copy()
+        log.truncate(10)
+        self.assertEqual(len(copied), 100)
+        marker = np.full(MahjongGame.state_size, 0.75, dtype=np.float32)
+        log.append(marker, 2, 5, is_discard=True)
+        self.assertFalse(log.legal[-1].any())
+        np.testing.assert_array_equal(log.states[10], marker)
+        np.testing.assert_array_equal(log.states[9][exact], state[exact])
+        np.testing.assert_array_equal(copied.actors[8:12], [0, 1, 2, 3])
+
+        copied.keep_latest(4)
+        np.testing.assert_array_equal(copied.actors, [0, 1, 2, 3])
+        np.testing.assert_array_equal(copied.rewards, [1.0, 6.0, 0.5, 0.5])
+
+    def test_vec_env(self):
+        env = VecMahjongEnv(2, seed=0)
+        observations, masks = env.reset()
+        self.assertEqual(observations.shape, (2, MahjongGame.state_size))
+        np.testing.assert_array_equal(masks[1], env.envs[1].game.legal_action_mask())
+
+        game = env.envs[0].game
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        red = MahjongTile(tiletype="honour", subtype="dragon", numchar="red")
+        game.players[1].hidden_hand = sorted([circles[0]] * 3 + circles[1:8] + [circles[8]] * 3)  # nine gates
+        game.players[0].hidden_hand = sorted([circles[4]] + [red] * 13)
+        actions = np.full((2, 4), MahjongActions.PASS)
+        actions[0, 0] = game.players[0].hidden_hand.index(circles[4])
+        actions[1, 0] = 0
+        observations, masks, rewards, dones = env.step(actions)
+        self.assertFalse(env.is_discard)
+        self.assertTrue(masks[0, 1, MahjongActions.WIN])
+        self.assertFalse(dones.any())
+
+        actions = np.full((2, 4), MahjongActions.PASS)
+        actions[0, 1] = MahjongActions.WIN
+        observations, masks, rewards, dones = env.step(actions)
+        np.testing.assert_array_equal(dones, [True, False])
+        self.assertGreater(rewards[0, 1], 0)
+        self.assertEqual(rewards[0].sum(), 0)
+        self.assertEqual(game.players[1].score, rewards[0, 1])
+        self.assertTrue(env.is_discard)
+        self.assertFalse(game.game_over)  # already reset into the next game
+        np.testing.assert_array_equal(observations[0], game.get_state())
+        np.testing.assert_array_equal(masks[0], game.legal_action_mask())
+
+    def test_subproc_vec_env(self):
+        local = VecMahjongEnv(3, seed=5)
+        with SubprocVecMahjongEnv(3, seed=5, workers=2) as env:
+            observations, masks = env.reset()
+            local_observations, local_masks = local.reset()
+            for _ in range(20):
+                np.testing.assert_array_equal(observations, local_observations)
+                np.testing.assert_array_equal(masks, local_masks)
+                actions = np.where(masks, np.arange(len(MahjongActions)), -1).argmax(axis=2)  # highest legal action
+                observations, masks, rewards, dones = env.step(actions)
+                local_observations, local_masks, local_rewards, local_dones = local.step(actions)
+                np.testing.assert_array_equal(rewards, local_rewards)
+                np.testing.assert_array_equal(dones, local_dones)
+
+            with self.assertRaises(RuntimeError):
+                env.step(np.full((3, 4), MahjongActions.PASS))  # nobody discards
+
+    def test_simulate(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = simulate(4, [BasicBot, YesBot, RandomBot, YesBot], seed=1)
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(result.scores.shape, (4, 4))
+        np.testing.assert_array_equal(result.scores.sum(axis=1), 0)
+        np.testing.assert_array_equal(result.fan[result.winner < 0], 0)
+        self.assertTrue((result.turns > 0).all())
+
+        repeated = simulate(4, [BasicBot, YesBot, RandomBot, YesBot], seed=1)
+        np.testing.assert_array_equal(repeated.winner, result.winner)
+        np.testing.assert_array_equal(repeated.turns, result.turns)
+
+    def test_replay_game_in_isolation(self):
+        bots = [RandomBot, YesBot, RandomBot, YesBot]
+        batch = simulate(6, bots, seed=11)
+        shard = simulate(3, bots, seed=11, first_game=3)
+        single = simulate(1, bots, seed=11, first_game=4)
+        for field in ('winner', 'fan', 'turns', 'scores'):
+            np.testing.assert_array_equal(getattr(shard, field), getattr(batch, field)[3:])
+            np.testing.assert_array_equal(getattr(single, field), getattr(batch, field)[4:5])
+
+        game = MahjongGame([RandomBot(i, i) for i in range(4)], 'east', rng=MahjongGame.game_rng(11, 4))
+        self.assertTrue(all(player.rng is game.rng for player in game.players))
+        replayed = MahjongGame([RandomBot(i, i) for i in range(4)], 'east', rng=MahjongGame.game_rng(11, 4))
+        self.assertEqual([list(player.hidden_hand) for player in game.players],
+                         [list(player.hidden_hand) for player in replayed.players])
+        self.assertEqual(game.tiles, replayed.tiles)
+
+    def test_run_concurrent_games(self):
+        bots = (BasicBot, YesBot, BasicBot, YesBot)
+        result = MahjongTable.run_concurrent_games(2, bots, seed=5, processes=1, max_games=3)
+        self.assertEqual(result.bots, ('BasicBot', 'YesBot', 'BasicBot', 'YesBot'))
+        self.assertEqual(result.scores.shape, (2, 4))
+        np.testing.assert_array_equal(result.scores.sum(axis=1), 0)
+        np.testing.assert_array_equal(result.wins.sum(axis=1) + result.draws, result.games)
+        self.assertEqual(sum(result.scores_by_bot().values()), 0)
+
+        repeated = MahjongTable.run_concurrent_games(2, bots, seed=5, processes=2, max_games=3)
+        np.testing.assert_array_equal(repeated.scores, result.scores)
+
     def test_thirteen_orphans(self):
         """
         Edge case of thirteen orphans to be checked with winning hand
@@ -223,3 +703,182 @@ class TestMahjongLogic(unittest.TestCase):
         # self.assertIs(len(player1.hidden_hand), 14)
         # self.assertIs(pair_exists, True)
         # self.assertIs(all_orphans, True)
+
+    def test_tiles_are_interned(self):
+        tile1 = MahjongTile(tiletype="suit", subtype="bamboo", numchar=2)
+        tile2 = MahjongTile(tiletype="SUIT", subtype="bamboo", numchar=2)
+        self.assertIs(tile1, tile2)
+        self.assertIs(MahjongTile.index_to_tile(tile1.to_index()), tile1)
+        self.assertIs(copy.deepcopy(tile1), tile1)
+        self.assertIs(pickle.loads(pickle.dumps(tile1)), tile1)
+        self.assertEqual(len(set(MahjongGame.initialize_tiles())), 42)
+        with self.assertRaises(ValueError):
+            MahjongTile(tiletype="honour", subtype="circle", numchar=1)
+        with self.assertRaises(AttributeError):
+            tile1.numchar = 3
+
+    def test_tile_ordering_includes_flowers(self):
+        plum = MahjongTile(tiletype="flower", subtype="flower", numchar="plum")
+        winter = MahjongTile(tiletype="flower", subtype="season", numchar="winter")
+        circle = MahjongTile(tiletype="suit", subtype="circle", numchar=9)
+        bamboo = MahjongTile(tiletype="suit", subtype="bamboo", numchar=1)
+        red = MahjongTile(tiletype="honour", subtype="dragon", numchar="red")
+        self.assertEqual(sorted([winter, red, plum, bamboo, circle]), [circle, bamboo, red, plum, winter])
+        self.assertTrue(circle <= circle and circle >= circle and winter > plum)
+
+    def test_hand_counts_follow_list_mutations(self):
+        player1 = YesBot(1, 1)
+        tile1 = MahjongTile(tiletype="suit", subtype="bamboo", numchar=2)
+        tile2 = MahjongTile(tiletype="honour", subtype="dragon", numchar="white")
+        player1.hidden_hand = [tile1, tile1, tile2]
+        version = player1.hidden_hand.version
+        player1.add_tile(tile1)
+        self.assertNotEqual(player1.hidden_hand.version, version)
+        player1.add_tile(MahjongTile(tiletype="suit", subtype="circle", numchar=9))
+        self.assertEqual(list(player1.hidden_hand), sorted(player1.hidden_hand))
+        player1.hidden_hand.pop(0)
+        self.assertIs(player1.decide_add_kong(tile1), True)
+        player1.hidden_hand.remove(tile1)
+        player1.hidden_hand.pop()
+        self.assertEqual(player1.hidden_counts[tile1.to_index()], 2)
+        self.assertEqual(player1.hidden_counts.sum(), len(player1.hidden_hand))
+        player1.revealed_sets.append([tile2, tile2, tile2])
+        self.assertEqual(player1.encode_revealed_hand()[tile2.to_index()], 0.75)
+        self.assertEqual(player1.encode_hidden_hand()[tile1.to_index()], 0.5)
+
+    def test_winning_hand_with_several_pairs(self):
+        player1 = YesBot(1, 1)
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 5)]
+        red = MahjongTile(tiletype="honour", subtype="dragon", numchar="red")
+        player1.hidden_hand = sorted(circles[:3] * 3 + [circles[3]] * 2 + [red] * 3)
+
+        self.assertEqual(winning_pair_indices(player1.hidden_counts), [0, 3])
+        self.assertIs(player1.check_winning_hand('east'), True)
+        player1.hidden_hand.remove(red)
+        self.assertEqual(winning_pair_indices(player1.hidden_counts), [])
+        self.assertIs(player1.check_winning_hand('east'), False)
+
+    def test_hand_decompositions_are_exhaustive(self):
+        counts = np.zeros(34, dtype=np.uint8)
+        counts[0:4] = [3, 3, 3, 2]  # circles 1 to 4
+        counts[31] = 3  # red dragons
+        decompositions = hand_decompositions(counts)
+
+        self.assertEqual(len(decompositions), 3)
+        self.assertIn(((3, 3), (0, 0, 0), (1, 1, 1), (2, 2, 2), (31, 31, 31)), decompositions)
+        self.assertIn(((3, 3), (0, 1, 2), (0, 1, 2), (0, 1, 2), (31, 31, 31)), decompositions)
+        self.assertIs(hand_decompositions(counts), decompositions)
+        counts[31] = 2
+        self.assertEqual(hand_decompositions(counts), ())
+
+    def test_shanten(self):
+        player1 = YesBot(1, 1)
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        bamboo = MahjongTile(tiletype="suit", subtype="bamboo", numchar=1)
+        player1.hidden_hand = sorted(circles + [bamboo] * 3 + [circles[0]])
+        self.assertEqual(player1.shanten(), 0)  # waiting on a pair
+        player1.add_tile(circles[0])
+        self.assertEqual(player1.shanten(), -1)
+
+        orphans = [MahjongTile.index_to_tile(index) for index in Player.orphan_indices]
+        player1.hidden_hand = sorted(orphans)
+        self.assertEqual(player1.shanten(), 0)
+        player1.hidden_hand.remove(orphans[0])
+        player1.revealed_sets.append([circles[4]] * 3)
+        self.assertEqual(shanten(player1.hidden_counts, 1), 6)  # three melds and a pair from nothing
+        self.assertEqual(player1.shanten(), 6)
+
+    def test_winning_tiles(self):
+        player1 = YesBot(1, 1)
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        east = MahjongTile(tiletype="honour", subtype="wind", numchar="east")
+        player1.hidden_hand = sorted([circles[0]] * 3 + circles[1:8] + [circles[8]] * 3)  # nine gates
+
+        self.assertEqual(set(player1.winning_tiles("east")), set(circles))
+        self.assertTrue(player1.can_win_on(circles[4], "east"))
+        self.assertFalse(player1.can_win_on(east, "east"))
+        self.assertEqual(len(player1.hidden_hand), 13)
+
+        self.assertTrue(player1.decide_win(circles[4], "east", 0))
+        self.assertEqual(len(player1.hidden_hand), 14)
+        self.assertEqual(player1.winning_tiles("east"), {})  # cache dropped by add_tile
+
+        player1.hidden_hand.remove(circles[4])
+        player1.hand_changed()
+        self.assertEqual(set(player1.winning_tiles("east")), set(circles))
+
+    def test_win_check(self):
+        player1 = YesBot(1, 1)
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        east = MahjongTile(tiletype="honour", subtype="wind", numchar="east")
+        player1.hidden_hand = sorted([circles[0]] * 3 + circles[1:8] + [circles[8]] * 3)  # nine gates
+        counts = player1.hidden_counts.copy()
+        version = player1.hidden_hand.version
+
+        check = win_with_tile(player1.hidden_counts, circles[4], player1.revealed_sets, player1.flowers, "east", 1)
+        self.assertEqual(check, WinCheck(True, player1.winning_tiles("east")[circles[4]]))
+        self.assertEqual(win_with_tile(player1.hidden_counts, east, [], [], "east", 1), WinCheck(False, 0))
+        self.assertIs(player1.win_check(circles[4], "east"), player1.win_check(circles[4], "east"))
+        self.assertFalse(player1.win_check(east, "east").wins)
+        np.testing.assert_array_equal(player1.hidden_counts, counts)
+        self.assertEqual(player1.hidden_hand.version, version)
+
+        player1.hidden_hand.remove(circles[4])  # no hand_changed() needed, the cache follows the version
+        self.assertFalse(player1.can_win_on(circles[4], "east"))
+
+    def test_analyse_batch(self):
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        orphans = [MahjongTile.index_to_tile(index) for index in Player.orphan_indices]
+        player1 = YesBot(1, 1)
+        hands = [
+            sorted([circles[0]] * 3 + circles[1:8] + [circles[8]] * 3),  # nine gates, waits on every circle
+            sorted([circles[0]] * 4 + circles[1:8] + [circles[8]] * 3),
+            sorted(orphans),
+            sorted(orphans + [orphans[5]]),
+            sorted(circles + circles[:5]),
+        ]
+        counts = np.zeros((len(hands), 34), dtype=np.uint8)
+        for row, hand in enumerate(hands):
+            player1.hidden_hand = hand
+            counts[row] = player1.hidden_counts
+
+        analysis = analyse_batch(counts)
+        for row, hand in enumerate(hands):
+            player1.hidden_hand = hand
+            self.assertEqual(analysis.winning[row], player1.check_winning_hand("east"))
+            self.assertEqual(list(np.flatnonzero(analysis.waits[row])), waiting_indices(counts[row]))
+        self.assertEqual(analysis.tenpai().tolist(), [True, False, True, False, False])
+        self.assertEqual(analysis.pair.tolist(), [-1, circles[8].to_index(), -1, orphans[5].to_index(), -1])
+
+    def test_ukeire(self):
+        player1 = BasicBot(1, 1)
+        circles = [MahjongTile(tiletype="suit", subtype="circle", numchar=i) for i in range(1, 10)]
+        bamboo = MahjongTile(tiletype="suit", subtype="bamboo", numchar=1)
+        east = MahjongTile(tiletype="honour", subtype="wind", numchar="east")
+        player1.hidden_hand = sorted(circles + [bamboo] * 3 + [circles[0], east])
+
+        visible = np.zeros(34, dtype=np.uint8)
+        visible[circles[0].to_index()] = 1
+        analysis = ukeire(player1.hidden_counts, visible)
+        held = np.flatnonzero(player1.hidden_counts)
+        self.assertTrue((analysis.shanten[held] != NOT_IN_HAND).all())
+        self.assertEqual(analysis.live[circles[0].to_index()], 1)
+        self.assertEqual(analysis.live[bamboo.to_index()], 1)
+
+        for discard in held:
+            counts = player1.hidden_counts.copy()
+            counts[discard] -= 1
+            self.assertEqual(analysis.shanten[discard], shanten(counts))
+            for draw in range(34):
+                if counts[draw] == 4:
+                    continue
+                counts[draw] += 1
+                self.assertEqual(analysis.effective[discard, draw], shanten(counts) < analysis.shanten[discard])
+                counts[draw] -= 1
+
+        east_index = east.to_index()
+        self.assertEqual(analysis.shanten[east_index], 0)
+        self.assertEqual(analysis.acceptance()[east_index], analysis.live[analysis.effective[east_index]].sum())
+        self.assertIs(player1.discard_tile(visible_counts=visible), east)
+        with self.assertRaises(ValueError):
+            player1.discard_tile()  # only its own piles would leave the other players' tiles live
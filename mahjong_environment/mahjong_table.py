@@ -1,10 +1,52 @@
 from __future__ import annotations
 
-from typing import Dict, List
+import multiprocessing
+import random
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
 
 from mahjong_environment.ai_bot import BasicBot
 from mahjong_environment.mahjong_game import MahjongGame
-from player import Player
+from mahjong_environment.player import Player
+
+
+class TournamentResult(NamedTuple):
+    """
+    One row per table, one column per seat, i.e. the player order each player started the table with
+    """
+    bots: Tuple[str, ...]  # class name of the bot in each seat
+    scores: np.ndarray  # int64[T, 4], final score of each seat
+    wins: np.ndarray  # int32[T, 4], games won by each seat
+    games: np.ndarray  # int32[T], games played at each table, including draws
+    draws: np.ndarray  # int32[T]
+
+    def scores_by_bot(self) -> Dict[str, int]:
+        """
+        Total score over every table of each bot class, summed over the seats it played in
+        """
+        totals = {}
+        for seat, bot in enumerate(self.bots):
+            totals[bot] = totals.get(bot, 0) + int(self.scores[:, seat].sum())
+        return totals
+
+    def wins_by_bot(self) -> Dict[str, int]:
+        totals = {}
+        for seat, bot in enumerate(self.bots):
+            totals[bot] = totals.get(bot, 0) + int(self.wins[:, seat].sum())
+        return totals
+
+
+def _play_table(job: Tuple[Sequence[Callable[[int, int], Player]], int, Optional[int]]) -> Tuple[np.ndarray, ...]:
+    """
+    Worker for MahjongTable.run_concurrent_games, plays one full table and only
+    sends back its summary
+    """
+    bot_factories, seed, max_games = job
+    table = MahjongTable(bot_factories, verbose=False, seed=seed)
+    table.start_table(max_games)
+    return (np.array([player.score for player in table.players], dtype=np.int64), table.wins,
+            np.int32(table.games_played), np.int32(table.draws))
 
 
 class MahjongTable:
@@ -14,26 +56,45 @@ class MahjongTable:
     circle_wind: Dict[int, str] = {1: "east", 2: "south", 3: "west", 4: "north"}
     starting_player: Player
     players: List[Player]
+    verbose: bool
+    seed: int  # master seed, game i of the table is played with MahjongGame.game_rng(seed, i)
+    games_played: int = 0
+    draws: int = 0
+    wins: np.ndarray  # int32[4], games won by each player, indexed by player_id
 
-    def __init__(self):
-        self.players = [BasicBot(i, i) for i in range(4)]
+    def __init__(self, bot_factories: Sequence[Callable[[int, int], Player]] = (BasicBot,) * 4,
+                 verbose: bool = True, seed: Optional[int] = None):
+        self.players = [factory(i, i) for i, factory in enumerate(bot_factories)]
         self.starting_player = self.players[0]
+        self.verbose = verbose
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.wins = np.zeros(4, dtype=np.int32)
 
-    def start_table(self):
+    def start_table(self, max_games: Optional[int] = None):
         """
-        Start a table
+        Start a table: four circle winds, each with every player as the dealer once.
+        The dealer stays on after a draw or a win, so max_games bounds tables of
+        bots which rarely win.
         """
         round_no = 1
         player_start = 0
         for i in range(4):
             self.players[i].player_order = i
-        while round_no < 5:
-            print("ROUND " + str(round_no))
-            game = MahjongGame(self.players, self.circle_wind[round_no])
+        while round_no < 5 and (max_games is None or self.games_played < max_games):
+            if self.verbose:
+                print("ROUND " + str(round_no))
+            game = MahjongGame(self.players, self.circle_wind[round_no], verbose=self.verbose,
+                               rng=MahjongGame.game_rng(self.seed, self.games_played))
+            dealer = game.players[0]
             winner = game.play_round()
+            self.games_played += 1
+            if winner is None:
+                self.draws += 1
+            else:
+                self.wins[winner.player_id] += 1
             for player in self.players:
                 player.soft_reset()
-            if winner is not self.starting_player and winner is not None:
+            if winner is not dealer and winner is not None:
                 player_start += 1
                 for player in self.players:
                     player.player_order = (player.player_order + 1) % 4
@@ -41,20 +102,29 @@ class MahjongTable:
                     player_start = 0
                     round_no += 1
 
-    def run_concurrent_games(self):
+    @staticmethod
+    def run_concurrent_games(n_tables: int, bot_factories: Sequence[Callable[[int, int], Player]] = (BasicBot,) * 4,
+                             seed: int = 0, processes: Optional[int] = None,
+                             max_games: Optional[int] = None) -> TournamentResult:
         """
-        Run MahjongGame instances concurrently using multiprocessing
-        :return:
+        Play n_tables full tables (see start_table) spread over a process pool.
+        Every table gets its own seed derived from seed, so the results do not
+        depend on the number of processes.
+        :param bot_factories: one picklable callable per seat taking (player_id, player_order), e.g. a bot class
+        :param processes: number of worker processes, all cores by default
+        :param max_games: cap on the games played at each table
         """
-        # ROUND
-        game1 = MahjongGame(self.players, self.circle_wind[0])
-        game2 = MahjongGame(self.players, self.circle_wind[1])
-        game3 = MahjongGame(self.players, self.circle_wind[2])
-        game4 = MahjongGame(self.players, self.circle_wind[3])
-        pass
-
+        seeds = np.random.SeedSequence(seed).generate_state(n_tables)
+        jobs = [(tuple(bot_factories), int(table_seed), max_games) for table_seed in seeds]
+        with multiprocessing.get_context().Pool(processes) as pool:
+            summaries = pool.map(_play_table, jobs, chunksize=1)  # a table is long enough to be its own task
 
-# TODO: Support multithreading
+        scores, wins, games, draws = zip(*summaries) if summaries else ((), (), (), ())
+        bots = tuple(type(factory(seat, seat)).__name__ for seat, factory in enumerate(bot_factories))
+        return TournamentResult(bots,
+                                np.array(scores, dtype=np.int64).reshape(n_tables, 4),
+                                np.array(wins, dtype=np.int32).reshape(n_tables, 4),
+                                np.array(games, dtype=np.int32), np.array(draws, dtype=np.int32))
 
 
 """
@@ -5,27 +5,47 @@ player.py - represents a player in a MahjongGame
 from __future__ import annotations
 
 import bisect
-import copy
-from typing import List, Optional, Set, Tuple
+import operator
+import random
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
 import numpy as np
 
-from mahjong_environment.tile import MahjongTile
+from mahjong_environment.hand import CountedTileList, MeldList, next_version
+from mahjong_environment.hand_analysis import (ORPHAN_INDICES, is_thirteen_orphans, meld_claim_lanes, shanten,
+                                                tile_lanes, waiting_indices)
+from mahjong_environment.scoring import NO_WIN, WinCheck, completed_fan, hand_fan, win_with_tile
+from mahjong_environment.tile import MahjongTile, NUM_TILE_TYPES
+
+_SORT_KEY = operator.attrgetter('sort_key')
 
 
 class Player:
     """
     Class which is compatible with MahjongGame in mahjong_game.py
+
+    The hidden hand, revealed sets, flowers and discard pile are count-vector
+    backed lists (see hand.py), so assigning a plain list to any of them wraps it.
+
+    Whether a tile wins is cached by win_check(), keyed by the
+    identity and version of the hidden hand, revealed sets and flowers, so any
+    mutation through those containers invalidates the cache. hand_changed() is only
+    needed after a revealed set is modified in place.
     """
     player_id: int
-    hidden_hand: List[MahjongTile]  # assume sorted
-    revealed_sets: List[List[MahjongTile]]
-    flowers: List[MahjongTile]
-    discard_pile: List[MahjongTile]
+    _hidden_hand: CountedTileList  # assume sorted
+    _revealed_sets: MeldList
+    _flowers: CountedTileList
+    _discard_pile: CountedTileList
     score: int = 0
     player_order: int
     highest_fan: int = 0
+    verbose: bool = True  # print decisions, see MahjongGame.verbose
+    rng: random.Random = random.Random()  # for random decisions, replaced by the generator of the player's game
     _orphans: Set[MahjongTile] = set()
+    orphan_indices: Tuple[int, ...] = ORPHAN_INDICES
+    _waits: Optional[Tuple[int, int, FrozenSet[int]]] = None  # id and version of the hidden hand, its waits
+    _win_checks: Optional[Tuple[tuple, Dict[Optional[MahjongTile], WinCheck]]] = None  # hand key, checks so far
 
     def __init__(self, player_id: int, player_order: int):
         self.player_id = player_id
@@ -37,6 +57,85 @@ class Player:
         self.player_order = player_order
         self._set_orphans()
 
+    @property
+    def hidden_hand(self) -> CountedTileList:
+        return self._hidden_hand
+
+    @hidden_hand.setter
+    def hidden_hand(self, tiles: List[MahjongTile]) -> None:
+        self._hidden_hand = tiles if isinstance(tiles, CountedTileList) else CountedTileList(tiles)
+        self.hand_changed()
+
+    @property
+    def revealed_sets(self) -> MeldList:
+        return self._revealed_sets
+
+    @revealed_sets.setter
+    def revealed_sets(self, melds: List[List[MahjongTile]]) -> None:
+        self._revealed_sets = melds if isinstance(melds, MeldList) else MeldList(melds)
+        self.hand_changed()
+
+    @property
+    def flowers(self) -> CountedTileList:
+        return self._flowers
+
+    @flowers.setter
+    def flowers(self, tiles: List[MahjongTile]) -> None:
+        self._flowers = tiles if isinstance(tiles, CountedTileList) else CountedTileList(tiles)
+        self.hand_changed()
+
+    @property
+    def discard_pile(self) -> CountedTileList:
+        return self._discard_pile
+
+    @discard_pile.setter
+    def discard_pile(self, tiles: List[MahjongTile]) -> None:
+        self._discard_pile = tiles if isinstance(tiles, CountedTileList) else CountedTileList(tiles)
+
+    @property
+    def hidden_counts(self) -> np.ndarray:
+        """
+        uint8[34] count of each tile in the hidden hand, shares memory with hidden_hand
+        """
+        return self._hidden_hand.counts
+
+    @property
+    def revealed_counts(self) -> np.ndarray:
+        """
+        uint8[34] count of each tile across all revealed sets
+        """
+        return self._revealed_sets.counts
+
+    @property
+    def discard_counts(self) -> np.ndarray:
+        """
+        uint8[34] count of each tile in the discard pile
+        """
+        return self._discard_pile.counts
+
+    def encoding_key(self) -> Tuple[int, ...]:
+        """
+        Return a key which changes whenever the output of any encode_* method may
+        have changed: the version of each hand container and the seat. No two
+        containers share a version (see hand.py), so the key also changes when a
+        container is replaced.
+        """
+        return (self._hidden_hand.version, self._revealed_sets.version, self._discard_pile.version,
+                self._flowers.version, self.player_order)
+
+    def clone(self) -> Player:
+        """
+        Return a copy with its own hand, sets, flowers and discard pile. Every other
+        attribute is shared, including the tiles and e.g. a bot's decision model.
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone._hidden_hand = self._hidden_hand.__copy__()
+        clone._revealed_sets = self._revealed_sets.__copy__()  # melds are never mutated once revealed
+        clone._flowers = self._flowers.__copy__()
+        clone._discard_pile = self._discard_pile.__copy__()
+        return clone
+
     def soft_reset(self) -> None:
         """
         Reset all non-global attributes
@@ -79,298 +178,138 @@ class Player:
             self.highest_fan = 13 + self.count_flower_fan()
             return True
 
-        possible_hands = []
-        i = 0
-        while i < len(self.hidden_hand) - 1:
-            tile = self.hidden_hand[i]
-            potential_hand = []
-            if self.hidden_hand[i + 1] == tile:  # check all possible combinations of 'eyes' first for efficiency
-                remaining_hand = self.hidden_hand.copy()
-
-                potential_hand.append([remaining_hand.pop(i), remaining_hand.pop(i)])
-
-                if self.can_fit_into_set(remaining_hand, potential_hand):
-                    revealed_set = self.revealed_sets.copy()
-                    potential_hand += revealed_set
-                    possible_hands.append(potential_hand)
-
-            i += 1
-
-        sorted_hands = sorted(possible_hands,
-                              key=lambda hand: Player.score_hand(hand, self.flowers, circle_wind, self.player_order),
-                              reverse=True)
-        if sorted_hands:
-            highest_fan = Player.score_hand(sorted_hands[0], self.flowers, circle_wind, self.player_order)
-            print(f'Current fan is {highest_fan}')
+        highest_fan = self._highest_fan(self.hidden_hand.counts, circle_wind)
+        if highest_fan is not None:
+            if self.verbose:
+                print(f'Current fan is {highest_fan}')
 
             if highest_fan >= 3:
                 self.highest_fan = highest_fan
                 return True
         return False
 
-    def check_thirteen_orphans(self):
+    def _highest_fan(self, counts: np.ndarray, circle_wind: str) -> Optional[int]:
         """
-        Edge case of thirteen orphans to be checked with winning hand
+        Return the highest fan of the hidden hand given by counts together with the
+        revealed sets, or None if it is not complete
         """
-        pair_exists = any(self.hidden_hand[i] == self.hidden_hand[i + 1] for i in range(len(self.hidden_hand) - 1))
-        all_orphans = self.orphans <= {tile for tile in self.hidden_hand}
-        return len(self.hidden_hand) == 14 and pair_exists and all_orphans
+        if is_thirteen_orphans(counts):
+            return 13 + self.count_flower_fan()
+        return completed_fan(counts, self.revealed_sets, self.flowers, circle_wind, self.player_order)
 
-    def _set_orphans(self):
+    def _hand_key(self, circle_wind: str) -> tuple:
         """
-        Set thirteen orphans attribute
+        Return a key which changes whenever the tiles the player can win on may
+        have changed, see encoding_key
         """
-        tile1 = MahjongTile(tiletype="suit", subtype="circle", numchar=1)
-        tile2 = MahjongTile(tiletype="suit", subtype="circle", numchar=9)
-        tile3 = MahjongTile(tiletype="suit", subtype="bamboo", numchar=1)
-        tile4 = MahjongTile(tiletype="suit", subtype="bamboo", numchar=9)
-        tile5 = MahjongTile(tiletype="suit", subtype="number", numchar=1)
-        tile6 = MahjongTile(tiletype="suit", subtype="number", numchar=9)
-        tile7 = MahjongTile(tiletype="honour", subtype="dragon", numchar='red')
-        tile8 = MahjongTile(tiletype="honour", subtype="dragon", numchar='white')
-        tile9 = MahjongTile(tiletype="honour", subtype="dragon", numchar='green')
-        tile10 = MahjongTile(tiletype="honour", subtype="wind", numchar='north')
-        tile11 = MahjongTile(tiletype="honour", subtype="wind", numchar='east')
-        tile12 = MahjongTile(tiletype="honour", subtype="wind", numchar='south')
-        tile13 = MahjongTile(tiletype="honour", subtype="wind", numchar='west')
-        tile14 = MahjongTile(tiletype="honour", subtype="wind", numchar='west')
-        self.orphans = {tile1, tile2, tile3, tile4, tile5, tile6, tile7, tile8, tile9, tile10,
-                        tile11, tile12, tile13}
-
-    def can_fit_into_set(self, remaining_hand: List[MahjongTile], potential_hand: List[List[MahjongTile]]):
-        """
-        Recursive function that checks if the remaining hand can fit in
-        """
-        if len(remaining_hand) == 0:
-            return True
-        else:
-            tile = remaining_hand[0]  # always checks pong first. this approach does appear to work logically speaking
-            # because of the sorted hand clears edge cases but
-            #  not rigorously proven so possibly bugs CAUTION
-            if len(remaining_hand) >= 3 and remaining_hand[1] == tile and remaining_hand[2] == tile:
-                for j in range(0, 3):
-                    remaining_hand.pop(0)
-                potential_hand.append([tile, tile, tile])
-                return self.can_fit_into_set(remaining_hand, potential_hand)
-            if self.check_sheung(remaining_hand, tile, potential_hand):
-                return self.can_fit_into_set(remaining_hand, potential_hand)
+        hidden, revealed, flowers = self._hidden_hand, self._revealed_sets, self._flowers
+        return (id(hidden), hidden.version, id(revealed), revealed.version, id(flowers), flowers.version,
+                circle_wind, self.player_order)
 
-            return False
+    def hand_changed(self) -> None:
+        """
+        Drop the cached win checks, must be called after a revealed set is modified in place
+        """
+        self._waits = None
+        self._win_checks = None
 
-    @staticmethod
-    def check_sheung(remaining_hand: List[MahjongTile], selected_tile: MahjongTile,
-                     potential_hand: List[List[MahjongTile]]):
+    def waits(self) -> FrozenSet[int]:
         """
-        - only check ascending sheung for consistency
-        - assumes the tile exists in the remaining hand
-        - mutates if True
+        Return the indices of the tiles which would complete the hidden hand, see
+        hand_analysis.waiting_indices, cached until the hidden hand changes
         """
+        hidden = self._hidden_hand
+        waits = self._waits
+        if waits is None or waits[0] != id(hidden) or waits[1] != hidden.version:
+            waits = self._waits = (id(hidden), hidden.version, frozenset(waiting_indices(hidden.counts)))
+        return waits[2]
 
-        if not (selected_tile.tiletype == "suit" and selected_tile.numchar <= 7):
-            return False
-        index = bisect.bisect_left(remaining_hand, selected_tile)
+    def claimable_tiles(self) -> int:
+        """
+        Return the tile indices, packed as in hand_analysis.tile_lanes, the player
+        could claim a discard of at all: a tile the hand waits on, one they hold
+        two or more of, or one which makes a sheung with the tiles they hold,
+        whichever seat it comes from. Only the hidden hand is read.
+        """
+        return meld_claim_lanes(self._hidden_hand.counts) | tile_lanes(self.waits())
 
-        indices = [index, -1, -1]
-        target_tile = MahjongTile(tiletype=selected_tile.tiletype,
-                                  subtype=selected_tile.subtype,
-                                  numchar=selected_tile.numchar + 2)
+    def winning_tiles(self, circle_wind: str) -> Dict[MahjongTile, int]:
+        """
+        Return every tile the player could claim a win on, mapped to the fan the
+        completed hand would score. Only tiles scoring at least 3 fan are included.
+        Built from the cached win_check results.
+        """
+        winning_tiles = {}
+        for index in sorted(self.waits()):
+            tile = MahjongTile.index_to_tile(index)
+            check = self.win_check(tile, circle_wind)
+            if check.wins:
+                winning_tiles[tile] = check.fan
+        return winning_tiles
 
-        while index < len(remaining_hand) and remaining_hand[index] <= target_tile:
-            if remaining_hand[index].numchar == selected_tile.numchar + 1:
-                indices[1] = index
-            elif remaining_hand[index].numchar == selected_tile.numchar + 2:
-                indices[2] = index
-            index += 1
+    def win_check(self, tile: Optional[MahjongTile], circle_wind: str) -> WinCheck:
+        """
+        Return whether the tile would complete a winning hand and its fan, without
+        changing the hand. See scoring.win_with_tile. Results are cached until the
+        hand changes, so every caller checking the same discard shares one
+        evaluation, and tiles the hand is not waiting on are rejected without one.
+        """
+        key = self._hand_key(circle_wind)
+        cache = self._win_checks
+        if cache is None or cache[0] != key:
+            cache = self._win_checks = (key, {})
+        checks = cache[1]
+        check = checks.get(tile)
+        if check is None:
+            if tile is None or tile.code not in self.waits():  # codes of the waits are their to_index()
+                check = NO_WIN
+            else:
+                check = win_with_tile(self._hidden_hand.counts, tile, self._revealed_sets, self._flowers,
+                                      circle_wind, self.player_order)
+            checks[tile] = check
+        return check
 
-        if indices[1] == -1 or indices[2] == -1:
-            return False
-        else:
-            potential_hand.append([remaining_hand.pop(indices[0]),
-                                   remaining_hand.pop(indices[1] - 1),
-                                   remaining_hand.pop(indices[2] - 2)])
-            return True
+    def can_win_on(self, tile: Optional[MahjongTile], circle_wind: str) -> bool:
+        """
+        Return whether the player could claim a win on the tile, without changing the hand
+        """
+        return self.win_check(tile, circle_wind).wins
 
-    @staticmethod
-    def potential_fan(potential_hand: List[List[MahjongTile]], flowers: List[MahjongTile],
-                      circle_wind, player_number) -> int | float:
-        """
-        Return a score for this hand, doesn't have to be complete (for potential fan)
-        """
-        if len(potential_hand) == 0:
-            return 0
-        hand_copy = copy.deepcopy(potential_hand)
-        flower_copy = copy.deepcopy(flowers)
-        fan = 0
-        ordered_flower = ['plum', 'orchid', 'chrysanthemum', 'bamboo']
-        ordered_season = ['summer', 'spring', 'autumn', 'winter']
-        ordered_cardinal = ['east', 'south', 'west', 'north']
-        if len(flower_copy) == 0:
-            fan += 1
-        elif {'plum', 'orchid', 'chrysanthemum', 'bamboo'} <= {flower.numchar for flower in flower_copy}:
-            fan += 2
-        elif {'summer', 'spring', 'autumn', 'winter'} <= {flower.numchar for flower in flower_copy}:
-            fan += 2
-        else:
-            if any(flower.numchar == ordered_flower[player_number] for flower in flower_copy):
-                fan += 1
-            if any(season.numchar == ordered_season[player_number] for season in flower_copy):
-                fan += 1
-
-        honour_sets = []
-        wind_sets = []
-
-        i = 0
-        while i < len(hand_copy):
-            if hand_copy[i][0].subtype == 'dragon':
-                honour_sets.append(hand_copy.pop(i))
-                i -= 1
-            elif hand_copy[i][0].subtype == 'wind':
-                wind_sets.append(hand_copy.pop(i))
-                i -= 1
-            i += 1
-
-        if len(honour_sets) == 3 and all(len(full_set) == 3 for full_set in honour_sets):
-            fan += 8
-            return fan
-        elif len(honour_sets) == 3:
-            fan += 5
-        else:
-            dragon_sets = len([full_set for full_set in honour_sets if len(full_set) > 2])
-            fan += dragon_sets
-
-        if len(wind_sets) == 4 and all(len(full_set) == 3 for full_set in wind_sets):
-            fan += 13
-            return fan
-        elif len(wind_sets) == 4:
-            fan += 6
-        else:
-            if any(full_set[0].numchar == circle_wind and len(full_set) == 3 for full_set in wind_sets):
-                fan += 1
-            if any(full_set[0].numchar == ordered_cardinal[player_number] and
-                   len(full_set) == 3 for full_set in wind_sets):
-                fan += 1
-
-        if all(hand_copy[i][0].subtype == hand_copy[i + 1][0].subtype for i in
-               range(0, len(hand_copy) - 1)):
-            if len(honour_sets) == 0 and len(wind_sets) == 0:
-                fan += 5
-            else:
-                fan += 3
+    def shanten(self) -> int:
+        """
+        Return how many tiles the hand is away from being ready, -1 if it is already
+        complete and 0 if it is waiting on a single tile
+        """
+        return shanten(self.hidden_hand.counts, len(self.revealed_sets))
 
-        i = 0
-        while i < len(hand_copy) and len(hand_copy[i]) == 3:
-            i += 1
-        if i != len(hand_copy):
-            hand_copy.pop(i)  # remove the eye, otherwise already removed in winds
+    def check_thirteen_orphans(self):
+        """
+        Edge case of thirteen orphans to be checked with winning hand
+        """
+        return is_thirteen_orphans(self.hidden_hand.counts)
 
-        # dui dui wu
-        if all(tile[0] == tile[1] for tile in hand_copy):
-            fan += 3
-        # assuming possible hands is structured correctly and can only contain a straight or a triplet
-        elif all(tile[0].tiletype == "suit" and tile[1].tiletype == "suit" and
-                 tile[0].numchar == tile[1].numchar + 1 for tile in hand_copy):  # ping wu
-            fan += 1
+    def _set_orphans(self):
+        """
+        Set thirteen orphans attribute
+        """
+        self.orphans = {MahjongTile.index_to_tile(index) for index in Player.orphan_indices}
 
-        return fan * len(potential_hand) * 3 // 14  # normalised fan based on completion
+    @staticmethod
+    def potential_fan(potential_hand: List[List[MahjongTile]], flowers: List[MahjongTile],
+                      circle_wind, player_number) -> int:
+        """
+        Return a score for this hand, doesn't have to be complete (for potential fan),
+        normalised by how many of the 14 tiles the sets cover
+        """
+        return hand_fan(potential_hand, flowers, circle_wind, player_number, completion_normalised=True)
 
     @staticmethod
     def score_hand(potential_hand: List[List[MahjongTile]], flowers: List[MahjongTile],
                    circle_wind, player_number) -> int:
         """
-        Return a score for this hand, doesn't have to be complete (for potential fan)
-        """
-        if len(potential_hand) == 0:
-            return 0
-        hand_copy = copy.deepcopy(potential_hand)
-        flower_copy = copy.deepcopy(flowers)
-        fan = 0
-        ordered_flower = ['plum', 'orchid', 'chrysanthemum', 'bamboo']
-        ordered_season = ['summer', 'spring', 'autumn', 'winter']
-        ordered_cardinal = ['east', 'south', 'west', 'north']
-        if len(flower_copy) == 0:
-            fan += 1
-            print("No flowers")
-        elif {'plum', 'orchid', 'chrysanthemum', 'bamboo'} <= {flower.numchar for flower in flower_copy}:
-            fan += 2
-            print("Full set of flowers")
-        elif {'summer', 'spring', 'autumn', 'winter'} <= {flower.numchar for flower in flower_copy}:
-            fan += 2
-            print("Full set of flowers")
-        else:
-            if any(flower.numchar == ordered_flower[player_number] for flower in flower_copy):
-                fan += 1
-                print("Correct flowers")
-            if any(season.numchar == ordered_season[player_number] for season in flower_copy):
-                fan += 1
-                print("Correct flowers")
-
-        honour_sets = []
-        wind_sets = []
-
-        i = 0
-        while i < len(hand_copy):
-            if hand_copy[i][0].subtype == 'dragon':
-                honour_sets.append(hand_copy.pop(i))
-                i -= 1
-            elif hand_copy[i][0].subtype == 'wind':
-                wind_sets.append(hand_copy.pop(i))
-                i -= 1
-            i += 1
-
-        if len(honour_sets) == 3 and all(len(full_set) == 3 for full_set in honour_sets):
-            fan += 8
-            print("Great dragons")
-            return fan
-        elif len(honour_sets) == 3:
-            print("Small dragon")
-            fan += 5
-        else:
-            dragon_sets = len([full_set for full_set in honour_sets if len(full_set) > 2])
-            fan += dragon_sets
-            for _ in range(dragon_sets):
-                print("Dragon")
-
-        if len(wind_sets) == 4 and all(len(full_set) == 3 for full_set in wind_sets):
-            fan += 13
-            print("Great winds")
-            return fan
-        elif len(wind_sets) == 4:
-            fan += 6
-            print("Minor winds")
-        else:
-            if any(full_set[0].numchar == circle_wind and len(full_set) == 3 for full_set in wind_sets):
-                fan += 1
-                print("Correct circle wind")
-            if any(full_set[0].numchar == ordered_cardinal[player_number] and
-                   len(full_set) == 3 for full_set in wind_sets):
-                fan += 1
-                print("Correct player wind")
-
-        if all(hand_copy[i][0].subtype == hand_copy[i + 1][0].subtype for i in
-               range(0, len(hand_copy) - 1)):
-            if len(honour_sets) == 0 and len(wind_sets) == 0:
-                fan += 5
-                print("All one set")
-            else:
-                fan += 3
-                print("Mixed one set")
-
-        i = 0
-        while i < len(hand_copy) and len(hand_copy[i]) == 3:
-            i += 1
-        if i != len(hand_copy):
-            hand_copy.pop(i)  # remove the eye, otherwise already removed in winds
-
-        # dui dui wu
-        if all(tile[0] == tile[1] for tile in hand_copy):
-            fan += 3
-            print("All triplets")
-        # assuming possible hands is structured correctly and can only contain a straight or a triplet
-        elif all(tile[0].tiletype == "suit" and tile[1].tiletype == "suit" and
-                 tile[0].numchar == tile[1].numchar + 1 for tile in hand_copy):  #ping wu
-            fan += 1
-            print("All straights")
-        return fan
+        Return a score for this hand, see scoring.score_melds for the breakdown
+        """
+        return hand_fan(potential_hand, flowers, circle_wind, player_number)
 
     def show_all_possible_sheungs(self, latest_tile: MahjongTile) -> \
             (Tuple[Tuple[int, int] | None, Tuple[int, int] | None, Tuple[int, int] | None]):
@@ -383,41 +322,29 @@ class Player:
 
         if latest_tile.tiletype != 'suit':
             return None, None, None
-        sequenced_tiles = [-1, -1, -1, -1]
-        lower_num = max(latest_tile.numchar - 2, 1)
-        upper_num = min(latest_tile.numchar + 2, 9)
-        # binary search
-        index = bisect.bisect_left(self.hidden_hand,
-                                   MahjongTile(tiletype=latest_tile.tiletype,
-                                               subtype=latest_tile.subtype,
-                                               numchar=lower_num)
-                                   )
-        upper_bound = MahjongTile(tiletype=latest_tile.tiletype,
-                                  subtype=latest_tile.subtype,
-                                  numchar=upper_num)
-        while index < len(self.hidden_hand) and self.hidden_hand[index] < upper_bound:
-            if self.hidden_hand[index].numchar == latest_tile.numchar - 2:
-                sequenced_tiles[0] = index
-            elif self.hidden_hand[index].numchar == latest_tile.numchar - 1:
-                sequenced_tiles[1] = index
-            elif self.hidden_hand[index].numchar == latest_tile.numchar + 1:
-                sequenced_tiles[2] = index
-            elif self.hidden_hand[index].numchar == latest_tile.numchar + 2:
-                sequenced_tiles[3] = index
-            index += 1
-
-        if sequenced_tiles[0] == -1 or sequenced_tiles[1] == -1:
+        hand = self.hidden_hand
+        index = latest_tile.to_index()
+        numchar = latest_tile.numchar
+        # -1 marks a neighbour which is missing or would fall outside of the suit
+        sequenced_tiles = [index + offset if 1 <= numchar + offset <= 9 and hand.count_index(index + offset) else -1
+                           for offset in (-2, -1, 1, 2)]
+        # translate tile indices into positions in the sorted hand only when needed
+        positions = [-1 if tile_index == -1 else
+                     bisect.bisect_left(self.hidden_hand, MahjongTile.index_to_tile(tile_index))
+                     for tile_index in sequenced_tiles]
+
+        if positions[0] == -1 or positions[1] == -1:
             lower_sheung = None
         else:
-            lower_sheung = [sequenced_tiles[0], sequenced_tiles[1]]
-        if sequenced_tiles[2] == -1 or sequenced_tiles[1] == -1:
+            lower_sheung = [positions[0], positions[1]]
+        if positions[2] == -1 or positions[1] == -1:
             mid_sheung = None
         else:
-            mid_sheung = [sequenced_tiles[1], sequenced_tiles[2]]
-        if sequenced_tiles[3] == -1 or sequenced_tiles[2] == -1:
+            mid_sheung = [positions[1], positions[2]]
+        if positions[3] == -1 or positions[2] == -1:
             high_sheung = None
         else:
-            high_sheung = [sequenced_tiles[2], sequenced_tiles[3]]
+            high_sheung = [positions[2], positions[3]]
 
         return lower_sheung, mid_sheung, high_sheung
 
@@ -427,27 +354,18 @@ class Player:
         should implement functionality of removing the tiles, and whether to
         go through with it
         """
-        index = 0
-        while index < len(self.hidden_hand) - 2 and self.hidden_hand[index] != latest_tile:
-            index += 1
-        if index >= len(self.hidden_hand) - 2:
-            return False
-        elif self.hidden_hand[index + 1] != latest_tile or self.hidden_hand[index + 2] != latest_tile:
-            return False
-
-        return True
+        return self.hidden_hand.count(latest_tile) >= 3
 
     def decide_win(self, latest_tile, circle_wind, player_number: int, state: np.ndarray = None) -> bool:
         """
         Base functions check if a win is can be claimed. All inheriting functions
         should implement functionality of deciding whether to claim or not
         """
-        if latest_tile is None:
+        check = self.win_check(latest_tile, circle_wind)
+        if not check.wins:
             return False
         self.add_tile(latest_tile)
-        if not self.check_winning_hand(circle_wind):
-            self.hidden_hand.remove(latest_tile)
-            return False
+        self.highest_fan = check.fan
         return True
 
     def decide_sheung(self, latest_tile: MahjongTile, state: np.array = None) -> Tuple[int, int]:
@@ -464,11 +382,13 @@ class Player:
         :param latest_tile:
         :return:
         """
-        possible_sheungs = self.show_all_possible_sheungs(latest_tile)
-        if all(sheung is None for sheung in possible_sheungs):
+        if latest_tile.tiletype != 'suit':
             return False
-
-        return True
+        hand = self.hidden_hand
+        index = latest_tile.to_index()
+        has = [1 <= latest_tile.numchar + offset <= 9 and hand.count_index(index + offset) > 0
+               for offset in (-2, -1, 1, 2)]
+        return (has[0] and has[1]) or (has[1] and has[2]) or (has[2] and has[3])
 
     def decide_pong(self, discarded_tile: MahjongTile, state: np.array = None) -> bool:
         """
@@ -476,12 +396,7 @@ class Player:
         should implement functionality of deciding whether to claim or not and executing
         the claim
         """
-        index = bisect.bisect_left(self.hidden_hand, discarded_tile)
-        if (index >= len(self.hidden_hand) - 1 or index < 1 or self.hidden_hand[index] != discarded_tile or
-                (self.hidden_hand[index + 1] != discarded_tile and self.hidden_hand[index - 1] != discarded_tile)):
-            return False
-
-        return True
+        return self.hidden_hand.count(discarded_tile) >= 2
 
     def discard_tile(self, state: np.ndarray = None) -> MahjongTile:
         """
@@ -493,7 +408,12 @@ class Player:
         """
         Add the tile to the hand in a sorted order
         """
-        bisect.insort(self.hidden_hand, drawn_tile)
+        # bisect.insort and CountedTileList.insert inlined, bisecting on the sort keys so no comparison goes
+        # through MahjongTile.__lt__, since this runs for every tile drawn or dealt
+        hand = self._hidden_hand
+        list.insert(hand, bisect.bisect_right(hand, drawn_tile.sort_key, key=_SORT_KEY), drawn_tile)
+        hand._buffer[drawn_tile.code] += 1
+        hand.version = next_version()
 
     def all_tiles(self):
         tile_str = [str(tile) for tile in (self.hidden_hand + [tile for set in self.revealed_sets for tile in set])]
@@ -525,10 +445,7 @@ class Player:
         """
         Encode player's hidden hand
         """
-        vec = np.zeros(34, dtype=np.float32)
-        for tile in self.hidden_hand:
-            vec[tile.to_index()] += 1
-        return vec / 4.0
+        return self.hidden_hand.counts / np.float32(4.0)
 
     def encode_revealed_hand(self) -> np.ndarray:
         """
@@ -538,28 +455,16 @@ class Player:
         represent the first, 34-67 are the second set, etc.
         Size of 34 * 4
         """
-        revealed_vecs = np.zeros(34 * 4, dtype=np.float32)
-        for i in range(len(self.revealed_sets)):
-            for tile in self.revealed_sets[i]:
-                revealed_vecs[i * 34 + tile.to_index()] += 1
-        return revealed_vecs / 4.0
+        return self.revealed_sets.slot_counts.ravel() / np.float32(4.0)
 
     def encode_discarded_pile(self):
         """
         Encode player's discard pile
         """
-        vec = np.zeros(34, dtype=np.float32)
-        for tile in self.discard_pile:
-            vec[tile.to_index()] += 1
-        return vec / 4.0
+        return self.discard_pile.counts / np.float32(4.0)
 
     def encode_flower_set(self):
-        vec = np.zeros(8, dtype=np.float32)
-        flower_mapping = {'plum': 0, 'orchid': 1, 'chrysanthemum': 2, 'bamboo': 3,
-                          'summer': 4, 'spring': 5, 'autumn': 6, 'winter': 7}
-        for flower in self.flowers:
-            vec[flower_mapping[flower.numchar]] += 1
-        return vec
+        return self.flowers.flower_counts.astype(np.float32)
 
     def count_flower_fan(self) -> int:
         """
@@ -579,27 +484,42 @@ class Player:
             return self.player_id, "kong", None
         if self.decide_pong(discarded_tile):
             return self.player_id, "pong", None
-        if (sheung_indices := self.decide_sheung(discarded_tile)) and player_number == (self.player_id - 1) % 4:
+        if (sheung_indices := self.decide_sheung(discarded_tile)) and player_number == (self.player_order - 1) % 4:
             return self.player_id, "sheung", sheung_indices
         return None, None, None
 
     @staticmethod
     def player_from_player_state(player_state, player_id, player_order):
+        """
+        Rebuild a player from its 217 value block of MahjongGame.get_state()
+        """
+        counts = np.rint(player_state[:34 * 6] * 4).astype(np.uint8)
+        flower_counts = np.rint(player_state[34 * 6:34 * 6 + 8]).astype(np.uint8)
+        return Player.player_from_counts(counts[:34], counts[34:34 * 5].reshape(4, 34), counts[34 * 5:34 * 6],
+                                         flower_counts, player_id, player_order)
 
+    @staticmethod
+    def player_from_counts(hidden_counts: np.ndarray, revealed_slot_counts: np.ndarray, discard_counts: np.ndarray,
+                           flower_counts: np.ndarray, player_id: int, player_order: int) -> Player:
+        """
+        Build a player straight from count vectors. Tile order within each pile is
+        lost, the tiles come out sorted.
+        :param hidden_counts: uint8[34] hidden hand counts
+        :param revealed_slot_counts: uint8[4, 34], one row per revealed set, empty rows are skipped
+        :param discard_counts: uint8[34] discard pile counts
+        :param flower_counts: uint8[8] flower counts in code order
+        """
         player = Player(player_id=player_id, player_order=player_order)
-
-        hidden_hand_vec = player_state[:34]
-        player.hidden_hand = Player.create_tile_pile(hidden_hand_vec)
-
-        revealed_sets_vec = player_state[34:34 * 5]
-        player.revealed_sets = Player.create_revealed_sets(revealed_sets_vec)
-
-        discarded_pile_vec = player_state[34 * 5: 34 * 6]
-        player.discard_pile = Player.create_tile_pile(discarded_pile_vec)
-
-        flower_vec = player_state[34 * 6:34 * 6 + 8]
-        player.flowers = Player.create_flowers(flower_vec)
-
+        player.hidden_hand = CountedTileList.from_counts(hidden_counts)
+        revealed_sets = []
+        for row in revealed_slot_counts:
+            raw = row.tobytes()
+            if any(raw):
+                revealed_sets.append([MahjongTile.index_to_tile(index) for index, count in enumerate(raw)
+                                      for _ in range(count)])
+        player.revealed_sets = revealed_sets
+        player.discard_pile = CountedTileList.from_counts(discard_counts)
+        player.flowers = CountedTileList.from_counts(bytes(NUM_TILE_TYPES) + flower_counts.tobytes())
         return player
 
     @staticmethod
@@ -609,13 +529,7 @@ class Player:
         :param hand_vec:
         :return:
         """
-        hand = []
-        for i in range(34):
-            count = int(round(hand_vec[i] * 4))
-            for _ in range(count):
-                tile = MahjongTile.index_to_tile(i)
-                hand.append(tile)
-        return hand
+        return CountedTileList.from_counts(np.rint(hand_vec[:34] * 4).astype(np.uint8))
 
     @staticmethod
     def create_revealed_sets(revealed_sets_vec):
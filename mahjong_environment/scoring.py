@@ -0,0 +1,266 @@
+"""
+scoring.py - fan scoring of a hand split into sets
+
+score_melds reads the sets and flowers in a single pass without copying or
+mutating them and returns which patterns scored. Player.score_hand and
+Player.potential_fan are thin wrappers around it. win_with_tile answers whether
+a tile would complete a hand, given as counts, without touching the hand, and
+completed_fan keeps the highest fan of recently evaluated hands in FAN_CACHE.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mahjong_environment.hand import CountedTileList, MeldList
+from mahjong_environment.hand_analysis import (ORPHAN_INDICES, decomposition_to_tiles, hand_decompositions,
+                                                is_thirteen_orphans, winning_pair_indices)
+from mahjong_environment.tile import MahjongTile, NUM_TILE_TYPES
+
+SEAT_WINDS = ('east', 'south', 'west', 'north')
+FULL_FLOWERS = 0x0F  # bits of the flower codes, see MahjongTile.code
+FULL_SEASONS = 0xF0
+GREAT_DRAGONS = 8
+GREAT_WINDS = 13
+THIRTEEN_ORPHANS = 13
+MIN_WINNING_FAN = 3  # a complete hand scoring less cannot be claimed
+_MISSING = object()  # FanCache also stores None, for hands which are not complete
+
+
+class FanBreakdown(NamedTuple):
+    """
+    Fan scored by each group of patterns, 0 for patterns that did not apply
+    """
+    flowers: int = 0  # no flowers, a full set of flowers or seasons, or the player's own flower and season
+    dragons: int = 0  # great or small three dragons, or one per dragon pong
+    winds: int = 0  # great or small four winds, or the circle and seat wind pongs
+    one_suit: int = 0  # all one suit, or one suit mixed with honours
+    triplets: int = 0  # all pongs
+    sequences: int = 0  # all sheungs
+
+    @property
+    def total(self) -> int:
+        return self.flowers + self.dragons + self.winds + self.one_suit + self.triplets + self.sequences
+
+    @property
+    def is_limit(self) -> bool:
+        """
+        Great dragons or great winds, which end the scoring early
+        """
+        return self.dragons == GREAT_DRAGONS or self.winds == GREAT_WINDS
+
+
+def _flower_fan(flowers: Iterable[MahjongTile], seat: int) -> int:
+    held = 0
+    for flower in flowers:
+        held |= 1 << (flower.code - NUM_TILE_TYPES)
+    if held == 0:
+        return 1
+    if held & FULL_FLOWERS == FULL_FLOWERS or held & FULL_SEASONS == FULL_SEASONS:
+        return 2
+    return int(bool(held & (1 << seat))) + int(bool(held & (1 << (4 + seat))))
+
+
+def score_melds(melds: Sequence[List[MahjongTile]], flowers: Iterable[MahjongTile],
+                circle_wind: str, seat: int) -> FanBreakdown:
+    """
+    Score a hand given as sets of tiles, e.g. a decomposition plus the revealed sets.
+    The hand does not have to be complete, in which case only the patterns the
+    sets already show are counted.
+    :param melds: the sets of the hand, pongs, kongs and sheungs with at most one pair
+    :param flowers: the flowers the player has collected
+    :param circle_wind: the current circle wind in {"north", "east", "south", "west"}
+    :param seat: the player's order, 0 being east
+    """
+    if len(melds) == 0:
+        return FanBreakdown()
+    flower_fan = _flower_fan(flowers, seat)
+
+    dragon_sets = dragon_pongs = dragon_exact_pongs = 0
+    wind_sets = wind_exact_pongs = 0
+    circle_wind_pong = seat_wind_pong = False
+    seat_wind = SEAT_WINDS[seat]
+    suit_subtype = None
+    one_suit = True
+    eye_skipped = False
+    all_triplets = all_sequences = True
+    for meld in melds:
+        first = meld[0]
+        subtype = first.subtype
+        if subtype == 'dragon':
+            dragon_sets += 1
+            if len(meld) > 2:
+                dragon_pongs += 1
+            if len(meld) == 3:
+                dragon_exact_pongs += 1
+        elif subtype == 'wind':
+            wind_sets += 1
+            if len(meld) == 3:
+                wind_exact_pongs += 1
+                circle_wind_pong |= first.numchar == circle_wind
+                seat_wind_pong |= first.numchar == seat_wind
+        else:
+            if suit_subtype is None:
+                suit_subtype = subtype
+            elif subtype != suit_subtype:
+                one_suit = False
+            if len(meld) != 3 and not eye_skipped:
+                eye_skipped = True  # the first set which is not a pong or sheung is taken to be the eye
+                continue
+            second = meld[1]
+            if first is not second:
+                all_triplets = False
+            # as before, a sheung counts when its first two tiles are listed in descending order
+            if not (first.tiletype == 'suit' and second.tiletype == 'suit' and first.numchar == second.numchar + 1):
+                all_sequences = False
+
+    if dragon_sets == 3 and dragon_exact_pongs == 3:
+        return FanBreakdown(flowers=flower_fan, dragons=GREAT_DRAGONS)
+    dragon_fan = 5 if dragon_sets == 3 else dragon_pongs
+
+    if wind_sets == 4 and wind_exact_pongs == 4:
+        return FanBreakdown(flowers=flower_fan, dragons=dragon_fan, winds=GREAT_WINDS)
+    wind_fan = 6 if wind_sets == 4 else int(circle_wind_pong) + int(seat_wind_pong)
+
+    one_suit_fan = 0
+    if one_suit:
+        one_suit_fan = 5 if dragon_sets == 0 and wind_sets == 0 else 3
+    return FanBreakdown(flower_fan, dragon_fan, wind_fan, one_suit_fan,
+                        3 if all_triplets else 0, 1 if all_sequences and not all_triplets else 0)
+
+
+def hand_fan(melds: Sequence[List[MahjongTile]], flowers: Iterable[MahjongTile],
+             circle_wind: str, seat: int, completion_normalised: bool = False) -> int:
+    """
+    Return the total fan of score_melds. With completion_normalised the fan is
+    scaled by the fraction of the 14 tiles the sets cover (three per set), which
+    is what the game state reports as each player's potential fan. Limit hands
+    are never scaled.
+    """
+    breakdown = score_melds(melds, flowers, circle_wind, seat)
+    if completion_normalised and not breakdown.is_limit:
+        return breakdown.total * len(melds) * 3 // 14
+    return breakdown.total
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class FanCache:
+    """
+    Bounded LRU cache of completed_fan results.
+
+    The key is made of values the containers already maintain, so building it
+    does not walk the sets: the bytes of the hidden counts, the versions of the
+    revealed MeldList and the flowers CountedTileList, the circle wind and the
+    seat. Versions change on every mutation and are never shared (see hand.py),
+    so an entry is never returned once its sets have changed. A copied container
+    gets a new version, so branches of a cloned game start from their own entries.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Optional[int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(counts: np.ndarray, revealed_sets: MeldList, flowers: CountedTileList, circle_wind: str,
+            seat: int) -> Tuple:
+        return counts.tobytes(), revealed_sets.version, flowers.version, circle_wind, seat
+
+    def fan(self, counts: np.ndarray, revealed_sets: MeldList, flowers: CountedTileList, circle_wind: str,
+            seat: int) -> Optional[int]:
+        """
+        _completed_fan, looked up in the cache first
+        """
+        key = FanCache.key(counts, revealed_sets, flowers, circle_wind, seat)
+        entries = self._entries
+        fan = entries.get(key, _MISSING)
+        if fan is not _MISSING:
+            self.hits += 1
+            entries.move_to_end(key)
+            return fan
+        self.misses += 1
+        fan = _completed_fan(counts, revealed_sets, flowers, circle_wind, seat)
+        entries[key] = fan
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return fan
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self.maxsize)
+
+    def clear(self) -> None:
+        """
+        Drop every entry and reset the statistics
+        """
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+FAN_CACHE = FanCache()
+
+
+class WinCheck(NamedTuple):
+    wins: bool  # the tile completes the hand with at least MIN_WINNING_FAN
+    fan: int  # highest fan of the completed hand, 0 if the tile does not complete it
+
+
+NO_WIN = WinCheck(False, 0)
+
+
+def completed_fan(counts: np.ndarray, revealed_sets: Sequence[List[MahjongTile]], flowers: Iterable[MahjongTile],
+                  circle_wind: str, seat: int) -> Optional[int]:
+    """
+    Return the highest fan over every way of splitting the hidden hand into sets,
+    together with the revealed sets, or None if the hand is not complete. Results
+    for a player's own MeldList and flowers come from FAN_CACHE.
+    :param counts: uint8[34] counts of the hidden hand
+    :param seat: the player's order, 0 being east
+    """
+    if isinstance(revealed_sets, MeldList) and isinstance(flowers, CountedTileList):
+        return FAN_CACHE.fan(counts, revealed_sets, flowers, circle_wind, seat)
+    return _completed_fan(counts, revealed_sets, flowers, circle_wind, seat)
+
+
+def _completed_fan(counts: np.ndarray, revealed_sets: Sequence[List[MahjongTile]], flowers: Iterable[MahjongTile],
+                   circle_wind: str, seat: int) -> Optional[int]:
+    if is_thirteen_orphans(counts):
+        return THIRTEEN_ORPHANS
+    highest_fan = None
+    for decomposition in hand_decompositions(counts):  # empty unless the hand is complete
+        fan = hand_fan(decomposition_to_tiles(decomposition) + list(revealed_sets), flowers, circle_wind, seat)
+        if highest_fan is None or fan > highest_fan:
+            highest_fan = fan
+    return highest_fan
+
+
+def win_with_tile(counts: np.ndarray, tile: Optional[MahjongTile], revealed_sets: Sequence[List[MahjongTile]],
+                  flowers: Iterable[MahjongTile], circle_wind: str, seat: int) -> WinCheck:
+    """
+    Return whether adding tile to the hidden hand given by counts would make a
+    winning hand, and its fan. Neither counts nor the sets are modified.
+    """
+    if tile is None or tile.tiletype == 'flower':
+        return NO_WIN
+    index = tile.to_index()
+    if counts[index] >= 4:
+        return NO_WIN
+    completed = counts.copy()
+    completed[index] += 1
+    # reject incomplete hands with the lookup tables alone, thirteen orphans can only end on an orphan
+    if not winning_pair_indices(completed) and not (index in ORPHAN_INDICES and is_thirteen_orphans(completed)):
+        return NO_WIN
+    fan = completed_fan(completed, revealed_sets, flowers, circle_wind, seat)
+    return WinCheck(fan >= MIN_WINNING_FAN, fan)
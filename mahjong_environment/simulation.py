@@ -0,0 +1,67 @@
+"""
+simulation.py - plays complete games between bots without any output
+
+simulate() is meant for comparing bots over many games, e.g.
+    simulate(100000, [BasicBot, YesBot, YesBot, YesBot], seed=0)
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.player import Player
+
+
+class SimulationResult(NamedTuple):
+    """
+    One entry per game, in the order the games were played. Seats are player orders.
+    """
+    winner: np.ndarray  # int8[N], seat of the winner, -1 for a draw
+    fan: np.ndarray  # int16[N], fan of the winning hand, 0 for a draw
+    turns: np.ndarray  # int16[N], number of discards made
+    scores: np.ndarray  # int32[N, 4], points won or lost by each seat
+    seconds: float  # wall-clock time spent playing
+
+    @property
+    def games_per_second(self) -> float:
+        return len(self.winner) / self.seconds if self.seconds > 0 else float('inf')
+
+
+def simulate(n_games: int, bot_factories: Sequence[Callable[[int, int], Player]], seed: int = None,
+             circle_wind: str = 'east', first_game: int = 0) -> SimulationResult:
+    """
+    Play n_games complete games with MahjongGame.play_round in headless mode.
+    :param n_games: number of games to play
+    :param bot_factories: one callable per seat taking (player_id, player_order),
+                          e.g. a bot class, called again for every game
+    :param seed: master seed, game i deals and drives its bots with MahjongGame.game_rng(seed, i).
+                 Drawn from the random module when not given.
+    :param circle_wind: the circle wind of every game
+    :param first_game: index of the first game, so a shard of a larger run, or a single game
+                       of it, can be played on its own with the same master seed
+    """
+    if len(bot_factories) != 4:
+        raise ValueError("simulate needs one bot factory per seat")
+    if seed is None:
+        seed = random.getrandbits(64)
+
+    winner = np.full(n_games, -1, dtype=np.int8)
+    fan = np.zeros(n_games, dtype=np.int16)
+    turns = np.zeros(n_games, dtype=np.int16)
+    scores = np.zeros((n_games, 4), dtype=np.int32)
+    start = time.perf_counter()
+    for game_no in range(n_games):
+        players = [factory(seat, seat) for seat, factory in enumerate(bot_factories)]
+        game = MahjongGame(players, circle_wind, verbose=False, rng=MahjongGame.game_rng(seed, first_game + game_no))
+        won = game.play_round()
+        if won is not None:
+            winner[game_no] = won.player_order
+            fan[game_no] = won.highest_fan
+        turns[game_no] = len(game.discarded_tiles)
+        scores[game_no] = [player.score for player in game.players]
+    return SimulationResult(winner, fan, turns, scores, time.perf_counter() - start)
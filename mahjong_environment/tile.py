@@ -1,27 +1,58 @@
 from __future__ import annotations
 
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
 
 import numpy as np
 
+NUM_TILE_TYPES = 34  # distinct suit and honour tiles, i.e. the range of MahjongTile.to_index()
+NUM_TILE_CODES = 42  # NUM_TILE_TYPES + 8 distinct flower tiles
+
 
 class MahjongTile:
     """
     Represents a Mahjong Tile
+
+    There are only 42 distinct tiles, so every tile is interned: constructing a
+    MahjongTile returns the shared instance from the registry, which means
+    equality is an identity check. Tiles are immutable.
     """
+    __slots__ = ('tiletype', 'subtype', 'numchar', 'code', 'sort_key', '_index', '_hash')
+
     tiletype: str
     subtype: str
     numchar: Union[int, str]  # either the character or number represented on the tile
+    code: int  # 0 - 33 matches to_index(), 34 - 41 are the flowers in encode_flower_set order
+    sort_key: int  # total order used by all comparisons: circle, bamboo, number, wind, dragon, flower, season
 
-    def __hash__(self):
-        return hash((self.tiletype, self.subtype, self.numchar))
+    def __new__(cls, tiletype: str, subtype: str, numchar: Union[int, str] = -1) -> MahjongTile:
+        try:
+            return _TILE_REGISTRY[(tiletype.lower(), subtype, numchar)]
+        except (KeyError, TypeError):
+            MahjongTile._validate(tiletype.lower(), subtype, numchar)
+            raise ValueError("Invalid tile")
 
-    def __init__(self, tiletype: str, subtype: str, numchar: Union[int, str] = -1):
-        tiletype = tiletype.lower()
+    @classmethod
+    def _create(cls, tiletype: str, subtype: str, numchar: Union[int, str], code: int) -> MahjongTile:
+        """
+        Build a registry entry, should only be called when the module is loaded
+        """
+        tile = object.__new__(cls)
+        object.__setattr__(tile, 'tiletype', tiletype)
+        object.__setattr__(tile, 'subtype', subtype)
+        object.__setattr__(tile, 'numchar', numchar)
+        object.__setattr__(tile, 'code', code)
+        object.__setattr__(tile, 'sort_key', code)
+        object.__setattr__(tile, '_index', code if code < NUM_TILE_TYPES else None)
+        object.__setattr__(tile, '_hash', hash((tiletype, subtype, numchar)))
+        return tile
+
+    @staticmethod
+    def _validate(tiletype: str, subtype: str, numchar: Union[int, str]) -> None:
+        """
+        Raise a ValueError describing why the given tile does not exist
+        """
         if tiletype not in ('suit', 'honour', 'flower'):
             raise ValueError("Invalid tile type")
-        else:
-            self.tiletype = tiletype
         if tiletype == 'suit' and subtype not in ('circle', 'bamboo', 'number'):
             raise ValueError("Invalid subtype")
         elif tiletype == 'honour' and subtype not in ('wind', 'dragon'):
@@ -30,15 +61,11 @@ class MahjongTile:
         if tiletype == 'suit':
             if not isinstance(numchar, int) or numchar < 1 or numchar > 9:
                 raise ValueError("Invalid number")
-            else:
-                self.numchar = int(numchar)
         elif tiletype == 'honour':
             if subtype == 'wind' and numchar not in ('east', 'south', 'west', 'north'):
                 raise ValueError("Invalid number")
             elif subtype == 'dragon' and numchar not in ('red', 'green', 'white'):
                 raise ValueError("Invalid number")
-            else:
-                self.numchar = numchar
         elif tiletype == 'flower':
             if subtype not in ('flower', 'season'):
                 raise ValueError("Invalid subtype")
@@ -46,67 +73,79 @@ class MahjongTile:
                 raise ValueError("Invalid number")
             elif subtype == 'season' and numchar not in ('summer', 'spring', 'autumn', 'winter'):
                 raise ValueError("Invalid number")
-            else:
-                self.numchar = numchar
-        self.subtype = subtype
-        self.tiletype = tiletype
+
+    def __setattr__(self, key, value):
+        raise AttributeError("MahjongTile is immutable")
+
+    def __hash__(self):
+        return self._hash
 
     def __eq__(self, other: MahjongTile):
-        return self.tiletype == other.tiletype and self.subtype == other.subtype and self.numchar == other.numchar
+        return self is other
+
+    def __ne__(self, other: MahjongTile):
+        return self is not other
+
+    def __reduce__(self):
+        return MahjongTile.from_code, (self.code,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return self.subtype + str(self.numchar)
 
     def __lt__(self, other: MahjongTile):
-        suit_order = {'circle': 0, 'bamboo': 1, 'number': 2, 'wind': 3, 'dragon': 4, 'flower': 5, 'season': 6}
-        if self.subtype != other.subtype:
-            return suit_order[self.subtype] < suit_order[other.subtype]
-        return self.numchar < other.numchar
-        # TODO: Fix compatability with 'season' and 'flower' subtype
+        return self.sort_key < other.sort_key
 
     def __le__(self, other: MahjongTile):
-        suit_order = {'circle': 0, 'bamboo': 1, 'number': 2, 'wind': 3, 'dragon': 4, 'flower': 5, 'season': 6}
-        if self.subtype != other.subtype:
-            return suit_order[self.subtype] <= suit_order[other.subtype]
-        return self.numchar <= other.numchar
-        # TODO: Fix compatability with 'season' and 'flower' subtype
-
-    def to_index(self):
-        if self.subtype == "circle":
-            return self.numchar - 1
-        elif self.subtype == "bamboo":
-            return 9 + (self.numchar - 1)
-        elif self.subtype == "number":
-            return 18 + (self.numchar - 1)
-        elif self.subtype == "wind":
-            wind_order = {"east": 27, "south": 28, "west": 29, "north": 30}
-            return wind_order[self.numchar]
-        elif self.subtype == "dragon":
-            dragon_order = {"red": 31, "green": 32, "white": 33}
-            return dragon_order[self.numchar]
-        raise ValueError
+        return self.sort_key <= other.sort_key
+
+    def __gt__(self, other: MahjongTile):
+        return self.sort_key > other.sort_key
+
+    def __ge__(self, other: MahjongTile):
+        return self.sort_key >= other.sort_key
+
+    def to_index(self) -> int:
+        if self._index is None:
+            raise ValueError
+        return self._index
 
     @staticmethod
     def index_to_tile(index: int) -> MahjongTile:
-        if 0 <= index < 9:
-            return MahjongTile(tiletype="suit", subtype="circle", numchar=index+1)
-        elif 9 <= index < 18:
-            return MahjongTile(tiletype="suit", subtype="bamboo", numchar=index+1-9)
-        elif 18 <= index < 27:
-            return MahjongTile(tiletype="suit", subtype="number", numchar=index+1-18)
-        elif index == 27:
-            return MahjongTile(tiletype="honour", subtype="wind", numchar="east")
-        elif index == 28:
-            return MahjongTile(tiletype="honour", subtype="wind", numchar="south")
-        elif index == 29:
-            return MahjongTile(tiletype="honour", subtype="wind", numchar="west")
-        elif index == 30:
-            return MahjongTile(tiletype="honour", subtype="wind", numchar="north")
-        elif index == 31:
-            return MahjongTile(tiletype="honour", subtype="dragon", numchar="red")
-        elif index == 32:
-            return MahjongTile(tiletype="honour", subtype="dragon", numchar="green")
-        elif index == 33:
-            return MahjongTile(tiletype="honour", subtype="dragon", numchar="white")
-        else:
-            raise ValueError
+        if 0 <= index < NUM_TILE_TYPES:
+            return _TILES_BY_CODE[index]
+        raise ValueError
+
+    @staticmethod
+    def from_code(code: int) -> MahjongTile:
+        """
+        Return the tile with the given code, including flowers (34 - 41)
+        """
+        if 0 <= code < NUM_TILE_CODES:
+            return _TILES_BY_CODE[code]
+        raise ValueError
+
+
+def _build_registry() -> Tuple[Tuple[MahjongTile, ...], Dict[Tuple[str, str, Union[int, str]], MahjongTile]]:
+    """
+    Create the 42 distinct tiles in code order
+    """
+    definitions: List[Tuple[str, str, Union[int, str]]] = []
+    for suit in ('circle', 'bamboo', 'number'):
+        definitions += [('suit', suit, i) for i in range(1, 10)]
+    definitions += [('honour', 'wind', wind) for wind in ('east', 'south', 'west', 'north')]
+    definitions += [('honour', 'dragon', dragon) for dragon in ('red', 'green', 'white')]
+    definitions += [('flower', 'flower', flower) for flower in ('plum', 'orchid', 'chrysanthemum', 'bamboo')]
+    definitions += [('flower', 'season', season) for season in ('summer', 'spring', 'autumn', 'winter')]
+
+    tiles = tuple(MahjongTile._create(tiletype, subtype, numchar, code)
+                  for code, (tiletype, subtype, numchar) in enumerate(definitions))
+    return tiles, {(tile.tiletype, tile.subtype, tile.numchar): tile for tile in tiles}
+
+
+_TILES_BY_CODE, _TILE_REGISTRY = _build_registry()
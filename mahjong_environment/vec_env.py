@@ -0,0 +1,298 @@
+"""
+vec_env.py - several MahjongEnvironmentAdapter games stepped in lockstep
+
+VecMahjongEnv holds N games and steps all of them through the same phase of
+MahjongEnvironmentAdapter.play_all_actions at once, writing the observations
+and legal action masks into preallocated arrays, so one batched forward pass of
+a policy can act for every seat of every table, e.g.
+    env = VecMahjongEnv(64, seed=0)
+    observations, masks = env.reset()
+    while training:
+        logits = policy(observations)  # [N, NUM_ACTIONS], or [N, 4, NUM_ACTIONS] with one head per seat
+        actions = np.where(masks, logits[:, None, :], -np.inf).argmax(axis=2)
+        observations, masks, rewards, dones = env.step(actions)
+
+SubprocVecMahjongEnv has the same interface, but splits the games between
+worker processes, each running a VecMahjongEnv over its share. The arrays live
+in one shared memory block, so a step only sends a one byte command to each
+worker and the workers write their results straight into the arrays the
+learner reads.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import random
+import traceback
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from mahjong_environment.mahjong_actions import MahjongActions
+from mahjong_environment.mahjong_game import MahjongGame, NUM_ACTIONS
+from mahjong_environment.mahjong_game_adapter import MahjongEnvironmentAdapter
+from mahjong_environment.player import Player
+
+
+class VecMahjongEnv:
+    """
+    Every game is in the same phase at every step: play starts with a discard,
+    the phases alternate, and a game can only end on an interrupt step, after
+    which it is reset straight into the discard phase of its next game. The
+    arrays returned by reset and step are the env's own buffers and are
+    overwritten by the next step.
+    """
+    num_envs: int
+    envs: List[MahjongEnvironmentAdapter]
+    seed: int  # master seed, game i is driven by MahjongGame.game_rng(seed, first_game + i) through all of its resets
+    first_game: int
+    observations: np.ndarray  # float32[N, MahjongGame.state_size], get_state of each game
+    legal_masks: np.ndarray  # bool[N, 4, NUM_ACTIONS], legal_action_mask of each game, rows in seat order
+    rewards: np.ndarray  # int32[N, 4], points won or lost by each seat in a game which ended on the last step
+    dones: np.ndarray  # bool[N], the game ended on the last step and the env has been reset
+    is_discard: bool = True  # the phase every game is in
+
+    def __init__(self, num_envs: int, player_factory: Callable[[int, int], Player] = Player,
+                 circle_wind: str = 'east', seed: Optional[int] = None, first_game: int = 0):
+        """
+        :param player_factory: callable taking (player_id, player_order) for every seat, the players only
+                               hold the hands since the actions come from step
+        :param seed: master seed, drawn from the random module when not given
+        :param first_game: index of the first game, so the games of a larger env can be split between
+                           several VecMahjongEnv with the same seed, see SubprocVecMahjongEnv
+        """
+        self.num_envs = num_envs
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.first_game = first_game
+        self.envs = []
+        for i in range(num_envs):
+            players = [player_factory(seat, seat) for seat in range(4)]
+            game = MahjongGame(players, circle_wind, verbose=False,
+                               rng=MahjongGame.game_rng(self.seed, first_game + i))
+            self.envs.append(MahjongEnvironmentAdapter(controlling_player_id=0, game=game))
+        self.observations = np.zeros((num_envs, MahjongGame.state_size), dtype=np.float32)
+        self.legal_masks = np.zeros((num_envs, 4, NUM_ACTIONS), dtype=bool)
+        self.rewards = np.zeros((num_envs, 4), dtype=np.int32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+    def use_buffers(self, observations: np.ndarray, legal_masks: np.ndarray, rewards: np.ndarray,
+                    dones: np.ndarray) -> None:
+        """
+        Write every later step into the given arrays, e.g. views of shared memory,
+        shaped and typed like the ones they replace
+        """
+        self.observations = observations
+        self.legal_masks = legal_masks
+        self.rewards = rewards
+        self.dones = dones
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Start a new game in every env
+        :return: the observations and legal masks
+        """
+        for i, env in enumerate(self.envs):
+            env.reset()
+            self._observe(i, env.game)
+        self.is_discard = True
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self.observations, self.legal_masks
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Play one phase of every game. Games which end are scored, added to the
+        players' scores like MahjongGame.play_round does, and reset.
+        :param actions: int[N, 4], the action of each seat of each game, PASS for seats without one,
+                        e.g. the argmax of the masked policy
+        :return: the observations, legal masks, rewards and dones
+        """
+        rewards = self.rewards
+        dones = self.dones
+        rewards[:] = 0
+        dones[:] = False
+        for i, (env, row) in enumerate(zip(self.envs, np.asarray(actions).tolist())):
+            game = env.game
+            env.play_all_actions(list(enumerate(row)))
+            if game.game_over or game.tiles_remaining == 0:
+                scores = game.round_scores()
+                for player, score in zip(game.players, scores):
+                    player.score += score
+                rewards[i] = scores
+                dones[i] = True
+                env.reset()
+            self._observe(i, game)
+        self.is_discard = not self.is_discard  # finished games were reset into the discard phase that follows
+        return self.observations, self.legal_masks, rewards, dones
+
+    def _observe(self, i: int, game: MahjongGame) -> None:
+        game.get_state(out=self.observations[i])
+        game.legal_action_mask(out=self.legal_masks[i])
+
+
+_STEP, _RESET, _CLOSE = b'S', b'R', b'C'  # commands sent to the workers, answered with b'' or a traceback
+
+
+def _shared_arrays(buffer: memoryview, num_envs: int) -> Tuple[np.ndarray, ...]:
+    """
+    Lay out the observations, legal masks, rewards, dones and actions of num_envs
+    games over buffer, the widest types first so every array is aligned
+    """
+    shapes = (((num_envs, MahjongGame.state_size), np.float32), ((num_envs, 4, NUM_ACTIONS), np.bool_),
+              ((num_envs, 4), np.int32), ((num_envs,), np.bool_), ((num_envs, 4), np.int8))
+    arrays = []
+    offset = 0
+    for shape, dtype in shapes:
+        arrays.append(np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset))
+        offset += arrays[-1].nbytes
+    observations, legal_masks, rewards, dones, actions = arrays
+    return observations, legal_masks, rewards, dones, actions
+
+
+def _shared_size(num_envs: int) -> int:
+    return num_envs * (MahjongGame.state_size * 4 + 4 * NUM_ACTIONS + 4 * 4 + 1 + 4)
+
+
+def _vec_env_worker(connection: Connection, memory_name: str, num_envs: int, start: int, stop: int,
+                    player_factory: Callable[[int, int], Player], circle_wind: str, seed: int) -> None:
+    """
+    Run games start to stop of a SubprocVecMahjongEnv until told to close
+    """
+    memory = SharedMemory(memory_name)
+    _serve(connection, memory.buf, num_envs, start, stop, player_factory, circle_wind, seed)
+    memory.close()  # only once _serve has dropped its views of the block
+
+
+def _serve(connection: Connection, buffer: memoryview, num_envs: int, start: int, stop: int,
+           player_factory: Callable[[int, int], Player], circle_wind: str, seed: int) -> None:
+    try:
+        observations, legal_masks, rewards, dones, actions = _shared_arrays(buffer, num_envs)
+        env = VecMahjongEnv(stop - start, player_factory, circle_wind, seed, first_game=start)
+        env.use_buffers(observations[start:stop], legal_masks[start:stop], rewards[start:stop], dones[start:stop])
+        actions = actions[start:stop]
+    except Exception:
+        connection.send_bytes(traceback.format_exc().encode())
+        return
+    connection.send_bytes(b'')
+    while True:
+        command = connection.recv_bytes()
+        if command == _CLOSE:
+            return
+        try:
+            if command == _STEP:
+                env.step(actions)
+            else:
+                env.reset()
+            connection.send_bytes(b'')
+        except Exception:
+            connection.send_bytes(traceback.format_exc().encode())
+
+
+class SubprocVecMahjongEnv:
+    """
+    VecMahjongEnv with its games split between worker processes, which get
+    around the GIL. Game i is seeded the same way as in a VecMahjongEnv with the
+    same seed, so the games do not depend on the number of workers. Close it,
+    or use it as a context manager, to stop the workers and free the shared
+    memory.
+    """
+    num_envs: int
+    seed: int
+    observations: np.ndarray  # float32[N, MahjongGame.state_size], in shared memory, as in VecMahjongEnv
+    legal_masks: np.ndarray  # bool[N, 4, NUM_ACTIONS]
+    rewards: np.ndarray  # int32[N, 4]
+    dones: np.ndarray  # bool[N]
+    actions: np.ndarray  # int8[N, 4], the actions of the step being played, read by the workers
+    is_discard: bool = True
+    _memory: Optional[SharedMemory] = None
+    _connections: List[Connection]
+    _workers: List[multiprocessing.Process]
+
+    def __init__(self, num_envs: int, player_factory: Callable[[int, int], Player] = Player,
+                 circle_wind: str = 'east', seed: Optional[int] = None, workers: Optional[int] = None):
+        """
+        :param player_factory: picklable callable taking (player_id, player_order), e.g. a bot class
+        :param workers: number of worker processes, one per core by default and at most one per game
+        """
+        self.num_envs = num_envs
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        workers = max(1, min(workers or os.cpu_count() or 1, num_envs))
+        self._memory = SharedMemory(create=True, size=_shared_size(num_envs))
+        self.observations, self.legal_masks, self.rewards, self.dones, self.actions = \
+            _shared_arrays(self._memory.buf, num_envs)
+        self.actions[:] = MahjongActions.PASS
+
+        context = multiprocessing.get_context()
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int).tolist()
+        self._connections = []
+        self._workers = []
+        for start, stop in zip(bounds, bounds[1:]):
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=_vec_env_worker, daemon=True,
+                                     args=(worker_connection, self._memory.name, num_envs, start, stop,
+                                           player_factory, circle_wind, self.seed))
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+        self._wait()
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Start a new game in every env
+        :return: the observations and legal masks
+        """
+        self._command(_RESET)
+        self.is_discard = True
+        return self.observations, self.legal_masks
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        See VecMahjongEnv.step
+        """
+        self.actions[:] = actions
+        self._command(_STEP)
+        self.is_discard = not self.is_discard
+        return self.observations, self.legal_masks, self.rewards, self.dones
+
+    def close(self) -> None:
+        if self._memory is None:
+            return
+        for connection in self._connections:
+            try:
+                connection.send_bytes(_CLOSE)
+            except OSError:
+                pass  # the worker is already gone
+            connection.close()
+        for worker in self._workers:
+            worker.join()
+        del self.observations, self.legal_masks, self.rewards, self.dones, self.actions
+        try:
+            self._memory.close()
+        except BufferError:
+            pass  # arrays returned by step are still in use, the block is unmapped once they are gone
+        self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self) -> SubprocVecMahjongEnv:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _command(self, command: bytes) -> None:
+        for connection in self._connections:
+            connection.send_bytes(command)
+        self._wait()
+
+    def _wait(self) -> None:
+        """
+        Wait for every worker to answer, raising the first error any of them reported
+        """
+        errors = [connection.recv_bytes() for connection in self._connections]
+        for error in errors:
+            if error:
+                raise RuntimeError("A VecMahjongEnv worker failed:\n" + error.decode())
@@ -0,0 +1,97 @@
+"""
+wall.py - the tiles left to draw in a game, as an array of tile codes
+
+Regular draws take tiles from the front of the wall and replacement draws, for
+flowers and kongs, from the back, so the wall is a fixed uint8 array with one
+pointer for each end and nothing is allocated while a game is played or reset.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+
+from mahjong_environment.tile import MahjongTile, NUM_TILE_CODES
+
+_TILES_BY_CODE = tuple(MahjongTile.from_code(code) for code in range(NUM_TILE_CODES))
+
+
+class Wall:
+    """
+    Tile codes (see MahjongTile.code) in draw order. The tiles left are
+    codes[front:back], so the number remaining is back - front. codes is a view
+    over a bytearray, which is what single draws read since indexing a bytearray
+    is much cheaper than indexing a numpy array.
+    """
+    codes: np.ndarray  # uint8[len(full_set)]
+    front: int  # index of the next regular draw
+    back: int  # one past the index of the next replacement draw
+    _full_set: np.ndarray  # uint8 codes of every tile in a full set, shared between walls and never modified
+
+    def __init__(self, full_set: np.ndarray):
+        """
+        :param full_set: uint8 codes of every tile in a full set, the wall starts out holding them in this order
+        """
+        self._full_set = full_set
+        self._buffer = bytearray(len(full_set))
+        self.codes = np.frombuffer(self._buffer, dtype=np.uint8)
+        self.codes[:] = full_set
+        self.front = 0
+        self.back = len(full_set)
+
+    def __len__(self) -> int:
+        return self.back - self.front
+
+    def shuffle(self, rng: np.random.Generator) -> None:
+        """
+        Refill the wall with a full set in a random order
+        """
+        codes = self.codes
+        codes[:] = self._full_set
+        rng.shuffle(codes)
+        self.front = 0
+        self.back = len(codes)
+
+    def refill(self, codes: np.ndarray) -> None:
+        """
+        Make the given tile codes the whole wall, in draw order
+        """
+        self.codes[:len(codes)] = codes
+        self.front = 0
+        self.back = len(codes)
+
+    def draw(self) -> MahjongTile:
+        """
+        Take the tile at the front of the wall
+        """
+        front = self.front
+        if front == self.back:
+            raise IndexError("draw from an empty wall")
+        self.front = front + 1
+        return _TILES_BY_CODE[self._buffer[front]]
+
+    def draw_replacement(self) -> MahjongTile:
+        """
+        Take the tile at the back of the wall, for a flower or a kong
+        """
+        back = self.back - 1
+        if back < self.front:
+            raise IndexError("draw from an empty wall")
+        self.back = back
+        return _TILES_BY_CODE[self._buffer[back]]
+
+    def tiles(self) -> List[MahjongTile]:
+        """
+        Return the tiles left as a new list, in the order of regular draws
+        """
+        return [_TILES_BY_CODE[code] for code in self._buffer[self.front:self.back]]
+
+    def copy(self) -> Wall:
+        wall = object.__new__(Wall)
+        wall._full_set = self._full_set
+        wall._buffer = bytearray(self._buffer)
+        wall.codes = np.frombuffer(wall._buffer, dtype=np.uint8)
+        wall.front = self.front
+        wall.back = self.back
+        return wall
@@ -5,8 +5,8 @@ import torch.nn as nn
 import torch.optim as optim
 import random
 import numpy as np
-from collections import deque
 
+from mahjong_environment.game_log import GameLog
 from mahjong_environment.mahjong_actions import MahjongActions
 from reinforcement_learning.montecarlo_sampling import MonteCarloTreeSearch
 from reinforcement_learning.neural_network import PolicyValueNetwork
@@ -23,11 +23,13 @@ class MahjongModel:
         :param network: network with policy-value head
         :param learning_rate: learning rate for Adam optimizer
         :param batch_size: number of experiences sampled per update
-        :param max_buffer_size: maximum size of replay buffer
+        :param max_buffer_size: maximum size of replay buffer, only the latest steps are sampled from
         """
         self.network = network
         self.batch_size = batch_size
-        self.replay_buffer = deque(maxlen=max_buffer_size)
+        self.max_buffer_size = max_buffer_size
+        # the training loop logs its steps straight into the buffer, see Training.run_training_loop
+        self.replay_buffer = GameLog(network.policy_input_layer.in_features)
         self.optimizer = optim.Adam(self.network.parameters(), lr=learning_rate)
 
     def select_action(self, observation: np.ndarray, legal_actions: List[int], player_id: int) -> MahjongActions:
@@ -73,36 +75,34 @@ class MahjongModel:
         """
         Store experience in the replay buffer
         """
-        self.replay_buffer.append(experience)
+        state, action, value = experience
+        self.replay_buffer.append(state, -1, action, is_discard=False, reward=value)
 
-    def sample_batch(self) -> List:
+    def sample_batch(self) -> np.ndarray:
         """
-        Sample a batch of experiences from the replay buffer
+        Sample a batch of rows from the latest max_buffer_size steps of the replay buffer
         """
-        return random.sample(self.replay_buffer, min(len(self.replay_buffer), self.batch_size))
+        size = len(self.replay_buffer)
+        sampled = min(size, self.max_buffer_size)
+        return size - sampled + np.array(random.sample(range(sampled), min(sampled, self.batch_size)), dtype=np.intp)
 
     def update_model(self):
         """
         Update the model using the experiences stored in the replay buffer if
         buffer is greater than initialised batch size
         """
-        if len(self.replay_buffer) < self.batch_size:
+        buffer = self.replay_buffer
+        if len(buffer) < self.batch_size:
             return
+        if len(buffer) >= 2 * self.max_buffer_size:
+            buffer.keep_latest(self.max_buffer_size)  # moving the rows down is only needed once in a while
 
-        batch = self.sample_batch()
-        states, actions, values = zip(*batch)  # only store state, best action, final outcome
+        rows = self.sample_batch()  # only store state, best action, final outcome
 
-        # tensor = higher dimen matrix
-        states = torch.tensor(np.array(states), dtype=torch.float32)
-
-        actions = torch.tensor(actions, dtype=torch.long)
-        """
-          File "{REDACTED}/mahjong_ai/reinforcement_learning/decision_model.py", line 98, in update_model
-            actions = torch.tensor(actions, dtype=torch.long)
-        TypeError: 'tuple' object cannot be interpreted as an integer
-        """
-
-        values = torch.tensor(values, dtype=torch.float32)
+        # tensor = higher dimen matrix, gathered straight from the buffer's columns
+        states = torch.from_numpy(buffer.gather_states(rows))  # only the sampled rows are widened to float32
+        actions = torch.from_numpy(buffer.actions[rows].astype(np.int64))
+        values = torch.from_numpy(buffer.rewards[rows])
 
         policy_logits, value_preds = self.network(states)
 
@@ -132,4 +132,4 @@ class MahjongModel:
         """
         Reset the replay buffer
         """
-        self.replay_buffer.clear()
+        self.replay_buffer.truncate(0)
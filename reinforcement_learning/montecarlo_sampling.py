@@ -7,7 +7,6 @@ import torch
 
 from mahjong_environment.mahjong_actions import MahjongActions
 from mahjong_environment.mahjong_game import MahjongGame
-from mahjong_environment.mahjong_game_adapter import MahjongEnvironmentAdapter
 from reinforcement_learning.neural_network import PolicyValueNetwork
 
 
@@ -178,7 +177,9 @@ class MonteCarloTreeSearch:
         policy = policy_logits.squeeze().cpu().numpy()
 
         for transition in legal_transitions:
-            next_state = self.simulate_transition(node.state, transition)
+            game.apply(transition)
+            next_state = game.get_state()
+            game.undo()
             child_node = MonteCarloTreeNode(
                 state=next_state,
                 transition=transition,
@@ -195,21 +196,21 @@ class MonteCarloTreeSearch:
         Aapply action to state and return new state
         """
         game, is_discard = MahjongGame.reconstruct_game(state)
-        adapter = MahjongEnvironmentAdapter(game=game, discard_turn=is_discard, controlling_player_id=self.player_id)
-        actioner_id, action = transition
-        adapter.step_with_resolved_action(action=action, actioner_id=actioner_id)
-        return adapter.game.get_state()
+        game.apply(transition)
+        return game.get_state()
 
     def rollout(self, current_state: np.ndarray, player_id: int, depth: int) -> float:
         """
         Guided rollout using policy
         """
+        assert all(element <= 1 for element in current_state)
+        game, is_discard = MahjongGame.reconstruct_game(current_state)
         for _ in range(depth):
-            assert all(element <= 1 for element in current_state)
-            game, is_discard = MahjongGame.reconstruct_game(current_state)
-            legal_transitions = game.find_legal_transitions()
+            mask = game.legal_action_mask()
+            mask[:, MahjongActions.PASS] = False
+            seats, legal_action_indices = np.nonzero(mask)
 
-            if not legal_transitions:
+            if len(legal_action_indices) == 0:
                 break
 
             # policy from network
@@ -221,17 +222,16 @@ class MonteCarloTreeSearch:
             policy = policy_logits.squeeze().cpu().numpy()
 
             # mask illegal transition prevent selection
-            self.mask_illegal_transitions(policy, legal_transitions)
+            self.mask_illegal_transitions(policy, mask.any(axis=0))
 
             # convert?
             policy_exp = np.exp(policy - np.max(policy))
             probs = policy_exp / policy_exp.sum()
 
             # select top-k transitions for stochastic rollout
-            top_k = min(self.num_actions_to_consider, len(legal_transitions))
+            top_k = min(self.num_actions_to_consider, len(legal_action_indices))
 
-            # obtain action indices (removing player_id) and get the probability
-            legal_action_indices = [transition[1] for transition in legal_transitions]
+            # probability of the action of each legal transition
             legal_probs = probs[legal_action_indices]
 
             if legal_probs.sum() == 0:
@@ -246,10 +246,11 @@ class MonteCarloTreeSearch:
 
             # sample from top k rather than picking top
             selected_idx = np.random.choice(top_indices, p=top_probs)
-            selected_transition = legal_transitions[selected_idx]
+            selected_transition = (int(seats[selected_idx]), int(legal_action_indices[selected_idx]))
 
-            # simulate
-            current_state = self.simulate_transition(current_state, selected_transition)
+            # simulate on the same game rather than rebuilding it from the state every step
+            game.apply(selected_transition)
+            current_state = game.get_state()
 
         # evaluate using value network
         obs = self.hide_hidden_information(current_state, player_id)
@@ -335,23 +336,18 @@ class MonteCarloTreeSearch:
 
 
     @staticmethod
-    def mask_illegal_transitions(policy: np.ndarray, legal_transitions: list) -> None:
+    def mask_illegal_transitions(policy: np.ndarray, legal: np.ndarray) -> None:
         """
         Mask out illegal transitions in the policy
+        :param legal: bool[NUM_ACTIONS], whether anyone can take each action, e.g.
+                      MahjongGame.legal_action_mask().any(axis=0)
         """
-        mask = np.zeros_like(policy)
-
-        # set legal transitions to 1
-        for actioner, action in legal_transitions:
-            if action < len(policy):
-                mask[action] = 1.0
-        policy *= mask
+        legal = legal[:len(policy)]
+        policy *= legal
 
         # renormalise
         if policy.sum() > 0:
             policy /= policy.sum()
         else:
             # Uniform distribution over legal transitions if all are zero
-            for actioner, action in legal_transitions:
-                if action < len(policy):
-                    policy[action] = 1.0 / len(legal_transitions)
+            policy[legal] = 1.0 / legal.sum()
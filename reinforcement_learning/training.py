@@ -1,5 +1,7 @@
+import numpy as np
+
 from mahjong_environment.mahjong_actions import MahjongActions
-from mahjong_environment.mahjong_game import MahjongGame
+from mahjong_environment.mahjong_game import MahjongGame, NUM_ACTIONS
 from mahjong_environment.mahjong_game_adapter import MahjongEnvironmentAdapter
 from reinforcement_learning.neural_network import PolicyValueNetwork
 from reinforcement_learning.rl_bot import RLAgent
@@ -18,7 +20,7 @@ class Training:
         :return:
         """
         network = PolicyValueNetwork(state_size=MahjongGame.state_size,
-                                     action_space=21,  # TODO: rdefine in constant
+                                     action_space=NUM_ACTIONS,
                                      hidden_layer_size=20)
         decision_model = MahjongModel(network=network)
 
@@ -40,24 +42,22 @@ class Training:
         total_rewards = [0, 0, 0, 0]
 
         for _ in range(self.num_episodes):
-            episode_memory = [[], [], [], []]
+            trajectory = decision_model.replay_buffer  # steps are logged straight into the replay buffer
+            episode_start = len(trajectory)
             state = env.reset()  # Reset the environment at the start of each episode
             done = False
             prev_scores = [player.score for player in players]
             turn_no = 1  # for debugging only
-            while not done and len(env.game.tiles) > 0:
+            while not done and env.game.tiles_remaining > 0:
                 print(f"=================TURN {turn_no}===================")
                 print(f"It is player {env.game.current_player_no}'s turn to discard")
                 # ====================== ====================== ======================
                 # ====================== DISCARD PHASE ===========================
                 # ====================== ====================== ======================
                 state = env.game.get_state()
-                legal_actions = [[], [], [], []]
                 env.game.is_discard = True
-                for i in range(len(players)):
-                    player = players[i]
-                    our_turn = env.game.current_player == player
-                    legal_actions[i] = env.game.get_legal_actions(discard_turn=True, our_turn=our_turn, player=player)
+                legal_mask = env.game.legal_action_mask()
+                legal_actions = [np.flatnonzero(row).tolist() for row in legal_mask]
 
                 selected_actions = [(i, MahjongActions(player.select_actions(legal_actions[i], state)))
                                     for i, player in enumerate(players)]
@@ -85,21 +85,17 @@ class Training:
 
                 if env.game.last_acting_player is not None:
                     actioning_player_id = env.game.last_acting_player.player_id
-                    episode_memory[actioning_player_id].append(
-                        (state, selected_actions[actioning_player_id][1])
-                    )
+                    trajectory.append(state, actioning_player_id, selected_actions[actioning_player_id][1],
+                                      is_discard=True, legal=legal_mask[actioning_player_id])
 
                 state = next_state
 
                 # ====================== ====================== ======================
                 # ====================== NON-DISCARD PHASE ===========================
                 # ====================== ====================== ======================
-                legal_actions = [[], [], [], []]
                 state = env.game.get_state()
-                for i in range(len(players)):
-                    player = players[i]
-                    our_turn = env.game.current_player == player
-                    legal_actions[i] = env.game.get_legal_actions(discard_turn=False, our_turn=our_turn, player=player)
+                legal_mask = env.game.legal_action_mask()
+                legal_actions = [np.flatnonzero(row).tolist() for row in legal_mask]
 
                 selected_actions = [(i, player.select_actions(legal_actions[i], state))
                                     for i, player in enumerate(players)]
@@ -116,16 +112,15 @@ class Training:
 
                 if env.game.last_acting_player is not None:
                     actioning_player_id = env.game.last_acting_player.player_id
-                    episode_memory[actioning_player_id].append(
-                        (state, selected_actions[actioning_player_id][1])
-                    )
+                    trajectory.append(state, actioning_player_id, selected_actions[actioning_player_id][1],
+                                      is_discard=False, legal=legal_mask[actioning_player_id])
 
                 if env.game.game_over:  # If the game is over, break early
                     continue
 
                 done = env.game.game_over
                 turn_no += 1
-                print(f"\nThere are {len(env.game.tiles)} remaining")
+                print(f"\nThere are {env.game.tiles_remaining} remaining")
 
                 # TODO: the number of tiles remaning doesn't seem to always go down
             print("Did the game conclude in a win? " + str(env.game.game_over))
@@ -134,9 +129,7 @@ class Training:
                 for i in range(4)
             ]
 
-            for i in range(4):
-                for (s, a) in episode_memory[i]:
-                    decision_model.push_experience((s, a, final_rewards[i]))
+            trajectory.finish_episode(final_rewards, episode_start)
 
             decision_model.update_model()
 